@@ -1,25 +1,310 @@
+import os
+import sys
+import json
 import click
+import yaml
 from click_loglevel import LogLevel
 import logging
-from appsec_discovery.services import ScanService, ReportService
+from appsec_discovery.services import ScanService, ReportService, DiffService, ServeService, BatchService, WatchService, submit_job, load_manifest
+from appsec_discovery.services.watch_service import watch_report_types
+from appsec_discovery.profiler import Profiler
+from appsec_discovery.models import ScoreConfig
 
-@click.command()
-@click.option('--source', required=True, type=click.Path(exists=True), help='Source code folder')
+# time budgeted scan wrote report, but skipped some work
+PARTIAL_SCAN_EXIT_CODE = 3
+
+def parse_shard(shard: str):
+
+    # 1 based i/N like CI parallel job index, (index, count) for scan service
+    try:
+        index, count = [int(part) for part in shard.split('/')]
+    except ValueError:
+        raise click.BadParameter(f"'{shard}' is not i/N.", param_hint="'--shard'")
+
+    if count < 1 or not 1 <= index <= count:
+        raise click.BadParameter(f"'{shard}' needs 1 <= i <= N.", param_hint="'--shard'")
+
+    return index - 1, count
+
+@click.group(invoke_without_command=True)
+@click.option('--source', required=False, type=click.Path(exists=True, allow_dash=True), help='Source code folder, tar or zip archive, - for archive piped to stdin')
+@click.option('--git-ref', required=False, show_default=True, default=None, help='Scan files of --source git repository at this ref without checkout')
 @click.option('--config', required=False, show_default=True, default=None, type=click.File('r'), help='Scoring config file')
 @click.option('--output', required=False, show_default=True, default=None, type=click.File('w'), help='Output file')
-@click.option('--output-type', required=False, show_default=True, default='yaml', type=click.Choice(['json', 'sarif', 'yaml'], case_sensitive=False), help='Report type')
+@click.option('--output-type', required=False, show_default=True, default='yaml', type=click.Choice(['json', 'sarif', 'yaml', 'compact', 'sqlite'], case_sensitive=False), help='Report type, compact is gzipped (zstd for .zst output) deduplicated json lines, sqlite appends scan to database')
+@click.option('--engine', required=False, show_default=True, default=None, type=click.Choice(['semgrep', 'native'], case_sensitive=False), help='Extraction engine for parsers with native support, overrides config')
+@click.option('--base-ref', required=False, show_default=True, default=None, help='Git ref to diff against, scan only changed files and report new, changed and removed objects')
+@click.option('--dump-objects', required=False, show_default=True, default=None, type=click.Path(dir_okay=False, writable=True), help='Save parsed objects before scoring to gzipped json lines file')
+@click.option('--from-objects', required=False, show_default=True, default=None, type=click.Path(exists=True, dir_okay=False), help='Load parsed objects from --dump-objects file instead of scanning source, only filter and score them')
 @click.option("--only-scored-objects", is_flag=True, show_default=True, default=False, help="Show only scored objects")
+@click.option("--no-sarif-snippets", is_flag=True, show_default=True, default=False, help="Do not add yaml dump of object as snippet to sarif results")
+@click.option('--profile', required=False, show_default=True, default=None, type=click.Path(dir_okay=False, writable=True), help='Save per stage timings, memory, counts and semgrep rule timings to json file')
+@click.option('--profile-stage', required=False, show_default=True, default=None, help='Run stages with this name prefix (parse:swagger, score, report) under python profiler, dump is saved next to --profile file')
+@click.option('--profiler', 'python_profiler', required=False, show_default=True, default='cprofile', type=click.Choice(['cprofile', 'pyinstrument'], case_sensitive=False), help='Python profiler for --profile-stage')
+@click.option('--time-budget', required=False, show_default=True, default=None, type=float, help='Seconds for scan, work not started in time is skipped, report is marked partial and command exits with 3')
+@click.option('--shard', required=False, show_default=True, default=None, help='Scan only shard i of N (1/4 .. 4/4) of source files and save partial result to --output for merge command')
+@click.option('--server', required=False, show_default=True, default=None, help='Run scan on serve daemon, http://host:port or unix:///path/to/socket, --output is path in daemon --output-dir')
+@click.option('--server-token', required=False, default=None, envvar='APPSEC_DISCOVERY_TOKEN', help='Token of serve daemon, also read from APPSEC_DISCOVERY_TOKEN')
+@click.option("--watch", is_flag=True, show_default=True, default=False, help="Keep running, rescan changed files and rewrite --output report on every change, openapi, protobuf and graphql parsers rerun over all their files")
 @click.option('-v', '--verbose', is_flag=True, help='Enables verbose mode')
-def main(source, config, output, output_type, only_scored_objects, verbose):
+@click.pass_context
+def main(ctx, source, git_ref, config, output, output_type, engine, base_ref, dump_objects, from_objects, only_scored_objects, no_sarif_snippets, profile, profile_stage, python_profiler, time_budget, shard, server, server_token, watch, verbose):
 
     if verbose:
         logging.basicConfig(format="[%(levelname)-8s] %(message)s", level=15)
 
-    scan_service = ScanService(source_folder=source, conf_file=config, only_scored_objects=only_scored_objects)
-    scanned_objects = scan_service.scan_folder()
+    # subcommands have own options, plain call scans source folder
+    if ctx.invoked_subcommand is not None:
+        return
+
+    if not source and not from_objects:
+        raise click.UsageError("Missing option '--source'.")
+
+    if git_ref or (source and not os.path.isdir(source)):
+
+        if base_ref or from_objects or server or watch:
+            raise click.UsageError("Options '--base-ref', '--from-objects', '--server' and '--watch' need '--source' folder checkout.")
+
+        if git_ref and not os.path.isdir(source):
+            raise click.UsageError("Option '--git-ref' needs '--source' git repository folder.")
+
+    profiler = None
+
+    if profile:
+        dump_file = f"{profile}.html" if python_profiler == 'pyinstrument' else f"{profile}.prof"
+        profiler = Profiler(hot_stage=profile_stage, dump_file=dump_file, python_profiler=python_profiler, trace_memory=True)
+
+    if shard:
+        shard = parse_shard(shard)
+
+        if base_ref or from_objects or dump_objects or server:
+            raise click.UsageError("Options '--base-ref', '--from-objects', '--dump-objects' and '--server' are not supported with '--shard'.")
+
+        if not output or output.name == '-':
+            raise click.UsageError("Shard scan needs '--output' file for partial result.")
+
+    if time_budget and (base_ref or shard or server):
+        raise click.UsageError("Option '--time-budget' is not supported with '--base-ref', '--shard' and '--server'.")
+
+    if watch:
+
+        if base_ref or from_objects or dump_objects or shard or server or time_budget or profile:
+            raise click.UsageError("Options '--base-ref', '--from-objects', '--dump-objects', '--shard', '--server', '--time-budget' and '--profile' are not supported with '--watch'.")
+
+        if not output or output.name == '-':
+            raise click.UsageError("Watch mode needs '--output' file to rewrite.")
+
+        if output_type not in watch_report_types:
+            raise click.UsageError(f"{output_type.capitalize()} report type is not supported with '--watch'.")
+
+    if server:
+
+        if base_ref or from_objects or dump_objects or profile:
+            raise click.UsageError("Options '--base-ref', '--from-objects', '--dump-objects' and '--profile' are not supported with '--server'.")
+
+        if output_type == 'compact' and not output:
+            raise click.UsageError("Compact report type needs '--output' file with '--server'.")
+
+        if output_type == 'sqlite' and not output:
+            raise click.UsageError("Sqlite report type needs '--output' database file.")
+
+        # daemon reads source itself, output is path in daemon output dir, no local scan service reads config
+        job = submit_job(server, {
+            'source': os.path.abspath(source),
+            'output': output.name if output and output.name != '-' else None,
+            'output_type': output_type,
+            'config': config.read() if config else None,
+            'engine': engine,
+            'only_scored_objects': only_scored_objects,
+            'sarif_snippets': not no_sarif_snippets,
+        }, token=server_token)
+
+        if job['status'] != 'done':
+            raise click.ClickException(f"Scan job failed: {job.get('error')}")
+
+        if 'report' in job:
+            sys.stdout.write(job['report'])
+
+        return
+
+    try:
+        scan_service = ScanService(source_folder=source, conf_file=config, only_scored_objects=only_scored_objects, engine=engine, profiler=profiler, shard=shard,
+                                   time_budget=time_budget, git_ref=git_ref)
+    except Exception as ex:
+        raise click.UsageError(f"Can not open source: {ex}")
+
+    if base_ref and output_type in ['compact', 'sqlite']:
+        raise click.UsageError(f"{output_type.capitalize()} report type is not supported with '--base-ref'.")
+
+    if output_type == 'sqlite' and not output:
+        raise click.UsageError("Sqlite report type needs '--output' database file.")
+
+    if watch:
+
+        watch_service = WatchService(scan_service=scan_service, report_type=output_type, report_file=output.name, sarif_snippets=not no_sarif_snippets)
+        watch_service.watch()
+
+        return
+
+    if base_ref:
+
+        diff_service = DiffService(source_folder=source, base_ref=base_ref, config=scan_service.config, only_scored_objects=only_scored_objects)
+        diff_reports = diff_service.scan_diff()
+
+        report_service = ReportService(code_objects=[], report_type=output_type, report_file=output, diff_reports=diff_reports, sarif_snippets=not no_sarif_snippets)
+        report_service.save_report_to_disk()
+
+        return
+
+    if shard:
+
+        # scoring runs once on merge of all shards
+        scan_service.dump_partial(scan_service.parse_folder(), output.name)
+
+        if profile:
+            scan_service.profiler.save(profile)
+
+        return
 
-    report_service = ReportService(code_objects=scanned_objects, report_type=output_type, report_file=output)
+    if from_objects:
+        with scan_service.profiler.stage('load') as stage:
+            parsed_objects = scan_service.load_objects(from_objects)
+            stage['objects'] = len(parsed_objects)
+    else:
+        parsed_objects = scan_service.parse_folder()
+
+    if dump_objects:
+        scan_service.dump_objects(parsed_objects, dump_objects)
+
+    scanned_objects = scan_service.process_objects(parsed_objects)
+
+    scan_status = scan_service.scan_status() if time_budget else None
+
+    report_service = ReportService(code_objects=scanned_objects, report_type=output_type, report_file=output, sarif_snippets=not no_sarif_snippets, source=scan_service.source_folder, profiler=scan_service.profiler,
+                                   scan_status=scan_status)
+    report_service.save_report_to_disk()
+
+    if profile:
+        scan_service.profiler.save(profile)
+
+    # report on stdout has no place for status, so partial scan is told on stderr and by exit code
+    if scan_status and scan_status['partial']:
+        click.echo(f"Time budget of {time_budget}s is over, report is partial: {json.dumps(scan_status)}", err=True)
+        sys.exit(PARTIAL_SCAN_EXIT_CODE)
+
+@main.command(help='Compare old and new json reports, show new, changed and removed objects')
+@click.argument('old_report', type=click.Path(exists=True, dir_okay=False))
+@click.argument('new_report', type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', required=False, show_default=True, default=None, type=click.File('w'), help='Output file')
+@click.option('--output-type', required=False, show_default=True, default='yaml', type=click.Choice(['json', 'sarif', 'yaml'], case_sensitive=False), help='Report type')
+@click.option("--only-scored-objects", is_flag=True, show_default=True, default=False, help="Show only scored objects")
+@click.option("--no-sarif-snippets", is_flag=True, show_default=True, default=False, help="Do not add yaml dump of object as snippet to sarif results")
+def diff(old_report, new_report, output, output_type, only_scored_objects, no_sarif_snippets):
+    diff_reports = DiffService.diff_report_files(old_report, new_report, only_scored_objects=only_scored_objects)
+
+    report_service = ReportService(code_objects=[], report_type=output_type, report_file=output, diff_reports=diff_reports, sarif_snippets=not no_sarif_snippets)
     report_service.save_report_to_disk()
 
+@main.command(help='Merge partial results of all --shard scans, resolve cross file types, score and save report')
+@click.argument('partials', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', required=False, show_default=True, default=None, type=click.File('w'), help='Output file')
+@click.option('--output-type', required=False, show_default=True, default='yaml', type=click.Choice(['json', 'sarif', 'yaml', 'compact', 'sqlite'], case_sensitive=False), help='Report type')
+@click.option("--only-scored-objects", is_flag=True, show_default=True, default=False, help="Show only scored objects")
+@click.option("--no-sarif-snippets", is_flag=True, show_default=True, default=False, help="Do not add yaml dump of object as snippet to sarif results")
+def merge(partials, output, output_type, only_scored_objects, no_sarif_snippets):
+
+    if output_type == 'sqlite' and not output:
+        raise click.UsageError("Sqlite report type needs '--output' database file.")
+
+    try:
+        header, parsed_objects, sources = ScanService.load_partials(partials)
+    except Exception as ex:
+        raise click.UsageError(f"Can not merge shards: {ex}")
+
+    # shards carry config of scan, so merge scores objects same way
+    scan_service = ScanService(source_folder=header['source_folder'], config=ScoreConfig(**header['config']), only_scored_objects=only_scored_objects)
+
+    scanned_objects = scan_service.process_objects(scan_service.merge_partials(parsed_objects, sources))
+
+    report_service = ReportService(code_objects=scanned_objects, report_type=output_type, report_file=output, sarif_snippets=not no_sarif_snippets, source=scan_service.source_folder, profiler=scan_service.profiler)
+    report_service.save_report_to_disk()
+
+@main.command('profile-rules', help='Run semgrep rule packs of parsers with timings, show slowest rules and files')
+@click.option('--source', required=True, type=click.Path(exists=True), help='Source code folder')
+@click.option('--config', required=False, show_default=True, default=None, type=click.File('r'), help='Scoring config file')
+@click.option('--parsers', required=False, show_default=True, default=None, help='Parsers to profile, comma separated, all semgrep parsers by default')
+@click.option('--budget', required=False, show_default=True, default=None, type=float, help='Warn about rules with more match and parse time in seconds')
+@click.option('--top', required=False, show_default=True, default=10, help='Number of slowest rules and files to show')
+@click.option('--output', required=False, show_default=True, default=None, type=click.File('w'), help='Output file')
+def profile_rules(source, config, parsers, budget, top, output):
+
+    profiler = Profiler(rule_budget=budget, top=top)
+    scan_service = ScanService(source_folder=source, conf_file=config, engine='semgrep', profiler=profiler)
+
+    if parsers:
+        scan_service.config.parsers = parsers.split(',')
+
+    scan_service.parse_folder()
+
+    report = yaml.dump(profiler.rules_report(), default_flow_style=False, sort_keys=False)
+
+    if output:
+        output.write(report)
+        output.close()
+    else:
+        print(report)
+
+@main.command(help='Run local scan daemon keeping parsers, scoring config and models loaded, scan with --server option')
+@click.option('--config', required=False, show_default=True, default=None, type=click.File('r'), help='Scoring config file for jobs without own config')
+@click.option('--host', required=False, show_default=True, default='127.0.0.1', help='Listen host')
+@click.option('--port', required=False, show_default=True, default=8765, help='Listen port')
+@click.option('--socket', 'socket_path', required=False, show_default=True, default=None, type=click.Path(dir_okay=False), help='Listen on unix socket instead of host and port')
+@click.option('--concurrency', required=False, show_default=True, default=2, help='Jobs running at once, next jobs wait in queue')
+@click.option('--token', required=False, default=None, envvar='APPSEC_DISCOVERY_TOKEN', help='Token clients must send, needed for host and port listen, also read from APPSEC_DISCOVERY_TOKEN')
+@click.option('--output-dir', required=False, default=None, type=click.Path(file_okay=False, exists=True), help='Folder for job output files, without it reports are returned inline only')
+def serve(config, host, port, socket_path, concurrency, token, output_dir):
+
+    logging.basicConfig(format="[%(levelname)-8s] %(message)s", level=logging.INFO)
+
+    if not socket_path and not token:
+        raise click.UsageError("Listening on '--host' and '--port' needs '--token', or use '--socket'.")
+
+    serve_service = ServeService(conf_file=config, concurrency=concurrency, token=token, output_dir=output_dir)
+    serve_service.serve_forever(host=host, port=port, socket_path=socket_path)
+
+@main.command(help='Scan repositories from manifest yaml in one process with shared config, parsers, models and content cache')
+@click.argument('manifest', type=click.Path(exists=True, dir_okay=False))
+@click.option('--config', required=False, show_default=True, default=None, type=click.File('r'), help='Scoring config file')
+@click.option('--workers', required=False, show_default=True, default=4, help='Repositories scanned at once')
+@click.option('--output-type', required=False, show_default=True, default='json', type=click.Choice(['json', 'sarif', 'yaml', 'compact', 'sqlite'], case_sensitive=False), help='Report type for repos without own output_type')
+@click.option('--engine', required=False, show_default=True, default=None, type=click.Choice(['semgrep', 'native'], case_sensitive=False), help='Extraction engine for parsers with native support, overrides config')
+@click.option("--only-scored-objects", is_flag=True, show_default=True, default=False, help="Show only scored objects")
+@click.option("--no-sarif-snippets", is_flag=True, show_default=True, default=False, help="Do not add yaml dump of object as snippet to sarif results")
+@click.option('--summary', required=False, show_default=True, default=None, type=click.File('w'), help='Save aggregate summary with per repo results and throughput to json file')
+def batch(manifest, config, workers, output_type, engine, only_scored_objects, no_sarif_snippets, summary):
+
+    logging.basicConfig(format="[%(levelname)-8s] %(message)s", level=logging.INFO)
+
+    try:
+        repos = load_manifest(manifest)
+    except Exception as ex:
+        raise click.UsageError(f"Invalid manifest {manifest}: {ex}")
+
+    batch_service = BatchService(repos, conf_file=config, workers=workers, output_type=output_type, engine=engine,
+                                 only_scored_objects=only_scored_objects, sarif_snippets=not no_sarif_snippets)
+    batch_summary = batch_service.run()
+
+    logging.getLogger(__name__).info(f"Scanned {batch_summary['done']} of {batch_summary['repos']} repos in {batch_summary['wall_s']}s, "
+                                     f"{batch_summary['files_per_s']} files/s, {batch_summary['objects_per_s']} objects/s")
+
+    if summary:
+        json.dump(batch_summary, summary, indent=4)
+        summary.close()
+    else:
+        print(yaml.dump({key: value for key, value in batch_summary.items() if key != 'results'}, default_flow_style=False, sort_keys=False))
+
+    if batch_summary['failed']:
+        sys.exit(1)
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,144 @@
+import json
+from typing import Iterator, Optional, TextIO
+
+# Incremental reader for big json documents: yields array items one by one
+# without loading whole document, each item is decoded with stdlib json.
+
+decoder = json.JSONDecoder()
+
+WHITESPACE = ' \t\n\r'
+DELIMITERS = WHITESPACE + ',:]}'
+
+
+class JsonStreamReader:
+
+    def __init__(self, stream: TextIO, chunk_size: int = 1024 * 1024):
+
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+
+        # read at least as much as already buffered, so huge values are retried O(log n) times
+        chunk = self.stream.read(max(self.chunk_size, len(self.buf) - self.pos))
+
+        if not chunk:
+            self.eof = True
+            return False
+
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+
+        return True
+
+    def peek(self) -> str:
+
+        while True:
+
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+
+            if not self.fill():
+                return ''
+
+    def expect(self, char: str):
+
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' at json stream, got '{self.peek()}'")
+
+        self.pos += 1
+
+    def value(self):
+
+        self.peek()
+
+        while True:
+
+            try:
+                obj, end = decoder.raw_decode(self.buf, self.pos)
+
+                # number or literal cut by chunk end may continue in next chunk
+                if not self.eof and (end == len(self.buf) or self.buf[end] not in DELIMITERS) and self.fill():
+                    continue
+
+                self.pos = end
+                return obj
+
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+
+    def items(self) -> Iterator:
+
+        self.expect('[')
+
+        if self.peek() == ']':
+            self.pos += 1
+            return
+
+        while True:
+
+            yield self.value()
+
+            char = self.peek()
+            self.pos += 1
+
+            if char == ']':
+                return
+
+            if char != ',':
+                raise ValueError(f"Expected ',' or ']' at json stream, got '{char}'")
+
+    def find_key(self, key: str) -> bool:
+
+        # move to value of top level object key, skipping other values
+        self.expect('{')
+
+        while True:
+
+            char = self.peek()
+
+            if char == '}' or not char:
+                return False
+
+            if char == ',':
+                self.pos += 1
+                continue
+
+            name = self.value()
+            self.expect(':')
+
+            if name == key:
+                return True
+
+            # skipped arrays are decoded item by item, so big results array is not held whole
+            if self.peek() == '[':
+                for _ in self.items():
+                    pass
+            else:
+                self.value()
+
+
+def iter_json_array(stream: TextIO, key: Optional[str] = None) -> Iterator:
+
+    # items of top level array, or of array under top level object key
+    reader = JsonStreamReader(stream)
+
+    if key is not None and not reader.find_key(key):
+        return
+
+    yield from reader.items()
+
+
+def read_json_key(stream: TextIO, key: str):
+
+    # value of top level object key, None when missing
+    reader = JsonStreamReader(stream)
+
+    return reader.value() if reader.find_key(key) else None
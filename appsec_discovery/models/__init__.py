@@ -1,4 +1,4 @@
 from appsec_discovery.models.code_object import CodeObject, CodeObjectProp, CodeObjectField
-from appsec_discovery.models.config import ScoreConfig, ExcludeScoring, AiLocal, AiApi
+from appsec_discovery.models.config import ScoreConfig, ScanIgnore, ExcludeScan, ExcludeScoring, AiLocal, AiApi
 from appsec_discovery.models.reports import JsonReport, DiffReport, SarifReport
 from appsec_discovery.models.uploads import DefectdojoImportScanRequest, DefectdojoProjectTypeRequest, DiscoveryImportScanRequest
\ No newline at end of file
@@ -0,0 +1,204 @@
+import sys
+from typing import List, Dict, Optional
+
+from appsec_discovery.models.code_object import CodeObject, CodeObjectField, CodeObjectProp
+
+# Slotted counterparts of CodeObject models for parse and score stages: same attributes
+# and dict() output without pydantic validation, names, file paths and types are interned.
+# Converted to pydantic models by to_model() when objects leave scan service.
+#
+# Parsers may put the same CompactField instance into many objects (see FieldTables),
+# such fields are marked shared and copied by CompactObject.own_field() before scoring writes.
+
+
+def as_str(value, name: str, intern: bool = False) -> str:
+
+    # same coercion as pydantic str fields: numbers are converted, None is rejected
+    if value is None:
+        raise ValueError(f"{name} none is not an allowed value")
+
+    value = value if isinstance(value, str) else str(value)
+
+    return sys.intern(value) if intern else value
+
+
+def as_optional_str(value, name: str, intern: bool = False) -> Optional[str]:
+    return None if value is None else as_str(value, name, intern)
+
+
+def as_optional_int(value) -> Optional[int]:
+    return None if value is None else int(value)
+
+
+class CompactField:
+
+    attributes = ('field_name', 'field_type', 'file', 'line', 'severity', 'tags')
+
+    __slots__ = attributes + ('shared',)
+
+    def __init__(self, field_name, field_type, file=None, line=None, severity=None, tags=None):
+
+        self.field_name = as_str(field_name, 'field_name', intern=True)
+        self.field_type = as_str(field_type, 'field_type', intern=True)
+        self.file = as_optional_str(file, 'file', intern=True)
+        self.line = as_optional_int(line)
+        self.severity = severity
+        self.tags = tags
+        self.shared = False
+
+    def __eq__(self, other):
+        return isinstance(other, CompactField) and all(getattr(self, slot) == getattr(other, slot) for slot in self.attributes)
+
+    def copy(self) -> 'CompactField':
+        return CompactField(self.field_name, self.field_type, self.file, self.line, self.severity, list(self.tags) if self.tags else self.tags)
+
+    def dict(self, exclude_none: bool = False) -> Dict:
+        return {slot: getattr(self, slot) for slot in self.attributes if not exclude_none or getattr(self, slot) is not None}
+
+    def to_model(self) -> CodeObjectField:
+        return CodeObjectField.construct(**{slot: getattr(self, slot) for slot in self.attributes})
+
+
+class CompactProp:
+
+    __slots__ = ('prop_name', 'prop_value', 'file', 'line', 'severity', 'tags')
+
+    def __init__(self, prop_name, prop_value, file=None, line=None, severity=None, tags=None):
+
+        self.prop_name = as_str(prop_name, 'prop_name', intern=True)
+        self.prop_value = as_str(prop_value, 'prop_value')
+        self.file = as_optional_str(file, 'file', intern=True)
+        self.line = as_optional_int(line)
+        self.severity = severity
+        self.tags = tags
+
+    def __eq__(self, other):
+        return isinstance(other, CompactProp) and all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    def dict(self, exclude_none: bool = False) -> Dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__ if not exclude_none or getattr(self, slot) is not None}
+
+    def to_model(self) -> CodeObjectProp:
+        return CodeObjectProp.construct(**{slot: getattr(self, slot) for slot in self.__slots__})
+
+
+class CompactObject:
+
+    __slots__ = ('hash', 'object_name', 'object_type', 'parser', 'severity', 'tags', 'file', 'line', 'properties', 'fields')
+
+    def __init__(self, hash, object_name, object_type, parser, file, line, properties=None, fields=None, severity=None, tags=None):
+
+        self.hash = as_str(hash, 'hash')
+        self.object_name = as_str(object_name, 'object_name')
+        self.object_type = as_str(object_type, 'object_type', intern=True)
+        self.parser = as_str(parser, 'parser', intern=True)
+        self.severity = severity
+        self.tags = tags
+        self.file = as_str(file, 'file', intern=True)
+        self.line = int(line)
+        self.properties: Dict[str, CompactProp] = dict(properties) if properties else {}
+        self.fields: Dict[str, CompactField] = dict(fields) if fields else {}
+
+    def __eq__(self, other):
+        return isinstance(other, CompactObject) and all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    def dict(self, exclude_none: bool = False) -> Dict:
+
+        result = {}
+
+        for slot in self.__slots__:
+
+            value = getattr(self, slot)
+
+            if slot in ['properties', 'fields']:
+                value = {name: item.dict(exclude_none=exclude_none) for name, item in value.items()}
+
+            if not exclude_none or value is not None:
+                result[slot] = value
+
+        return result
+
+    def own_field(self, field_name: str) -> CompactField:
+
+        # copy on write for fields shared with other objects
+        field = self.fields[field_name]
+
+        if field.shared:
+            field = field.copy()
+            self.fields[field_name] = field
+
+        return field
+
+    def to_model(self, shared_models: Optional[Dict] = None) -> CodeObject:
+
+        # fields still shared after scoring keep sharing one model, nothing writes to report models
+        fields = {}
+
+        for name, field in self.fields.items():
+
+            if field.shared and shared_models is not None:
+                if id(field) not in shared_models:
+                    shared_models[id(field)] = (field, field.to_model())
+                fields[name] = shared_models[id(field)][1]
+            else:
+                fields[name] = field.to_model()
+
+        return CodeObject.construct(
+            hash=self.hash,
+            object_name=self.object_name,
+            object_type=self.object_type,
+            parser=self.parser,
+            severity=self.severity,
+            tags=self.tags,
+            file=self.file,
+            line=self.line,
+            properties={name: prop.to_model() for name, prop in self.properties.items()},
+            fields=fields,
+        )
+
+    @classmethod
+    def from_dict(cls, object_dict: Dict) -> 'CompactObject':
+
+        return cls(
+            hash=object_dict['hash'],
+            object_name=object_dict['object_name'],
+            object_type=object_dict['object_type'],
+            parser=object_dict['parser'],
+            file=object_dict['file'],
+            line=object_dict['line'],
+            severity=object_dict.get('severity'),
+            tags=object_dict.get('tags'),
+            properties={name: CompactProp(**prop) for name, prop in object_dict.get('properties', {}).items()},
+            fields={name: CompactField(**field) for name, field in object_dict.get('fields', {}).items()},
+        )
+
+
+class FieldTables:
+
+    # identical resolved sub-trees of different objects share one set of field instances
+    def __init__(self):
+        self.tables = {}
+
+    def share(self, table: Dict[str, CompactField]) -> Dict[str, CompactField]:
+
+        # only freshly parsed fields, scored ones are owned by their object
+        if any(field.severity or field.tags for field in table.values()):
+            return table
+
+        key = tuple((name, field.field_name, field.field_type, field.file, field.line) for name, field in table.items())
+
+        if key not in self.tables:
+
+            for field in table.values():
+                field.shared = True
+
+            self.tables[key] = {sys.intern(name): field for name, field in table.items()}
+
+        return self.tables[key]
+
+
+def to_models(code_objects: List) -> List[CodeObject]:
+
+    shared_models = {}
+
+    return [object.to_model(shared_models) if isinstance(object, CompactObject) else object for object in code_objects]
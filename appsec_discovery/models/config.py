@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+import os
+from fnmatch import fnmatch
+from pydantic import BaseModel, root_validator
 from typing import List, Dict, Optional
 
 default_rules = {
@@ -55,6 +57,101 @@ default_rules = {
     },
 }
 
+# terraform module attribute => vm object property
+default_terraform_props = {
+    'vm_name': 'vm_name',
+    'vm_domain': 'vm_domain',
+    'vm_template': 'vm_template',
+    'vm_pool': 'vm_pool',
+    'vm_desc': 'vm_desc',
+    'vm_server_cluster_name': 'vm_server_cluster_name',
+    'vm_server_role': 'vm_server_role',
+    'vm_server_owning_team': 'vm_server_owning_team',
+    'vm_server_maintaining_team': 'vm_server_maintaining_team',
+    'vm_prometheus_env': 'vm_prometheus_env',
+    'vlan_id': 'vlan_id',
+    'dc': 'dc',
+}
+
+# vendored, dependency and cache folders, matched by folder name
+default_ignore_dirs = [
+    '.git',
+    'node_modules',
+    'bower_components',
+    'vendor',
+    'third_party',
+    '.venv',
+    'venv',
+    'site-packages',
+    '__pycache__',
+    '.terraform',
+    '.tox',
+]
+
+# build output folders, names are also used for source packages, skipped only with build_dirs: true
+build_ignore_dirs = [
+    'dist',
+    'build',
+    'target',
+]
+
+# minified bundles, generated code and lock files, matched by file name
+default_ignore_files = [
+    '*.min.js',
+    '*.min.css',
+    '*.bundle.js',
+    '*.js.map',
+    '*.pb.go',
+    '*.pb.gw.go',
+    '*_pb2.py',
+    '*_pb2_grpc.py',
+    '*.pb.js',
+    '*_pb.js',
+    '*_pb.d.ts',
+    'package-lock.json',
+    'yarn.lock',
+    'pnpm-lock.yaml',
+]
+
+# header markers of generated files, checked in first kilobyte
+default_generated_markers = [
+    'Code generated .* DO NOT EDIT',
+    '@generated',
+    '<auto-generated',
+    'Generated by the protocol buffer compiler',
+]
+
+# api spec files of openapi, protobuf and graphql parsers, generated specs are often over max_file_size
+default_spec_files = [
+    '*.yaml',
+    '*.yml',
+    '*.json',
+    '*.proto',
+    '*.graphql',
+]
+
+class ScanIgnore(BaseModel):
+    dirs: List[str] = default_ignore_dirs
+    files: List[str] = default_ignore_files
+    generated_markers: List[str] = default_generated_markers
+    gitignore: bool = True
+    max_file_size: int = 2000000
+    spec_files: List[str] = default_spec_files
+    max_spec_size: int = 0
+    build_dirs: bool = False
+
+    @root_validator(skip_on_failure=True)
+    def add_build_dirs(cls, values):
+        if values.get('build_dirs'):
+            values['dirs'] = values['dirs'] + [folder for folder in build_ignore_dirs if folder not in values['dirs']]
+        return values
+
+    def size_limit(self, file_name: str) -> int:
+        # zero is no limit
+        if any(fnmatch(os.path.basename(file_name), pattern) for pattern in self.spec_files):
+            return self.max_spec_size
+        return self.max_file_size
+
 class ExcludeScan(BaseModel):
     file: Optional[str]
     parser: Optional[str]
@@ -86,8 +183,11 @@ class AiApi(BaseModel):
 
 class ScoreConfig(BaseModel):
     parsers: List[str] = ['all']
+    engine: str = 'semgrep'
     object_types: List[str] = ['all']
     score_tags: Dict[str,Dict[str,List[str]]] = default_rules
+    terraform_props: Dict[str,str] = default_terraform_props
+    ignore: ScanIgnore = ScanIgnore()
     ai_local: Optional[AiLocal]
     ai_api: Optional[AiApi]
     exclude_scan: List[ExcludeScan] = []
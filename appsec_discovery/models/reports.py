@@ -1,5 +1,7 @@
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+from appsec_discovery.models.code_object import CodeObject
 
 
 class SarifReport(BaseModel):
@@ -16,4 +18,13 @@ class DiffReport(BaseModel):
     file: str
     object_type: str
     object_name: str
-
+    change: str
+    hash: str
+    parser: str
+    line: int
+    severity: Optional[str]
+    old_severity: Optional[str]
+    tags: Optional[List[str]]
+    changed_fields: List[str] = []
+    changed_properties: List[str] = []
+    code_object: CodeObject
@@ -1,65 +1,351 @@
 
 import logging
 import subprocess
-import json
 import hashlib
+import os
+import tempfile
+import time
+import threading
+import multiprocessing
 from abc import ABC, abstractmethod
-from typing import List
-from appsec_discovery.models import CodeObject
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict
+from appsec_discovery.models import ScoreConfig
+from appsec_discovery.models.compact import CompactObject
+from appsec_discovery.json_stream import iter_json_array, read_json_key
+from appsec_discovery.parsers.file_filter import FileFilter, match_pattern
+from appsec_discovery.parsers.content_cache import ContentCache
 
 logger = logging.getLogger(__name__)
 
+# semgrep checks for new version on every start, offline it waits for network timeout
+semgrep_env = dict(os.environ, SEMGREP_ENABLE_VERSION_CHECK='0')
+
+# bytes of target paths passed to one semgrep run
+max_targets_bytes = 1000000
+
+# files per semgrep run and native batch of time budgeted scan, budget is checked between them
+BUDGET_SEMGREP_FILES = 1000
+BUDGET_BATCH_FILES = 256
+
+
+def target_chunks(targets: List[str], max_files: int = None) -> List[List[str]]:
+
+    chunks = []
+    chunk = []
+    size = 0
+
+    for target in targets:
+
+        if chunk and (size + len(target) + 1 > max_targets_bytes or (max_files and len(chunk) >= max_files)):
+            chunks.append(chunk)
+            chunk = []
+            size = 0
+
+        chunk.append(target)
+        size += len(target) + 1
+
+    if chunk:
+        chunks.append(chunk)
+
+    return chunks
+
+
 class Parser(ABC):
 
-    def __init__(self, parser, source_folder):
+    # rule file => object types it finds, by default rule file name is object type
+    rule_types: Dict[str, List[str]] = {}
+
+    # extensions of files semgrep rules match, empty list means any file
+    semgrep_extensions: List[str] = []
+
+    # set by scan service for --profile, semgrep then reports per rule timings
+    profiler = None
+
+    # set by scan service for batch and serve modes, native extract results are reused by content
+    content_cache: ContentCache = None
+
+    # parser resolves types across files, shard scans ship its input files and merge runs it on all of them,
+    # watch mode reruns it after change of any file with input extension
+    global_view = False
+    input_extensions: List[str] = []
+
+    # time.monotonic() deadline of time budgeted scan, no new files are started after it
+    deadline: float = None
+
+    def __init__(self, parser, source_folder, config: ScoreConfig = None, file_filter: FileFilter = None):
 
         self.parser = parser
         self.source_folder = source_folder
 
+        self.config = config if config else ScoreConfig()
+
+        # shared between parsers of one scan, so source folder is walked once
+        self.file_filter = file_filter if file_filter else FileFilter(source_folder, self.config.ignore, self.config.exclude_scan)
+
+        # files selected by last find_files or semgrep run, for profile
+        self.files_count = 0
+
+        # files left unscanned by time budget
+        self.skipped_files = 0
+
     @abstractmethod
-    def parse_report(self, scanner_data) -> List[CodeObject]:
+    def parse_report(self, scanner_data) -> List[CompactObject]:
         pass
 
     @abstractmethod
-    def run_scan(self) -> List[CodeObject]:
+    def run_scan(self) -> List[CompactObject]:
         pass
 
+    def input_files(self) -> List[str]:
+        # files read by global view parser
+        return self.find_files(self.input_extensions) if self.input_extensions else []
+
+    def wants_type(self, object_type: str) -> bool:
+
+        # object_types selection and type only exclude_scan entries, same matching as filter_objects
+        for exclude in self.config.exclude_scan:
+            if exclude.object_type and exclude.file is None and exclude.object_name is None \
+                and (exclude.parser is None or exclude.parser.lower() == self.parser.lower()) \
+                and match_pattern(exclude.object_type, object_type):
+                return False
+
+        for selected in self.config.object_types:
+            if selected == 'all' or match_pattern(selected, object_type):
+                return True
+
+        return False
+
+    def rule_files(self, rules_folder: str) -> List[str]:
+
+        rule_files = []
+
+        for rule_file in sorted(os.listdir(rules_folder)):
+
+            if not rule_file.endswith(('.yaml', '.yml')):
+                continue
+
+            object_types = self.rule_types.get(rule_file, [rule_file.rsplit('.', 1)[0]])
+
+            if any(self.wants_type(object_type) for object_type in object_types):
+                rule_files.append(os.path.join(rules_folder, rule_file))
+
+        return rule_files
+
     def run_semgrep(self, source_folder: str, rules_folder: str):
 
+        # only rules for object types that will end up in report
+        rule_files = self.rule_files(rules_folder)
+
+        if not rule_files:
+            logger.info(f"Skip {self.parser} scan for {source_folder}, no rules for selected object types")
+            return
+
+        targets = self.file_filter.semgrep_targets(self.semgrep_extensions)
+        max_files = None
+
+        # time budgeted scan passes files explicitly, recently changed first, in smaller runs
+        if self.deadline is not None and targets:
+            files = self.file_filter.find_files(self.semgrep_extensions) if self.semgrep_extensions else self.file_filter.files()
+            targets = [files[index] for index in self.file_filter.recent_first(files)]
+            max_files = BUDGET_SEMGREP_FILES
+
+        if not targets:
+            logger.info(f"Skip {self.parser} scan for {source_folder}, no files to scan")
+            return
+
+        # archive and git sources have no folder for semgrep, only its files are written to temp folder
+        scan_folder = source_folder
+
+        if self.file_filter.source is not None:
+            scan_folder, targets = self.file_filter.materialize(targets)
+
         logger.info(f"Start {self.parser} scan for {source_folder}")
 
-        try:
-            result = subprocess.run(
-                ["semgrep", "scan", "-f", rules_folder, "--json", "--metrics=off", "--no-git-ignore", source_folder],
-                capture_output=True,
-                text=True
-            )
+        if self.profiler:
+            self.files_count = 0
+
+        # explicit target lists of diff and shard scans are split between runs to stay under argument size limit
+        chunks = target_chunks(targets, max_files)
+
+        for chunk_index, chunk in enumerate(chunks):
+
+            if self.deadline is not None and time.monotonic() > self.deadline:
+                self.skipped_files += sum(len(rest) for rest in chunks[chunk_index:])
+                logger.warning(f"Time budget is over, {self.parser} scan skipped {self.skipped_files} files")
+                break
+
+            # semgrep writes json report to temp file, findings are read from it one by one
+            with tempfile.TemporaryDirectory() as tmp_dir:
+
+                output_file = os.path.join(tmp_dir, "semgrep.json")
+
+                try:
+                    result = subprocess.run(
+                        ["semgrep", "scan"] + [arg for rule_file in rule_files for arg in ["-f", rule_file]] + ["--json", "--output", output_file, "--metrics=off"] + (["--time"] if self.profiler else []) + self.file_filter.semgrep_args() + chunk,
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.PIPE,
+                        text=True,
+                        env=semgrep_env,
+                        timeout=max(self.deadline - time.monotonic(), 0.1) if self.deadline is not None else None
+                    )
+
+                    if os.path.isfile(output_file) and os.path.getsize(output_file):
 
-            if 'results' in result.stdout:
+                        found = 0
 
-                semgrep_data = json.loads(result.stdout)
+                        with open(output_file) as output:
 
-                normalized_results = []
+                            for finding in iter_json_array(output, 'results'):
 
-                # save relative path
-                for finding in semgrep_data.get('results',[]):
+                                # save relative path
+                                path = finding.get('path','')
+                                finding['path'] = path.replace(scan_folder, '')
 
-                    path = finding.get('path','')
-                    finding['path'] = path.replace(source_folder, '')
-                    normalized_results.append(finding)
+                                # gitignored and generated files are not known to semgrep excludes
+                                if not self.file_filter.is_accepted(finding['path'], self.parser):
+                                    continue
 
-                logger.info(f"End {self.parser} scan for {source_folder}, found {len(normalized_results)} rule hits")
+                                found += 1
+                                yield finding
 
-                return normalized_results
-            
+                        logger.info(f"End {self.parser} scan for {source_folder}, found {found} rule hits")
+
+                        if self.profiler:
+                            with open(output_file) as output:
+                                semgrep_time = read_json_key(output, 'time') or {}
+                                self.files_count += len(semgrep_time.get('targets', []))
+                                self.profiler.add_semgrep_time(self.parser, semgrep_time)
+
+                    else:
+                        logger.error(f"Failed {self.parser} scan for {source_folder}: {result.stderr}")
+
+                except subprocess.TimeoutExpired:
+                    self.skipped_files += len(chunk)
+                    logger.warning(f"Time budget is over, {self.parser} scan stopped with {len(chunk)} files unscanned")
+
+                except Exception as ex:
+                    logger.error(f"Failed {self.parser} scan for {source_folder}: {ex}")
+
+    def find_files(self, extensions: List[str]) -> List[str]:
+
+        files = self.file_filter.find_files(extensions, self.parser)
+        self.files_count = len(files)
+
+        return files
+
+    def read_contents(self, files: List[str]) -> List[bytes]:
+
+        # contents of archive and git sources are read here, files of folder by extract functions
+        if self.file_filter.source is None:
+            return [None] * len(files)
+
+        return self.file_filter.source.read_many([self.file_filter.rel_path(file) for file in files])
+
+    def map_files(self, extract_func, files: List[str]) -> List:
+
+        # extract_func(file_path, local_file, content) must be module level to run in worker processes
+        local_files = [file.replace(self.source_folder, '') for file in files]
+
+        mapper = self.map_cached_files if self.content_cache is not None else self.map_local_files
+
+        if self.deadline is not None:
+            return self.map_budget_files(mapper, extract_func, files, local_files)
+
+        return mapper(extract_func, files, local_files, self.read_contents(files))
+
+    def read_file(self, read_func, file: str, local_file: str):
+
+        # parsed file of global view parser, same content is parsed once per process with content cache
+        content = self.read_contents([file])[0]
+
+        if self.content_cache is None:
+            return read_func(file, content)
+
+        key = ContentCache.key(read_func, file, local_file, content)
+        found, result = self.content_cache.get(key)
+
+        if not found:
+            result = read_func(file, content)
+            self.content_cache.put(key, result)
+
+        return result
+
+    def budget_over(self, files_left: int) -> bool:
+
+        # global view parsers check it before every file, types are resolved only between files read in time
+        if self.deadline is None or time.monotonic() <= self.deadline:
+            return False
+
+        self.skipped_files += files_left
+        logger.warning(f"Time budget is over, {self.parser} scan skipped {files_left} files")
+
+        return True
+
+    def map_budget_files(self, mapper, extract_func, files: List[str], local_files: List[str]) -> List:
+
+        # recently changed files first, files left after deadline get empty result
+        results = [[] for _ in files]
+        order = self.file_filter.recent_first(files)
+
+        for start in range(0, len(order), BUDGET_BATCH_FILES):
+
+            if time.monotonic() > self.deadline:
+                self.skipped_files += len(order) - start
+                logger.warning(f"Time budget is over, {self.parser} scan skipped {len(order) - start} files")
+                break
+
+            batch = order[start:start + BUDGET_BATCH_FILES]
+            batch_files = [files[index] for index in batch]
+
+            for index, result in zip(batch, mapper(extract_func, batch_files, [local_files[index] for index in batch], self.read_contents(batch_files))):
+                results[index] = result
+
+        return results
+
+    def map_cached_files(self, extract_func, files: List[str], local_files: List[str], contents: List[bytes]) -> List:
+
+        results = [None] * len(files)
+        missed = []
+
+        for index, (file, local_file, content) in enumerate(zip(files, local_files, contents)):
+
+            try:
+                key = ContentCache.key(extract_func, file, local_file, content)
+            except OSError:
+                key = None
+
+            found, result = self.content_cache.get(key) if key else (False, None)
+
+            if found:
+                results[index] = result
             else:
-                logger.error(f"Failed {self.parser} scan for {source_folder}: {result.stderr}")
-        
-        except Exception as ex:
-            logger.error(f"Failed {self.parser} scan for {source_folder}: {ex}")
-            
-        return None        
+                missed.append((index, key))
+
+        missed_results = self.map_local_files(extract_func, [files[index] for index, _ in missed], [local_files[index] for index, _ in missed],
+                                              [contents[index] for index, _ in missed])
+
+        for (index, key), result in zip(missed, missed_results):
+
+            results[index] = result
+
+            if key:
+                self.content_cache.put(key, result)
+
+        return results
+
+    def map_local_files(self, extract_func, files: List[str], local_files: List[str], contents: List[bytes]) -> List:
+
+        workers = min(os.cpu_count() or 1, len(files))
+
+        # forking from batch and serve worker threads may copy locks held by other threads
+        mp_context = multiprocessing.get_context('forkserver') if threading.current_thread() is not threading.main_thread() else None
+
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+                return list(executor.map(extract_func, files, local_files, contents, chunksize=max(1, len(files) // (workers * 4))))
 
+        return [extract_func(file, local_file, content) for file, local_file, content in zip(files, local_files, contents)]
 
     def calc_uniq_hash(self, prop_list: List[str]) -> str:
 
@@ -0,0 +1,62 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class ContentCache:
+
+    # results of native per file extractors by extractor, local path and content hash,
+    # shared by scans of one process (batch, serve), so same file in next repo or rescan is not parsed again.
+    # cached results are shared between scans and must not be changed by parsers
+
+    def __init__(self, max_entries: int = 200000):
+
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(extract_func, file: str, local_file: str, content: bytes = None):
+
+        # content is given for files of archive and git sources
+        if content is None:
+            with open(file, 'rb') as file_content:
+                content = file_content.read()
+
+        digest = hashlib.sha1(content).hexdigest()
+
+        return (extract_func.__module__, extract_func.__name__, local_file, digest)
+
+    def get(self, key):
+
+        with self.lock:
+
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, self.entries[key]
+
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+
+        with self.lock:
+
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
@@ -4,15 +4,15 @@ from typing import List
 from pathlib import Path
 
 from appsec_discovery.parsers import Parser
-from appsec_discovery.models import CodeObject
+from appsec_discovery.models.compact import CompactObject
 
 logger = logging.getLogger(__name__)
 
 class DbParser(Parser):
 
-    def run_scan(self) -> List[CodeObject]:
+    def run_scan(self) -> List[CompactObject]:
 
-        objects_list: List[CodeObject] = []
+        objects_list: List[CompactObject] = []
 
         parser_folder = str(Path(__file__).resolve().parent)
 
@@ -26,9 +26,9 @@ class DbParser(Parser):
         return objects_list
 
 
-    def parse_report(self, semgrep_data) -> List[CodeObject]:
+    def parse_report(self, semgrep_data) -> List[CompactObject]:
 
-        parsed_objects: List[CodeObject] = []
+        parsed_objects: List[CompactObject] = []
 
 
         logger.info(f"For scan {self.parser} data parse {len(parsed_objects)} objects")
@@ -0,0 +1,476 @@
+import logging
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import subprocess
+from fnmatch import fnmatch
+from typing import List, Dict, Set, Tuple
+
+from appsec_discovery.models import ScanIgnore, ExcludeScan
+from appsec_discovery.sources import Source, decode_text
+
+logger = logging.getLogger(__name__)
+
+HEADER_SIZE = 1024
+
+# commits looked at for recently changed files
+RECENT_COMMITS = 200
+
+
+def match_pattern(pattern: str, value: str) -> bool:
+    # same matching as exclude_scan filter of scan service: regex from start or substring
+    return bool(re.match(pattern, value)) or pattern.lower() in value.lower()
+
+
+def in_shard(local_file: str, shard: Tuple[int, int]) -> bool:
+    # shard of file depends only on its path relative to source folder
+    index, count = shard
+    return int(hashlib.md5(local_file.encode('utf-8')).hexdigest(), 16) % count == index
+
+
+def is_file_exclude(exclude: ExcludeScan) -> bool:
+    return bool(exclude.file) and exclude.object_name is None and exclude.object_type is None
+
+
+class FileFilter:
+
+    # one walk of source folder shared by all parsers of a scan, native walkers
+    # take files from it and semgrep gets same dirs, patterns and size limit,
+    # archive and git sources are listed instead of walked and read through source
+
+    def __init__(self, source_folder: str, ignore: ScanIgnore = None, exclude_scan: List[ExcludeScan] = None, only_files: List[str] = None, shard: Tuple[int, int] = None,
+                 source: Source = None):
+
+        self.source_folder = source_folder
+        self.source = source
+        self.ignore = ignore if ignore else ScanIgnore()
+
+        # paths relative to source folder, when set nothing else is walked
+        self.only_files = set(file.lstrip('/') for file in only_files) if only_files is not None else None
+
+        # (index, count) keeps accepted files of one shard, same on every machine
+        self.shard = shard
+
+        # file only exclude_scan entries, for all parsers are applied during walk
+        file_excludes = [exclude for exclude in (exclude_scan or []) if is_file_exclude(exclude)]
+
+        self.exclude_files = [exclude.file for exclude in file_excludes if exclude.parser is None]
+        self.parser_exclude_files: Dict[str, List[str]] = {}
+
+        for exclude in file_excludes:
+            if exclude.parser is not None:
+                self.parser_exclude_files.setdefault(exclude.parser.lower(), []).append(exclude.file)
+
+        self.excluded_dirs: List[str] = []
+
+        self.generated_re = re.compile('|'.join(f"(?:{marker})" for marker in self.ignore.generated_markers)) if self.ignore.generated_markers else None
+
+        self.accepted_files: List[str] = None
+        self.local_files: Set[str] = set()
+
+        # recently changed files for time budgeted scans
+        self.recent_ranks: Dict[str, int] = None
+
+        # untracked ignored paths for watched_dir
+        self.watch_ignored: Set[str] = None
+
+        # temp folder with files of archive or git source written for semgrep
+        self.materialized_folder: str = None
+        self.materialized: Set[str] = set()
+
+        # reason => [files, bytes], skipped folders are not walked so have no size
+        self.skipped: Dict[str, List[int]] = {}
+        self.skipped_dirs = 0
+
+    def git_ignored(self) -> Set[str]:
+
+        # untracked ignored paths relative to source folder, folders end with '/', archives and git trees have none
+        if self.source is not None:
+            return set()
+
+        try:
+            result = subprocess.run(
+                ["git", "-C", self.source_folder, "ls-files", "-z", "--others", "--ignored", "--exclude-standard", "--directory"],
+                capture_output=True,
+                text=True
+            )
+
+            if result.returncode == 0:
+                return set(path for path in result.stdout.split('\0') if path)
+
+        except Exception as ex:
+            logger.debug(f"Failed to read gitignore for {self.source_folder}: {ex}")
+
+        return set()
+
+    def check_ignored(self, local_files: Set[str]) -> Set[str]:
+
+        # listed untracked files matching gitignore, tracked files are never ignored like in full walk
+        if self.source is not None:
+            return set()
+
+        try:
+            result = subprocess.run(
+                ["git", "-C", self.source_folder, "check-ignore", "-z", "--stdin"],
+                input=''.join(f"{file}\0" for file in sorted(local_files)),
+                capture_output=True,
+                text=True
+            )
+
+            # exit code 1 means no ignored files
+            if result.returncode == 0:
+                return set(path for path in result.stdout.split('\0') if path)
+
+        except Exception as ex:
+            logger.debug(f"Failed to check gitignore for {self.source_folder}: {ex}")
+
+        return set()
+
+    def watched_dir(self, local_dir: str) -> bool:
+
+        # folders walked by full scan, for watch mode, local_dir is relative to source folder without slashes around
+        if self.watch_ignored is None:
+            self.watch_ignored = self.git_ignored() if self.ignore.gitignore else set()
+
+        return not (
+            any(fnmatch(os.path.basename(local_dir), pattern) for pattern in self.ignore.dirs)
+            or f"{local_dir}/" in self.watch_ignored
+            or any(match_pattern(pattern, f"/{local_dir}/") for pattern in self.exclude_files)
+        )
+
+    def rel_path(self, file_path: str) -> str:
+        return file_path.replace(self.source_folder, '').lstrip('/')
+
+    def read_bytes(self, file_path: str) -> bytes:
+
+        if self.source is not None:
+            return self.source.read(self.rel_path(file_path))
+
+        with open(file_path, 'rb') as file:
+            return file.read()
+
+    def file_size(self, file_path: str, rel_file: str) -> int:
+
+        if self.source is not None:
+            return self.source.files()[rel_file][0]
+
+        return os.path.getsize(file_path)
+
+    def file_mtime(self, file_path: str) -> float:
+
+        try:
+            if self.source is not None:
+                return self.source.files()[self.rel_path(file_path)][1]
+
+            return os.path.getmtime(file_path)
+
+        except (OSError, KeyError):
+            return 0
+
+    def is_generated(self, file_path: str) -> bool:
+
+        try:
+            if self.source is not None:
+                header = decode_text(self.read_bytes(file_path)[:HEADER_SIZE * 4], 'replace')[:HEADER_SIZE]
+            else:
+                with open(file_path, encoding='utf-8', errors='replace') as file:
+                    header = file.read(HEADER_SIZE)
+
+            return bool(self.generated_re.search(header))
+
+        except Exception:
+            return False
+
+    def skip(self, reason: str, size: int):
+
+        stats = self.skipped.setdefault(reason, [0, 0])
+        stats[0] += 1
+        stats[1] += size
+
+    def source_files(self):
+
+        # files of archive or git source with same folder rules as walk, files of skipped folders are not counted
+        skipped_dirs = set()
+
+        for rel_file in sorted(self.source.files()):
+
+            folders = rel_file.split('/')[:-1]
+            skipped = False
+
+            for depth, folder in enumerate(folders):
+
+                local_dir = '/'.join(folders[:depth + 1])
+
+                if local_dir in skipped_dirs:
+                    skipped = True
+                    break
+
+                if any(fnmatch(folder, pattern) for pattern in self.ignore.dirs):
+                    skipped_dirs.add(local_dir)
+                    self.skipped_dirs += 1
+                    skipped = True
+                    break
+
+                if any(match_pattern(pattern, f"/{local_dir}/") for pattern in self.exclude_files):
+                    skipped_dirs.add(local_dir)
+                    self.skipped_dirs += 1
+                    self.excluded_dirs.append(local_dir)
+                    skipped = True
+                    break
+
+            if not skipped:
+                yield os.path.join(self.source_folder, rel_file), rel_file
+
+    def walked_files(self, git_ignored: Set[str]):
+
+        # (file path, path relative to source folder), ignored folders are not walked
+        if self.source is not None:
+            yield from self.source_files()
+            return
+
+        for root, dirs, files in os.walk(self.source_folder):
+
+            rel_root = os.path.relpath(root, self.source_folder)
+            rel_root = '' if rel_root == '.' else rel_root.replace(os.sep, '/') + '/'
+
+            kept_dirs = []
+
+            for folder in dirs:
+
+                local_dir = os.path.join(root, folder).replace(self.source_folder, '') + '/'
+
+                if any(fnmatch(folder, pattern) for pattern in self.ignore.dirs) or f"{rel_root}{folder}/" in git_ignored:
+                    self.skipped_dirs += 1
+                elif any(match_pattern(pattern, local_dir) for pattern in self.exclude_files):
+                    self.skipped_dirs += 1
+                    self.excluded_dirs.append(f"{rel_root}{folder}")
+                else:
+                    kept_dirs.append(folder)
+
+            dirs[:] = kept_dirs
+
+            for file in files:
+                yield os.path.join(root, file), f"{rel_root}{file}"
+
+    def listed_files(self):
+
+        # only given files, e.g. changed in git diff, folders are checked by path parts
+        for rel_file in sorted(self.only_files):
+
+            file_path = os.path.join(self.source_folder, rel_file)
+            folders = rel_file.split('/')[:-1]
+
+            if not (rel_file in self.source.files() if self.source is not None else os.path.isfile(file_path)):
+                continue
+
+            if any(fnmatch(folder, pattern) for folder in folders for pattern in self.ignore.dirs):
+                self.skip('pattern', self.file_size(file_path, rel_file))
+                continue
+
+            yield file_path, rel_file
+
+    def files(self) -> List[str]:
+
+        if self.accepted_files is not None:
+            return self.accepted_files
+
+        accepted_files = []
+
+        if self.only_files is not None:
+            candidates = self.listed_files()
+            git_ignored = self.check_ignored(self.only_files) if self.ignore.gitignore else set()
+        else:
+            git_ignored = self.git_ignored() if self.ignore.gitignore else set()
+            candidates = self.walked_files(git_ignored)
+
+        for file_path, rel_file in candidates:
+
+            try:
+                size = self.file_size(file_path, rel_file)
+            except OSError:
+                continue
+
+            if any(fnmatch(os.path.basename(file_path), pattern) for pattern in self.ignore.files):
+                self.skip('pattern', size)
+            elif any(match_pattern(pattern, file_path.replace(self.source_folder, '')) for pattern in self.exclude_files):
+                self.skip('exclude_scan', size)
+            elif rel_file in git_ignored:
+                self.skip('gitignore', size)
+            elif self.ignore.size_limit(file_path) and size > self.ignore.size_limit(file_path):
+
+                # spec files are not capped by default, skipped spec loses all its objects
+                if self.ignore.size_limit(file_path) == self.ignore.max_spec_size:
+                    logger.warning(f"Skipped {rel_file}, spec file size {size} is over max_spec_size {self.ignore.max_spec_size}")
+
+                self.skip('size', size)
+            elif self.generated_re and self.is_generated(file_path):
+                self.skip('generated', size)
+            else:
+                accepted_files.append(file_path)
+
+        if self.shard:
+            accepted_files = [file for file in accepted_files if in_shard(file.replace(self.source_folder, '').lstrip('/'), self.shard)]
+
+        self.accepted_files = sorted(accepted_files)
+        self.local_files = set(file.replace(self.source_folder, '').lstrip('/') for file in self.accepted_files)
+
+        self.log_skipped()
+
+        return self.accepted_files
+
+    def parser_excluded(self, local_file: str, parser: str = None) -> bool:
+        return parser is not None and any(match_pattern(pattern, local_file) for pattern in self.parser_exclude_files.get(parser.lower(), []))
+
+    def find_files(self, extensions: List[str], parser: str = None) -> List[str]:
+
+        return [
+            file for file in self.files()
+            if file.endswith(tuple(extensions))
+            and not self.parser_excluded(file.replace(self.source_folder, ''), parser)
+        ]
+
+    def is_accepted(self, local_file: str, parser: str = None) -> bool:
+        self.files()
+        return local_file.lstrip('/') in self.local_files and not self.parser_excluded(local_file, parser)
+
+    def semgrep_targets(self, extensions: List[str] = None) -> List[str]:
+
+        files = self.find_files(extensions) if extensions else self.files()
+
+        # no files for rule languages, semgrep start can be skipped
+        if not files:
+            return []
+
+        # explicit file list keeps semgrep away from unchanged files and files of other shards,
+        # files of archive and git sources are written to temp folder first
+        if self.only_files is not None or self.shard or self.source is not None:
+            return files
+
+        return [self.source_folder]
+
+    def recent_changes(self) -> Dict[str, int]:
+
+        # local path => rank, uncommitted changes first, then files of last commits, newest first
+        if self.recent_ranks is not None:
+            return self.recent_ranks
+
+        self.recent_ranks = {}
+
+        commands = [
+            ["diff", "--name-only", "--relative", "HEAD"],
+            ["ls-files", "--others", "--exclude-standard"],
+            ["log", "--name-only", "--relative", "--format=", f"-n{RECENT_COMMITS}"],
+        ]
+
+        # git source has no worktree changes, archives have no history
+        if self.source is not None:
+            commands = [["log", "--name-only", "--relative", "--format=", f"-n{RECENT_COMMITS}", self.source.git_ref]] if self.source.git_ref else []
+
+        for command in commands:
+
+            try:
+                result = subprocess.run(["git", "-c", "core.quotePath=false", "-C", self.source_folder] + command + ["--", "."], capture_output=True, text=True)
+            except Exception as ex:
+                logger.debug(f"Failed to read recent changes of {self.source_folder}: {ex}")
+                break
+
+            if result.returncode != 0:
+                break
+
+            for path in result.stdout.splitlines():
+                if path and path not in self.recent_ranks:
+                    self.recent_ranks[path] = len(self.recent_ranks)
+
+        return self.recent_ranks
+
+    def recent_first(self, files: List[str]) -> List[int]:
+
+        # indexes of files in order of time budgeted scan, files out of git history by modification time
+        ranks = self.recent_changes()
+
+        keys = [(ranks.get(self.rel_path(file), len(ranks)), -self.file_mtime(file)) for file in files]
+
+        return sorted(range(len(files)), key=lambda index: keys[index])
+
+    def checked_path(self, folder: str, rel_file: str) -> str:
+
+        # listed paths are already normalized by source, checked again before anything is written or scanned
+        path = os.path.join(folder, rel_file)
+        real_folder = os.path.realpath(folder)
+
+        if os.path.commonpath([real_folder, os.path.realpath(path)]) != real_folder:
+            raise Exception(f"File {rel_file} of {self.source_folder} is outside of source root")
+
+        return path
+
+    def materialize(self, files: List[str]) -> Tuple[str, List[str]]:
+
+        # files of tar source are already on disk, read from stream into temp folder
+        if self.source is not None and self.source.files() is not None and self.source.folder is not None:
+            return self.source.folder, [self.checked_path(self.source.folder, self.rel_path(file)) for file in files]
+
+        # files of zip or git source written once per scan to temp folder under same local paths
+        if self.materialized_folder is None:
+            self.materialized_folder = tempfile.mkdtemp(prefix='appsec-discovery-source-')
+
+        paths = []
+
+        for file in files:
+
+            rel_file = self.rel_path(file)
+            path = self.checked_path(self.materialized_folder, rel_file)
+
+            if rel_file not in self.materialized:
+
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+
+                with open(path, 'wb') as materialized_file:
+                    materialized_file.write(self.read_bytes(file))
+
+                self.materialized.add(rel_file)
+
+            paths.append(path)
+
+        logger.info(f"Materialized {len(self.materialized)} files of {self.source_folder} in {self.materialized_folder}")
+
+        return self.materialized_folder, paths
+
+    def cleanup(self):
+
+        if self.materialized_folder is not None:
+            shutil.rmtree(self.materialized_folder, ignore_errors=True)
+            self.materialized_folder = None
+            self.materialized = set()
+
+    def semgrep_args(self) -> List[str]:
+
+        args = []
+
+        # folders pruned by exclude_scan are known only after walk
+        self.files()
+
+        # materialized files are already filtered, temp folder is no git repo
+        if self.source is not None:
+            return ["--no-git-ignore"]
+
+        for pattern in self.ignore.dirs + self.ignore.files + self.excluded_dirs:
+            args += ["--exclude", pattern]
+
+        if self.ignore.max_file_size:
+            args += ["--max-target-bytes", str(self.ignore.max_file_size)]
+
+        if not self.ignore.gitignore:
+            args.append("--no-git-ignore")
+
+        return args
+
+    def log_skipped(self):
+
+        files = sum(stats[0] for stats in self.skipped.values())
+        size = sum(stats[1] for stats in self.skipped.values())
+
+        details = ", ".join(f"{reason} {stats[0]} files {stats[1]} bytes" for reason, stats in sorted(self.skipped.items()))
+
+        logger.info(f"Skipped {self.skipped_dirs} folders and {files} files ({size} bytes) in {self.source_folder}" + (f": {details}" if details else ""))
@@ -0,0 +1,226 @@
+import logging
+import re
+from typing import List, Dict
+from appsec_discovery.sources import decode_text
+
+logger = logging.getLogger(__name__)
+
+# Native counterpart of scanner_rules/dto.yaml: lexes struct declarations and emits
+# semgrep shaped findings, so GolangParser.parse_report builds identical objects.
+
+# same type filter as dto-struct-data-object rule, matched from first type token start
+TYPE_RE = re.compile(r'(bool|string|int|int8|int16|int32|int64|uint|uint8|uint16|uint32|uint64|time|float32|float64|byte)')
+
+TOKEN_RE = re.compile(r'''
+    (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<string>`[^`]*`|"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+  | (?P<ident>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<newline>\n)
+  | (?P<punct>\S)
+''', re.S | re.X)
+
+
+def tokenize(source: str):
+
+    # (kind, value, line), comments are dropped and newlines kept as statement separators
+    tokens = []
+    line = 1
+
+    for match in TOKEN_RE.finditer(source):
+
+        kind = match.lastgroup
+        value = match.group()
+
+        if kind == 'newline':
+            tokens.append(('sep', value, line))
+        elif kind == 'comment':
+            if '\n' in value:
+                tokens.append(('sep', '\n', line))
+        else:
+            tokens.append((kind, value, line))
+
+        line += value.count('\n')
+
+    return tokens
+
+
+class FileExtractor:
+
+    def __init__(self, source: str, local_file: str):
+
+        self.tokens = tokenize(source)
+        self.local_file = local_file
+        self.findings = []
+
+    def skip_group(self, pos: int) -> int:
+
+        # pos at opening bracket, returns position after matching close
+        pairs = {'{': '}', '(': ')', '[': ']'}
+        stack = [pairs[self.tokens[pos][1]]]
+        pos += 1
+
+        while pos < len(self.tokens) and stack:
+
+            value = self.tokens[pos][1]
+
+            if value in pairs:
+                stack.append(pairs[value])
+            elif value == stack[-1]:
+                stack.pop()
+
+            pos += 1
+
+        return pos
+
+    def next_token(self, pos: int) -> int:
+
+        while pos < len(self.tokens) and self.tokens[pos][0] == 'sep':
+            pos += 1
+
+        return pos
+
+    def value(self, pos: int) -> str:
+        return self.tokens[pos][1] if pos < len(self.tokens) else ''
+
+    def extract(self) -> List[Dict]:
+
+        pos = 0
+
+        while pos < len(self.tokens):
+
+            if self.tokens[pos][0] == 'ident' and self.tokens[pos][1] == 'type':
+
+                pos = self.next_token(pos + 1)
+
+                # type ( A struct {...}; B struct {...} )
+                if self.value(pos) == '(':
+
+                    end = self.skip_group(pos)
+                    pos = self.next_token(pos + 1)
+
+                    while pos < end - 1:
+                        pos = self.type_spec(pos)
+                        pos = self.next_token(pos)
+
+                    pos = end
+
+                else:
+                    pos = self.type_spec(pos)
+
+            else:
+                pos += 1
+
+        return self.findings
+
+    def type_spec(self, pos: int) -> int:
+
+        # Name [type params] struct { ... }
+        if pos >= len(self.tokens) or self.tokens[pos][0] != 'ident':
+            return pos + 1
+
+        object_name = self.tokens[pos][1]
+        pos = self.next_token(pos + 1)
+
+        if self.value(pos) == '[':
+            params_end = self.skip_group(pos)
+            if self.value(self.next_token(params_end)) == 'struct':
+                pos = self.next_token(params_end)
+
+        if self.value(pos) == 'struct' and self.value(self.next_token(pos + 1)) == '{':
+            body_start = self.next_token(pos + 1)
+            body_end = self.skip_group(body_start)
+            self.struct_body(object_name, body_start + 1, body_end - 1)
+            return body_end
+
+        return pos + 1
+
+    def struct_body(self, object_name: str, start: int, end: int):
+
+        decl = []
+        pos = start
+
+        while pos < end:
+
+            token = self.tokens[pos]
+
+            # nested anonymous struct fields belong to parent object, same as semgrep generic match
+            if token[1] == 'struct' and self.value(self.next_token(pos + 1)) == '{':
+                nested_start = self.next_token(pos + 1)
+                nested_end = self.skip_group(nested_start)
+                self.struct_body(object_name, nested_start + 1, nested_end - 1)
+                decl = []
+                pos = nested_end
+                continue
+
+            if token[0] == 'sep' or token[1] == ';':
+                self.field_decl(object_name, decl)
+                decl = []
+            elif token[0] != 'string':
+                decl.append(token)
+
+            pos += 1
+
+        self.field_decl(object_name, decl)
+
+    def field_decl(self, object_name: str, decl):
+
+        # Name1, Name2 *[]pkg.Type, embedded fields have no separate name
+        names = []
+        pos = 0
+
+        while pos < len(decl) and decl[pos][0] == 'ident':
+
+            names.append(decl[pos])
+            pos += 1
+
+            if pos < len(decl) and decl[pos][1] == ',':
+                pos += 1
+            else:
+                break
+
+        type_tokens = decl[pos:]
+
+        if not names or not type_tokens or type_tokens[0][1] == '.':
+            return
+
+        # strip pointers, slices and arrays: *string, []byte, [16]byte
+        while type_tokens and type_tokens[0][1] in ['*', '[']:
+            if type_tokens[0][1] == '[':
+                close = next((i for i, token in enumerate(type_tokens) if token[1] == ']'), len(type_tokens))
+                type_tokens = type_tokens[close + 1:]
+            else:
+                type_tokens = type_tokens[1:]
+
+        if not type_tokens or type_tokens[0][0] != 'ident' or not TYPE_RE.match(type_tokens[0][1]):
+            return
+
+        for name in names:
+            self.findings.append({
+                'check_id': 'dto-struct-data-object',
+                'path': self.local_file,
+                'start': {'line': name[2]},
+                'extra': {
+                    'metavars': {
+                        '$FIELD': {'abstract_content': name[1]},
+                        '$OBJECT': {'abstract_content': object_name},
+                        '$TYPE': {'abstract_content': type_tokens[0][1]},
+                    }
+                }
+            })
+
+
+def extract_file(file_path: str, local_file: str, content: bytes = None) -> List[Dict]:
+
+    try:
+        if content is not None:
+            source = decode_text(content, 'replace')
+        else:
+            with open(file_path, encoding='utf-8', errors='replace') as file:
+                source = file.read()
+
+        return FileExtractor(source, local_file).extract()
+
+    except Exception as ex:
+        logger.error(f"Failed to parse golang file {local_file}: {ex}")
+
+    return []
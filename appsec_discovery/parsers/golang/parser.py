@@ -4,15 +4,24 @@ from typing import List, Dict
 from pathlib import Path
 
 from appsec_discovery.parsers import Parser
-from appsec_discovery.models import CodeObject, CodeObjectField, CodeObjectProp
+from appsec_discovery.parsers.golang.go_extractor import extract_file
+from appsec_discovery.models.compact import CompactObject, CompactField, CompactProp
 
 logger = logging.getLogger(__name__)
 
+# tests are not own DTOs, vendored and generated code is skipped by file filter
+skip_suffixes = ('_test.go',)
+
 class GolangParser(Parser):
 
-    def run_scan(self) -> List[CodeObject]:
+    semgrep_extensions = ['.go']
+
+    def run_scan(self) -> List[CompactObject]:
+
+        objects_list: List[CompactObject] = []
 
-        objects_list: List[CodeObject] = []
+        if self.config.engine == 'native':
+            return self.parse_report(self.run_native())
 
         parser_folder = str(Path(__file__).resolve().parent)
 
@@ -26,10 +35,22 @@ class GolangParser(Parser):
         return objects_list
 
 
-    def parse_report(self, semgrep_data) -> List[CodeObject]:
+    def run_native(self):
+
+        logger.info(f"Start {self.parser} native scan for {self.source_folder}")
+
+        go_files = [file for file in self.find_files(['.go']) if not file.endswith(skip_suffixes)]
+
+        findings = [finding for file_findings in self.map_files(extract_file, go_files) for finding in file_findings]
+
+        logger.info(f"End {self.parser} native scan for {self.source_folder}, found {len(findings)} rule hits")
+
+        return findings
+
+    def parse_report(self, semgrep_data) -> List[CompactObject]:
 
-        parsed_objects: List[CodeObject] = []
-        parsed_objects_dict: Dict[str, CodeObject] = {}
+        parsed_objects: List[CompactObject] = []
+        parsed_objects_dict: Dict[str, CompactObject] = {}
         parsed_fields_dict = {}
 
         for finding in semgrep_data:
@@ -42,7 +63,7 @@ class GolangParser(Parser):
             object_type = None
 
             # parse dto rules
-            if rule_id.startswith("dto-"):
+            if rule_id.startswith("dto-") and self.wants_type("dto"):
 
                 object_type="dto"
                 orm_type = rule_id.split('-')[1]
@@ -56,7 +77,7 @@ class GolangParser(Parser):
 
                 if hash_key not in parsed_objects_dict:
 
-                    parsed_objects_dict[hash_key] = CodeObject(
+                    parsed_objects_dict[hash_key] = CompactObject(
                         hash=hash_key,
                         object_name=f"{orm_type.title()} {object_type} {object}",
                         object_type=object_type,
@@ -67,19 +88,19 @@ class GolangParser(Parser):
                         fields={}
                     )
 
-                    parsed_objects_dict[hash_key].properties['framework'] = CodeObjectProp(
+                    parsed_objects_dict[hash_key].properties['framework'] = CompactProp(
                         prop_name='framework',
                         prop_value=orm_type
                     )
 
-                    parsed_objects_dict[hash_key].properties['object'] = CodeObjectProp(
+                    parsed_objects_dict[hash_key].properties['object'] = CompactProp(
                         prop_name='object',
                         prop_value=object
                     )
 
                 if field_hash_key not in parsed_fields_dict:
 
-                    parsed_field = CodeObjectField(
+                    parsed_field = CompactField(
                         field_name=field_name,
                         field_type=field_type,
                         file=finding_file,
@@ -1,39 +1,47 @@
 import logging
-import os
 from typing import List
 import graphql
 
 from appsec_discovery.parsers import Parser
-from appsec_discovery.models import CodeObject, CodeObjectField
+from appsec_discovery.models.compact import CompactObject, CompactField, FieldTables
+from appsec_discovery.sources import decode_text
 
 logger = logging.getLogger(__name__)
 
+
+def read_graphql(file_path: str, content: bytes = None):
+
+    if content is not None:
+        return graphql.parse(decode_text(content), no_location=False)
+
+    with open(file_path) as file:
+        return graphql.parse(file.read(), no_location=False)
+
+
 class GraphqlParser(Parser):
 
-    def find_graphql_files(self, root_dir):
-        graphql_files = []
-        for root, _, files in os.walk(root_dir):
-            for file in files:
-                if file.endswith('.graphql'):
-                    graphql_files.append(os.path.join(root, file))
-        return sorted(graphql_files)
+    global_view = True
+    input_extensions = ['.graphql']
 
+    def run_scan(self) -> List[CompactObject]:
 
-    def run_scan(self) -> List[CodeObject]:
+        objects_list: List[CompactObject] = []
 
-        objects_list: List[CodeObject] = []
+        if not self.wants_type('query') and not self.wants_type('mutation'):
+            return objects_list
 
-        gql_files = self.find_graphql_files(self.source_folder)
+        gql_files = self.input_files()
         gql_data = {}
 
-        for gql_file in gql_files:
+        for index, gql_file in enumerate(gql_files):
+
+            if self.budget_over(len(gql_files) - index):
+                break
 
             local_gql_file = gql_file.replace(self.source_folder, "")
 
             try:
-                with open(gql_file) as file:
-                    file_str = file.read()
-                    gql_data[local_gql_file] = graphql.parse(file_str, no_location=False)
+                gql_data[local_gql_file] = self.read_file(read_graphql, gql_file, local_gql_file)
             except Exception as ex:
                 pass
                 # logger.error(f"Failed to parse {self.parser} for file {local_gql_file}: {ex}")
@@ -73,14 +81,39 @@ class GraphqlParser(Parser):
 
         return resolved_fields
 
-    def parse_report(self, gql_data) -> List[CodeObject]:
+    def resolved_table(self, prefix, type_name, types_dict, types_path):
+
+        # fields of input or output type, built once for all operations using it
+        key = (prefix, type_name, tuple(types_path))
+
+        if key not in self.resolved_tables:
+
+            table = {}
+
+            for resolved_name, resolved in self.resolve_fields(type_name, types_dict, 0, types_path).items():
+
+                table[f"{prefix}.{resolved_name}"] = CompactField(
+                    field_name=f"{prefix}.{resolved_name}",
+                    field_type=resolved['type'],
+                    file=resolved['file'],
+                    line=resolved['line']
+                )
+
+            self.resolved_tables[key] = self.field_tables.share(table)
 
-        parsed_objects: List[CodeObject] = []
+        return self.resolved_tables[key]
+
+    def parse_report(self, gql_data) -> List[CompactObject]:
+
+        parsed_objects: List[CompactObject] = []
 
         extend_types = {}
 
         types = {}
 
+        self.resolved_tables = {}
+        self.field_tables = FieldTables()
+
         for file, file_gql in gql_data.items():
 
             for type_def in file_gql.definitions:
@@ -157,49 +190,12 @@ class GraphqlParser(Parser):
                                 if mutation_field['output'] == type_name:
                                     gql_type = 'Mutation'
 
-                        result_fields = {}
-
-                        for input_name, input_type in field['inputs'].items():
-
-                            if input_type in types and types[input_type]['fields']:
-
-                                inputs_resolved = self.resolve_fields(input_type, types, 0, [input_type])
-
-                                for input_resolved_name, input_resolved in inputs_resolved.items():
-
-                                    if 'referralReward' in input_resolved_name:
-                                        pass
-
-                                    result_fields[f"{input_name}.{input_resolved_name}"] = input_resolved
-                            else:
-
-                                result_fields[f"{input_name}"] = {
-                                    'type': input_type,
-                                    'file': field['file'],
-                                    'line': field['line'],
-                                }
-
-                        if field['output'] in types and types[field['output']]['fields'] :
-
-                            outputs_resolved = self.resolve_fields(field['output'], types, 0, [input_type])
-
-                            for output_resolved_name, output_resolved in outputs_resolved.items():
-
-                                if 'referralReward' in output_resolved_name:
-                                    pass
-
-                                result_fields[f"output.{output_resolved_name}"] = output_resolved
-
-                        else:
-                            result_fields["output"] = {
-                                'type': field['output'],
-                                'file': field['file'],
-                                'line': field['line'],
-                            }
+                        if not self.wants_type(gql_type.lower()):
+                            continue
 
                         unique_hash = self.calc_uniq_hash([field_name, gql_type, field['file']])
 
-                        code_object = CodeObject(
+                        code_object = CompactObject(
                             hash=unique_hash,
                             object_name=f"{gql_type} {gql_name}",
                             object_type=gql_type.lower(),
@@ -210,12 +206,31 @@ class GraphqlParser(Parser):
                             fields={}
                         )
 
-                        for result_field_name, result_field in result_fields.items():
-                            code_object.fields[result_field_name] = CodeObjectField(
-                                field_name=result_field_name,
-                                field_type=result_field['type'],
-                                file=result_field['file'],
-                                line=result_field['line']
+                        for input_name, input_type in field['inputs'].items():
+
+                            if input_type in types and types[input_type]['fields']:
+
+                                code_object.fields.update(self.resolved_table(input_name, input_type, types, [input_type]))
+
+                            else:
+
+                                code_object.fields[f"{input_name}"] = CompactField(
+                                    field_name=f"{input_name}",
+                                    field_type=input_type,
+                                    file=field['file'],
+                                    line=field['line']
+                                )
+
+                        if field['output'] in types and types[field['output']]['fields'] :
+
+                            code_object.fields.update(self.resolved_table('output', field['output'], types, [input_type]))
+
+                        else:
+                            code_object.fields["output"] = CompactField(
+                                field_name="output",
+                                field_type=field['output'],
+                                file=field['file'],
+                                line=field['line']
                             )
 
                         parsed_objects.append(code_object)
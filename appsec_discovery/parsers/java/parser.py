@@ -4,15 +4,17 @@ from typing import List, Dict
 from pathlib import Path
 
 from appsec_discovery.parsers import Parser
-from appsec_discovery.models import CodeObject, CodeObjectProp, CodeObjectField
+from appsec_discovery.models.compact import CompactObject, CompactProp, CompactField
 
 logger = logging.getLogger(__name__)
 
 class JavaParser(Parser):
 
-    def run_scan(self) -> List[CodeObject]:
+    semgrep_extensions = ['.java']
 
-        objects_list: List[CodeObject] = []
+    def run_scan(self) -> List[CompactObject]:
+
+        objects_list: List[CompactObject] = []
 
         parser_folder = str(Path(__file__).resolve().parent)
 
@@ -26,10 +28,10 @@ class JavaParser(Parser):
         return objects_list
 
 
-    def parse_report(self, semgrep_data) -> List[CodeObject]:
+    def parse_report(self, semgrep_data) -> List[CompactObject]:
 
-        parsed_objects: List[CodeObject] = []
-        parsed_objects_dict: Dict[str, CodeObject] = {}
+        parsed_objects: List[CompactObject] = []
+        parsed_objects_dict: Dict[str, CompactObject] = {}
         parsed_fields_dict = {}
 
         for finding in semgrep_data:
@@ -42,7 +44,7 @@ class JavaParser(Parser):
             object_type = None
 
             # parse dto rules
-            if rule_id.startswith("dto-"):
+            if rule_id.startswith("dto-") and self.wants_type("dto"):
 
                 object_type="dto"
                 orm_type = rule_id.split('-')[1]
@@ -57,7 +59,7 @@ class JavaParser(Parser):
 
                 if hash_key not in parsed_objects_dict:
 
-                    parsed_objects_dict[hash_key] = CodeObject(
+                    parsed_objects_dict[hash_key] = CompactObject(
                         hash=hash_key,
                         object_name=f"{orm_type.title()} {object_type} {object}",
                         object_type=object_type,
@@ -68,26 +70,26 @@ class JavaParser(Parser):
                         fields={}
                     )
 
-                    parsed_objects_dict[hash_key].properties['framework'] = CodeObjectProp(
+                    parsed_objects_dict[hash_key].properties['framework'] = CompactProp(
                         prop_name='framework',
                         prop_value=orm_type
                     )
 
    
-                    parsed_objects_dict[hash_key].properties['object'] = CodeObjectProp(
+                    parsed_objects_dict[hash_key].properties['object'] = CompactProp(
                         prop_name='object',
                         prop_value=object
                     )
 
                     if db_table:
-                        parsed_objects_dict[hash_key].properties['db_table'] = CodeObjectProp(
+                        parsed_objects_dict[hash_key].properties['db_table'] = CompactProp(
                             prop_name='db_table',
                             prop_value=db_table
                         )
 
                 if field_hash_key not in parsed_fields_dict:
 
-                    parsed_field = CodeObjectField(
+                    parsed_field = CompactField(
                         field_name=db_field,
                         field_type=field_type,
                         file=finding_file,
@@ -1,19 +1,26 @@
 import logging
 import os
+import re
 from typing import List, Dict
 from pathlib import Path
 
 from appsec_discovery.parsers import Parser
-from appsec_discovery.models import CodeObject, CodeObjectProp
+from appsec_discovery.models.compact import CompactObject, CompactProp
 
 logger = logging.getLogger(__name__)
 
+BRACKETS_RE = re.compile(r'[{}()]')
+BRACKETS_START_RE = re.compile(r'[({]')
+
 
 class JsGqlParser(Parser):
 
-    def run_scan(self) -> List[CodeObject]:
+    rule_types = {'query.yaml': ['js-gql-query', 'js-gql-mutation']}
+    semgrep_extensions = ['.js', '.jsx', '.mjs', '.cjs', '.ts', '.tsx']
+
+    def run_scan(self) -> List[CompactObject]:
 
-        objects_list: List[CodeObject] = []
+        objects_list: List[CompactObject] = []
 
         parser_folder = str(Path(__file__).resolve().parent)
 
@@ -27,10 +34,10 @@ class JsGqlParser(Parser):
         return objects_list
 
 
-    def parse_report(self, semgrep_data) -> List[CodeObject]:
+    def parse_report(self, semgrep_data) -> List[CompactObject]:
 
-        parsed_objects: List[CodeObject] = []
-        parsed_objects_dict: Dict[str, CodeObject] = {}
+        parsed_objects: List[CompactObject] = []
+        parsed_objects_dict: Dict[str, CompactObject] = {}
 
         for finding in semgrep_data:
 
@@ -45,29 +52,14 @@ class JsGqlParser(Parser):
             if rule_id.startswith("js-graphql-queries"):
 
                 request = finding.get('extra').get('metavars').get('$QUERY', {}).get('abstract_content',"").strip()
-                
-                # get only queries and mutations, no fragments
-                # mutation ContractorCreateMutation($input: CreateContractorInput!) vs query OkfsCodesQuery {
-                
-                if ('query' in request.lower() or 'mutation' in request.lower()) and not 'fragment ' in request.lower() :
-
-                    if len(request.split('(')[0]) < len(request.split('{')[0]):
-                        req_name = request.split('(')[0].strip()
-                    else:
-                        req_name = request.split('{')[0].strip()
-
-                    gql_type = req_name.split(' ')[0].lower()  # mutation ContractorCreateMutation => mutation
 
-                    req_name = req_name.split(' ')[-1]
+                operation = self.extract_operation(request)
 
-                    resolvers = self.find_resolvers(request)
+                if operation and self.wants_type(f"js-gql-{operation[0]}"):
 
-                    for resolver in resolvers:
+                    gql_type, req_name, resolvers = operation
 
-                        if len(resolver.split('(')[0]) < len(resolver.split('{')[0]):
-                            resolver_name = resolver.split('(')[0].strip()
-                        else:
-                            resolver_name = resolver.split('{')[0].strip()
+                    for resolver_name, resolver in resolvers:
 
                         object_type=f"js-gql-{gql_type}"
                         object_name = f"JS GQL Resolver {resolver_name} in {gql_type} {req_name}"
@@ -76,7 +68,7 @@ class JsGqlParser(Parser):
 
                         if hash_key not in parsed_objects_dict:
 
-                            parsed_objects_dict[hash_key] = CodeObject(
+                            parsed_objects_dict[hash_key] = CompactObject(
                                 hash=hash_key,
                                 object_name=object_name,
                                 object_type=object_type,
@@ -87,22 +79,22 @@ class JsGqlParser(Parser):
                                 fields=[]
                             )
 
-                        parsed_objects_dict[hash_key].properties['request_name'] = CodeObjectProp(
+                        parsed_objects_dict[hash_key].properties['request_name'] = CompactProp(
                             prop_name='request_name',
                             prop_value=req_name
                         )
 
-                        parsed_objects_dict[hash_key].properties['request_text'] = CodeObjectProp(
+                        parsed_objects_dict[hash_key].properties['request_text'] = CompactProp(
                             prop_name='request_text',
                             prop_value=request
                         )
 
-                        parsed_objects_dict[hash_key].properties['resolver_name'] = CodeObjectProp(
+                        parsed_objects_dict[hash_key].properties['resolver_name'] = CompactProp(
                             prop_name='resolver_name',
                             prop_value=resolver_name
                         )
 
-                        parsed_objects_dict[hash_key].properties['resolver_text'] = CodeObjectProp(
+                        parsed_objects_dict[hash_key].properties['resolver_text'] = CompactProp(
                             prop_name='resolver_text',
                             prop_value=resolver
                         )
@@ -113,28 +105,60 @@ class JsGqlParser(Parser):
         logger.info(f"For scan {self.parser} data parse {len(parsed_objects)} objects")
         return parsed_objects
     
+    def get_name(self, text):
+
+        # name part before arguments or selection set: "mutation Create($input: X!) {" => "mutation Create"
+        bracket = BRACKETS_START_RE.search(text)
+
+        if bracket:
+            return text[:bracket.start()].strip()
+
+        return text.strip()
+
+    def extract_operation(self, request):
+
+        # get only queries and mutations, no fragments
+        # mutation ContractorCreateMutation($input: CreateContractorInput!) vs query OkfsCodesQuery {
+
+        request_lower = request.lower()
+
+        if not ('query' in request_lower or 'mutation' in request_lower) or 'fragment ' in request_lower:
+            return None
+
+        req_name = self.get_name(request)
+
+        gql_type = req_name.split(' ')[0].lower()  # mutation ContractorCreateMutation => mutation
+
+        req_name = req_name.split(' ')[-1]
+
+        resolvers = [(self.get_name(resolver), resolver) for resolver in self.find_resolvers(request)]
+
+        return gql_type, req_name, resolvers
+
     def find_resolvers(self, all_text):
 
+        # single pass over brackets only, top level selections are sliced from text by offsets
+
         start = True
 
         brackets_counter = 0
         s_brackets_counter = 0
 
         resolvers = []
-        cur_resolver = ""
-
-        some_processed = False
+        resolver_start = 0
 
-        for char in all_text:
+        for bracket in BRACKETS_RE.finditer(all_text):
 
-            cur_resolver = cur_resolver + char
-
-            if char == '{' and s_brackets_counter == 0 and start:
-                cur_resolver = "" 
+            char = bracket.group()
+            pos = bracket.start()
 
+            # selection set of top level resolver opened on some previous char
             if s_brackets_counter > 1 and start:
                 start = False
 
+            if char == '{' and s_brackets_counter == 0 and start:
+                resolver_start = pos + 1
+
             if char == '{' and brackets_counter == 0:
                 s_brackets_counter = s_brackets_counter + 1
 
@@ -147,13 +171,16 @@ class JsGqlParser(Parser):
             if char == ')':
                 brackets_counter = brackets_counter - 1
 
-            if start == False and s_brackets_counter == 1 and cur_resolver.strip():
-                resolvers.append(cur_resolver.strip())
-                cur_resolver = ""
-                start = True
-                some_processed = True
+            if start == False and s_brackets_counter == 1:
+
+                resolver = all_text[resolver_start:pos + 1].strip()
+
+                if resolver:
+                    resolvers.append(resolver)
+                    resolver_start = pos + 1
+                    start = True
 
-            if some_processed and s_brackets_counter == 0:
+            if resolvers and s_brackets_counter == 0:
                 break
 
         return resolvers
@@ -10,11 +10,19 @@ from typing import Optional, List
 
 logger = logging.getLogger(__name__)
 
+# found parser classes and types, registry is built once per process
+parser_classes = {}
+parser_types = []
+
+
 class ParserFactory:
 
     @staticmethod
     def get_parser(parser_type: str):
 
+        if parser_type in parser_classes:
+            return parser_classes[parser_type]
+
         package_dir = str(Path(__file__).resolve().parent)
 
         for module_name in os.listdir(package_dir):
@@ -34,7 +42,8 @@ class ParserFactory:
 
                                 parser = attribute
                                 logger.info(f"Found parser {parser.__qualname__} in appsec_discovery.parsers.{module_name}.parser")
-                                
+
+                                parser_classes[parser_type] = parser
                                 return parser
                 except Exception as ex:
                     logger.error(f"Failed to find parser for type {parser_type}: {ex}")
@@ -45,6 +54,9 @@ class ParserFactory:
     @staticmethod
     def get_parser_types() -> List[str]:
 
+        if parser_types:
+            return list(parser_types)
+
         parsers_list = []
 
         package_dir = str(Path(__file__).resolve().parent)
@@ -68,4 +80,6 @@ class ParserFactory:
                 except:
                     logger.exception(f"failed to load {module_name}")
 
-        return parsers_list
\ No newline at end of file
+        parser_types.extend(parsers_list)
+
+        return list(parsers_list)
\ No newline at end of file
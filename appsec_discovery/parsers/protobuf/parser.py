@@ -1,40 +1,48 @@
 import logging
-import os
 from typing import List
 import proto_schema_parser.parser as pb_parser
-from proto_schema_parser.ast import Package, Service, Message, Method, Field
+from proto_schema_parser.ast import Package, Import, Service, Message, Method, Field
 
 from appsec_discovery.parsers import Parser
-from appsec_discovery.models import CodeObject, CodeObjectField
+from appsec_discovery.models.compact import CompactObject, CompactField, FieldTables
+from appsec_discovery.sources import decode_text
 
 logger = logging.getLogger(__name__)
 
+
+def read_proto(file_path: str, content: bytes = None):
+
+    if content is not None:
+        return pb_parser.Parser().parse(decode_text(content))
+
+    with open(file_path) as file:
+        return pb_parser.Parser().parse(file.read())
+
+
 class ProtobufParser(Parser):
 
-    def find_proto_files(self, root_dir):
-        proto_files = []
-        for root, _, files in os.walk(root_dir):
-            for file in files:
-                if file.endswith('.proto'):
-                    proto_files.append(os.path.join(root, file))
-        return sorted(proto_files)
+    global_view = True
+    input_extensions = ['.proto']
 
+    def run_scan(self) -> List[CompactObject]:
 
-    def run_scan(self) -> List[CodeObject]:
+        objects_list: List[CompactObject] = []
 
-        objects_list: List[CodeObject] = []
+        if not self.wants_type('rpc'):
+            return objects_list
 
-        proto_files = self.find_proto_files(self.source_folder)
+        proto_files = self.input_files()
         proto_data = {}
 
-        for proto_file in proto_files:
+        for index, proto_file in enumerate(proto_files):
+
+            if self.budget_over(len(proto_files) - index):
+                break
 
             local_proto_file = proto_file.replace(self.source_folder, "")
 
             try:
-                with open(proto_file) as file:
-                    file_str = file.read()
-                    proto_data[local_proto_file] = pb_parser.Parser().parse(file_str)
+                proto_data[local_proto_file] = self.read_file(read_proto, proto_file, local_proto_file)
             except Exception as ex:
                 logger.error(f"Failed to parse {self.parser} for file {local_proto_file}: {ex}")
 
@@ -42,36 +50,105 @@ class ProtobufParser(Parser):
 
         return objects_list
 
-    def resolve_fields(self, type_name, messages, file, depth):
+    def index_message(self, message, scope, file):
+
+        # register message and its nested types by fully qualified name
+        fqn = f"{scope}.{message.name}" if scope else message.name
+
+        if file not in self.symbols.setdefault(fqn, {}):
+            self.symbols[fqn][file] = message
+
+        for el in message.elements:
+            if isinstance(el, Message):
+                self.index_message(el, fqn, file)
+
+    def get_visible_files(self, file):
+
+        # own file, direct imports and everything reexported by them with import public
+        if file in self.visible_files:
+            return self.visible_files[file]
+
+        visible = {file: True}
+        pending = [imp.name for imp in self.imports.get(file, [])]
+
+        while pending:
+
+            import_file = self.import_paths.get(pending.pop(0))
+
+            if import_file and import_file not in visible:
+                visible[import_file] = True
+                pending += [imp.name for imp in self.imports.get(import_file, []) if imp.public]
+
+        self.visible_files[file] = list(visible)
+
+        return self.visible_files[file]
+
+    def resolve_type(self, type_name, scope, file):
+
+        key = (file, scope, type_name)
+
+        if key in self.resolved_types:
+            return self.resolved_types[key]
+
+        # protobuf scoping: .fully.qualified.Name or search from innermost scope outward
+        if type_name.startswith('.'):
+            candidates = [type_name[1:]]
+        else:
+            scope_parts = scope.split('.') if scope else []
+            candidates = [".".join(scope_parts[:i] + [type_name]) for i in range(len(scope_parts), -1, -1)]
+
+        resolved = None
+
+        for candidate in candidates:
+
+            definitions = self.symbols.get(candidate)
+
+            if definitions:
+
+                # prefer definitions from own file and imports, fall back to any parsed file
+                def_file = next((vis_file for vis_file in self.get_visible_files(file) if vis_file in definitions), None)
+
+                if def_file is None:
+                    def_file = next(iter(definitions))
+
+                resolved = (candidate, definitions[def_file], def_file)
+                break
+
+        self.resolved_types[key] = resolved
+
+        return resolved
+
+    def resolve_fields(self, type_name, fqn, message, file, depth):
+
+        # same message at same depth always resolves to same sub-tree
+        key = (type_name, fqn, file, depth)
+
+        if key not in self.resolved_fields:
+            self.resolved_fields[key] = self.resolve_message_fields(type_name, fqn, message, file, depth)
+
+        return self.resolved_fields[key]
+
+    def resolve_message_fields(self, type_name, fqn, message, file, depth):
         
         resolved_fields = {}
 
-        local_messages = {}
-
         if depth > 5 :
             return {}
 
-        for el in messages[type_name].elements:       
-            if isinstance(el, Message) and el.name not in local_messages:
-                local_messages[el.name] = el
-
-        for el in messages[type_name].elements:      
+        for el in message.elements:      
             if isinstance(el, Field) and el.name not in resolved_fields:
 
-                if el.type in messages:
-                    resolved_local_fields = self.resolve_fields(el.type, messages, file, depth + 1)
+                resolved = self.resolve_type(el.type, fqn, file)
 
-                    for field_name, field in resolved_local_fields.items():
-                        resolved_fields[f"{type_name}.{el.name}.{field_name}"] = field
-
-                elif el.type in local_messages:
-                    resolved_local_fields = self.resolve_fields(el.type, local_messages, file, depth + 1)
+                if resolved:
+                    field_fqn, field_message, field_file = resolved
+                    resolved_local_fields = self.resolve_fields(field_message.name, field_fqn, field_message, field_file, depth + 1)
 
                     for field_name, field in resolved_local_fields.items():
                         resolved_fields[f"{type_name}.{el.name}.{field_name}"] = field
 
                 else:
-                    resolved_fields[f"{type_name}.{el.name}"] = CodeObjectField(
+                    resolved_fields[f"{type_name}.{el.name}"] = CompactField(
                         field_name=f"{type_name}.{el.name}",
                         field_type=el.type,
                         file=file,
@@ -79,7 +156,7 @@ class ProtobufParser(Parser):
                     )
 
         if not resolved_fields :
-            resolved_fields[type_name] = CodeObjectField(
+            resolved_fields[type_name] = CompactField(
                         field_name=type_name,
                         field_type='Empty',
                         file=file,
@@ -88,89 +165,95 @@ class ProtobufParser(Parser):
 
         return resolved_fields
 
-    def parse_report(self, proto_data) -> List[CodeObject]:
+    def parse_report(self, proto_data) -> List[CompactObject]:
+
+        parsed_objects: List[CompactObject] = []
 
-        parsed_objects: List[CodeObject] = []
+        # global symbol table: fully qualified message name => {file: message}
+        self.symbols = {}
+        self.imports = {}
+        self.import_paths = {}
+        self.visible_files = {}
+        self.resolved_types = {}
+        self.resolved_fields = {}
+        self.direction_fields = {}
+        field_tables = FieldTables()
 
-        packages = {}
+        services = []
+        seen_services = {}
 
         for file, file_proto in proto_data.items():
 
             cur_package = ''
+            self.imports[file] = []
+
+            # import "common/v1/user.proto" can point to any path suffix of scanned file
+            path_parts = file.strip('/').split('/')
+            for i in range(len(path_parts)):
+                self.import_paths.setdefault("/".join(path_parts[i:]), file)
 
             for el in file_proto.file_elements:
 
                 if isinstance(el, Package) :
-
                     cur_package = el.name
 
-                    if el.name not in packages:
-                        packages[el.name] = {
-                            'services': {},
-                            'messages': {},
-                            'file': file
-                        }
+                if isinstance(el, Import) :
+                    self.imports[file].append(el)
 
             for el in file_proto.file_elements:
 
-                if isinstance(el, Service) and el.name not in packages[cur_package]['services']:
-                    packages[cur_package]['services'][el.name] = {}
-
-                    for service_method in el.elements:
-                        if isinstance(service_method, Method) and service_method.name not in packages[cur_package]['services'][el.name]:
-                            packages[cur_package]['services'][el.name][service_method.name] = {
-                                'input': service_method.input_type.type,
-                                'output': service_method.output_type.type
-                            }
-                
-                if isinstance(el, Message) and el.name not in packages[cur_package]['messages']:
-                    packages[cur_package]['messages'][el.name] = el
-        
+                if isinstance(el, Service) and (cur_package, el.name) not in seen_services:
+                    seen_services[(cur_package, el.name)] = True
+                    services.append((cur_package, file, el))
 
-        for package_name, package in packages.items():
-            for service_name, service in package['services'].items():
-                for method_name, method in service.items():
-
-                    unique_hash = self.calc_uniq_hash([package['file'], package_name, service_name, method_name])
-
-                    code_object = CodeObject(
-                        hash=unique_hash,
-                        object_name=f"Rpc /{package_name}.{service_name}/{method_name}",
-                        object_type='rpc',
-                        parser=self.parser,
-                        file=package['file'],
-                        line=1,
-                        properties={},
-                        fields={}
-                    )
+                if isinstance(el, Message):
+                    self.index_message(el, cur_package, file)
 
-                    if method['input'] in package['messages']:
-                        input_fields = self.resolve_fields(method['input'], package['messages'], package['file'], 0)
+        for package_name, file, service in services:
 
-                        for field_name, field in input_fields.items():    
-                            code_object.fields[f"input.{field_name}"] = field
-                    else:
-                        code_object.fields['input'] = CodeObjectField(
-                            field_name='input',
-                            field_type=method['input'],
-                            file=package['file'],
-                            line=1
-                        )
+            service_methods = {}
+
+            for service_method in service.elements:
+                if isinstance(service_method, Method) and service_method.name not in service_methods:
+                    service_methods[service_method.name] = service_method
+
+            for method_name, method in service_methods.items():
+
+                unique_hash = self.calc_uniq_hash([file, package_name, service.name, method_name])
+
+                code_object = CompactObject(
+                    hash=unique_hash,
+                    object_name=f"Rpc /{package_name}.{service.name}/{method_name}",
+                    object_type='rpc',
+                    parser=self.parser,
+                    file=file,
+                    line=1,
+                    properties={},
+                    fields={}
+                )
+
+                for direction, message_type in [('input', method.input_type.type), ('output', method.output_type.type)]:
+
+                    resolved = self.resolve_type(message_type, package_name, file)
+
+                    if resolved:
+                        msg_fqn, message, msg_file = resolved
+                        key = (direction, msg_fqn, msg_file)
 
-                    if method['output'] in package['messages']:
-                        output_fields = self.resolve_fields(method['output'], package['messages'], package['file'], 0)
+                        if key not in self.direction_fields:
+                            direction_fields = self.resolve_fields(message.name, msg_fqn, message, msg_file, 0)
+                            self.direction_fields[key] = field_tables.share({f"{direction}.{field_name}": field for field_name, field in direction_fields.items()})
 
-                        for field_name, field in output_fields.items():    
-                            code_object.fields[f"output.{field_name}"] = field
+                        code_object.fields.update(self.direction_fields[key])
                     else:
-                        code_object.fields['output'] = CodeObjectField(
-                            field_name='output',
-                            field_type=method['output'],
-                            file=package['file'],
+                        code_object.fields[direction] = CompactField(
+                            field_name=direction,
+                            field_type=message_type,
+                            file=file,
                             line=1
                         )
 
-                    parsed_objects.append(code_object)
+                parsed_objects.append(code_object)
 
         logger.info(f"For scan {self.parser} data parse {len(parsed_objects)} objects")
 
@@ -0,0 +1,302 @@
+import ast
+import logging
+from typing import List, Dict
+from appsec_discovery.sources import decode_text
+
+logger = logging.getLogger(__name__)
+
+# Native counterpart of scanner_rules/dto.yaml and route.yaml, findings are emitted
+# in the same shape and order as semgrep json results, so PythonParser.parse_report
+# builds identical objects for both engines.
+
+DJANGO_URL_FUNCS = ['django.urls.path', 'django.conf.urls.path', 'django.urls.url', 'django.conf.urls.url']
+
+
+class FileExtractor:
+
+    def __init__(self, source: str, local_file: str):
+
+        self.source = source
+        self.local_file = local_file
+        self.lines = source.splitlines(keepends=True)
+        self.line_offsets = [0]
+        for line_str in self.lines:
+            self.line_offsets.append(self.line_offsets[-1] + len(line_str))
+        self.aliases: Dict[str, str] = {}
+        self.findings = []
+
+    def qualname(self, node) -> str:
+
+        # resolve imported names like semgrep does: BaseModel => pydantic.BaseModel
+        if isinstance(node, ast.Name):
+            return self.aliases.get(node.id, node.id)
+
+        if isinstance(node, ast.Attribute):
+            value = self.qualname(node.value)
+            if value:
+                return f"{value}.{node.attr}"
+
+        return ''
+
+    def text(self, node) -> str:
+        return ast.get_source_segment(self.source, node) or ''
+
+    def string(self, node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        return None
+
+    def offset(self, line, col) -> int:
+
+        # ast columns are utf-8 byte offsets, offsets of findings are str positions like line_offsets
+        line_str = self.lines[line - 1] if line <= len(self.lines) else ''
+        char_col = len(line_str.encode('utf-8')[:col].decode('utf-8', 'ignore'))
+
+        return self.line_offsets[line - 1] + char_col
+
+    def add(self, rule_id, start_node, end_node, metavars: Dict[str, str]):
+
+        start_line = start_node.lineno
+
+        if getattr(start_node, 'decorator_list', None):
+            start_line = min([dec.lineno for dec in start_node.decorator_list] + [start_line])
+            start_col = min([dec.col_offset - 1 for dec in start_node.decorator_list if dec.lineno == start_line] + [start_node.col_offset])
+        else:
+            start_col = start_node.col_offset
+
+        self.findings.append({
+            'check_id': rule_id,
+            'path': self.local_file,
+            'start': {'line': start_line, 'offset': self.offset(start_line, start_col)},
+            'end': {'line': end_node.end_lineno, 'offset': self.offset(end_node.end_lineno, end_node.end_col_offset)},
+            'extra': {
+                'metavars': {name: {'abstract_content': value} for name, value in sorted(metavars.items())}
+            }
+        })
+
+    def extract(self) -> List[Dict]:
+
+        tree = ast.parse(self.source)
+
+        for node in ast.walk(tree):
+
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    self.aliases[alias.asname or alias.name.split('.')[0]] = alias.name if alias.asname else alias.name.split('.')[0]
+
+            if isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                for alias in node.names:
+                    self.aliases[alias.asname or alias.name] = f"{node.module}.{alias.name}"
+
+        for node in ast.walk(tree):
+
+            if isinstance(node, ast.ClassDef):
+                self.extract_dto(node)
+
+            if hasattr(node, 'body') and isinstance(node.body, list):
+                self.extract_routes(node.body)
+
+        return self.findings
+
+    def extract_dto(self, cls: ast.ClassDef):
+
+        bases = [self.qualname(base) for base in cls.bases]
+
+        # pydantic: class $OBJECT(pydantic.BaseModel) with $FIELD: $TYPE
+        if 'pydantic.BaseModel' in bases:
+            for stmt in cls.body:
+                if isinstance(stmt, ast.AnnAssign) and isinstance(stmt.target, ast.Name):
+                    self.add('dto-pydantic-data-object', stmt, stmt, {'$OBJECT': cls.name, '$FIELD': stmt.target.id, '$TYPE': self.text(stmt.annotation)})
+
+        # dataclass: @dataclass class $OBJECT: $FIELD: $TYPE
+        is_dataclass = any(self.qualname(dec.func if isinstance(dec, ast.Call) else dec) in ['dataclass', 'dataclasses.dataclass'] for dec in cls.decorator_list)
+
+        if is_dataclass and not cls.bases:
+            for stmt in cls.body:
+                if isinstance(stmt, ast.AnnAssign) and isinstance(stmt.target, ast.Name):
+                    self.add('dto-dataclass-object', cls, cls, {'$OBJECT': cls.name, '$FIELD': stmt.target.id, '$TYPE': self.text(stmt.annotation)})
+
+        # mongo: class $OBJECT(..., mongoengine.$DOCTYPE, ...)
+        doctypes = [base for base in bases if base.startswith('mongoengine.') and base.count('.') == 1]
+
+        tablename = None
+
+        for stmt in cls.body:
+
+            if not (isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name)):
+                continue
+
+            target = stmt.targets[0].id
+
+            if target == '__tablename__' and self.string(stmt.value) is not None:
+                tablename = self.string(stmt.value)
+
+            if not isinstance(stmt.value, ast.Call):
+                continue
+
+            call = stmt.value
+            func = self.qualname(call.func)
+
+            # django: $FIELD = django.db.models.$TYPE(...)
+            if func.startswith('django.db.models.') and func.count('.') == 3:
+                self.add('dto-django-data-object', stmt, stmt, {'$OBJECT': cls.name, '$FIELD': target, '$TYPE': func.split('.')[-1]})
+
+            if doctypes and (func.startswith('mongoengine.fields.') and func.count('.') == 2 or func.startswith('mongoengine.') and func.count('.') == 1):
+                self.add('dto-mongo-data-object', stmt, stmt, {'$OBJECT': cls.name, '$DOCTYPE': doctypes[0].split('.')[-1], '$FIELD': target, '$TYPE': func.split('.')[-1]})
+
+            # marshmallow: class $OBJECT(marshmallow.Schema) with $FIELD = marshmallow.fields.$TYPE()
+            if 'marshmallow.Schema' in bases and func.startswith('marshmallow.fields.') and func.count('.') == 2 and not call.args and not call.keywords:
+                self.add('dto-marshmallow-data-object', cls, cls, {'$OBJECT': cls.name, '$FIELD': target, '$TYPE': func.split('.')[-1]})
+
+        # sqlalchemy: __tablename__ = '$OBJECT' with Column/relationship fields
+        if tablename is not None:
+
+            for stmt in cls.body:
+
+                if not (isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name)
+                        and isinstance(stmt.value, ast.Call) and isinstance(stmt.value.func, ast.Name)
+                        and stmt.value.func.id in ['Column', 'relationship'] and stmt.value.args):
+                    continue
+
+                args = stmt.value.args
+
+                # $SOME = Column('$FIELD', $TYPE, ...)
+                if self.string(args[0]) is not None:
+                    if len(args) > 1 and not self.text(args[1]).startswith(("'", '"')):
+                        self.add('dto-sqlalchemy-data-object', stmt, stmt, {'$CLASS': cls.name, '$OBJECT': tablename, '$SOME': stmt.targets[0].id, '$FIELD': self.string(args[0]), '$TYPE': self.text(args[1])})
+
+                # $FIELD = Column($TYPE, ...)
+                else:
+                    self.add('dto-sqlalchemy-data-object', stmt, stmt, {'$CLASS': cls.name, '$OBJECT': tablename, '$FIELD': stmt.targets[0].id, '$TYPE': self.text(args[0])})
+
+    def route_decorator(self, dec):
+
+        # @$APP.$METHOD('$PATH') with single string argument, returns (app, method, path, keywords)
+        if isinstance(dec, ast.Call) and isinstance(dec.func, ast.Attribute) and len(dec.args) == 1 and self.string(dec.args[0]) is not None:
+            return self.qualname(dec.func.value), dec.func.attr, self.string(dec.args[0]), dec.keywords
+
+        return None
+
+    def list_strings(self, node):
+        if isinstance(node, ast.List):
+            return [self.string(el) for el in node.elts if self.string(el) is not None]
+        return []
+
+    def extract_routes(self, body: List[ast.stmt]):
+
+        apps = {}
+
+        for stmt in body:
+
+            # $APP = fastapi.FastAPI(...) / flask.Flask(...) / bottle.Bottle(...)
+            if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name) and isinstance(stmt.value, ast.Call):
+
+                app_type = self.qualname(stmt.value.func)
+
+                if app_type in ['fastapi.FastAPI', 'flask.Flask', 'bottle.Bottle'] and stmt.targets[0].id not in apps:
+                    apps[stmt.targets[0].id] = (app_type, stmt)
+
+            if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name):
+                self.extract_route_lists(stmt, body)
+
+            if not isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                continue
+
+            for dec in stmt.decorator_list:
+
+                # @bottle.$TYPE('$PATH')
+                if isinstance(dec, ast.Call) and self.qualname(dec.func).startswith('bottle.') and self.qualname(dec.func).count('.') == 1 \
+                        and len(dec.args) == 1 and not dec.keywords and self.string(dec.args[0]) is not None:
+                    self.add('route-bottle-object', stmt, stmt, {'$TYPE': self.qualname(dec.func).split('.')[-1], '$PATH': self.string(dec.args[0]), '$FUNC': stmt.name})
+
+                route = self.route_decorator(dec)
+
+                if not route or route[0] not in apps:
+                    continue
+
+                app_name, method, path, keywords = route
+                app_type, app_stmt = apps[app_name]
+
+                if app_type == 'fastapi.FastAPI' and not keywords:
+                    self.add('route-fastapi-object', app_stmt, stmt, {'$APP': app_name, '$METHOD': method, '$PATH': path, '$FUNC': stmt.name})
+
+                if app_type == 'flask.Flask' and method == 'route':
+                    if not keywords:
+                        self.add('route-flask-object', app_stmt, stmt, {'$APP': app_name, '$PATH': path, '$FUNC': stmt.name})
+                    elif len(keywords) == 1 and keywords[0].arg == 'methods':
+                        for route_method in self.list_strings(keywords[0].value):
+                            self.add('route-flask-object', app_stmt, stmt, {'$APP': app_name, '$PATH': path, '$FUNC': stmt.name, '$TYPE': route_method})
+
+                if app_type == 'bottle.Bottle' and method == 'route':
+                    if not keywords:
+                        self.add('route-bottle-object', app_stmt, stmt, {'$APP': app_name, '$PATH': path, '$FUNC': stmt.name})
+                    elif len(keywords) == 1 and keywords[0].arg == 'method':
+                        for route_method in self.list_strings(keywords[0].value):
+                            self.add('route-bottle-object', app_stmt, stmt, {'$APP': app_name, '$PATH': path, '$FUNC': stmt.name, '$METHOD': route_method})
+
+    def route_calls(self, node, func_names):
+
+        # [..., func($PATH, $FUNC, ...), ...]
+        if not isinstance(node, ast.List):
+            return []
+
+        return [el for el in node.elts if isinstance(el, ast.Call) and self.qualname(el.func) in func_names and len(el.args) >= 2]
+
+    def extract_route_lists(self, stmt: ast.Assign, body: List[ast.stmt]):
+
+        target = stmt.targets[0].id
+
+        # django: $URLPATTERNS = [..., django.urls.path($PATH, $FUNC, ...), ...]
+        for call in self.route_calls(stmt.value, DJANGO_URL_FUNCS):
+            self.add('route-django-object', stmt, stmt, {'$URLPATTERNS': target, '$PATH': self.text(call.args[0]), '$FUNC': self.text(call.args[1])})
+
+        if not isinstance(stmt.value, (ast.List, ast.Call)):
+            return
+
+        # starlette: $ROUTES = [..., Route($PATH, $FUNC, ...), ...] ... $APP = Starlette(..., routes=$ROUTES, ...)
+        routes = self.route_calls(stmt.value, ['starlette.routing.Route'])
+
+        if routes:
+            for app_stmt in body[body.index(stmt) + 1:]:
+                if isinstance(app_stmt, ast.Assign) and len(app_stmt.targets) == 1 and isinstance(app_stmt.targets[0], ast.Name) \
+                        and isinstance(app_stmt.value, ast.Call) and self.qualname(app_stmt.value.func) == 'starlette.applications.Starlette' \
+                        and any(kw.arg == 'routes' and isinstance(kw.value, ast.Name) and kw.value.id == target for kw in app_stmt.value.keywords):
+
+                    for call in routes:
+                        self.add('route-starlette-object', stmt, app_stmt, {'$ROUTES': target, '$APP': app_stmt.targets[0].id, '$PATH': self.text(call.args[0]), '$FUNC': self.text(call.args[1])})
+                    break
+
+        # starlette: $APP = Starlette(..., routes=[..., Route($PATH, $FUNC, ...), ...], ...)
+        if isinstance(stmt.value, ast.Call) and self.qualname(stmt.value.func) == 'starlette.applications.Starlette':
+            for kw in stmt.value.keywords:
+                if kw.arg == 'routes':
+                    for call in self.route_calls(kw.value, ['starlette.routing.Route']):
+                        self.add('route-starlette-object', stmt, stmt, {'$APP': target, '$PATH': self.text(call.args[0]), '$FUNC': self.text(call.args[1])})
+
+
+def finding_sort_key(finding):
+    # semgrep orders results by file, match span, rule and then metavariable values
+    return (
+        finding['path'],
+        finding['start']['offset'],
+        finding['end']['offset'],
+        finding['check_id'],
+        [(name, var['abstract_content']) for name, var in finding['extra']['metavars'].items()]
+    )
+
+
+def extract_file(file_path: str, local_file: str, content: bytes = None) -> List[Dict]:
+
+    try:
+        if content is not None:
+            source = decode_text(content)
+        else:
+            with open(file_path, encoding='utf-8') as file:
+                source = file.read()
+
+        return FileExtractor(source, local_file).extract()
+
+    except Exception as ex:
+        logger.error(f"Failed to parse python file {local_file}: {ex}")
+
+    return []
@@ -4,15 +4,21 @@ from typing import List, Dict
 from pathlib import Path
 
 from appsec_discovery.parsers import Parser
-from appsec_discovery.models import CodeObject, CodeObjectField, CodeObjectProp
+from appsec_discovery.parsers.python.ast_extractor import extract_file, finding_sort_key
+from appsec_discovery.models.compact import CompactObject, CompactField, CompactProp
 
 logger = logging.getLogger(__name__)
 
 class PythonParser(Parser):
 
-    def run_scan(self) -> List[CodeObject]:
+    semgrep_extensions = ['.py']
 
-        objects_list: List[CodeObject] = []
+    def run_scan(self) -> List[CompactObject]:
+
+        objects_list: List[CompactObject] = []
+
+        if self.config.engine == 'native':
+            return self.parse_report(self.run_native())
 
         parser_folder = str(Path(__file__).resolve().parent)
 
@@ -26,10 +32,23 @@ class PythonParser(Parser):
         return objects_list
 
 
-    def parse_report(self, semgrep_data) -> List[CodeObject]:
+    def run_native(self):
+
+        logger.info(f"Start {self.parser} native scan for {self.source_folder}")
+
+        py_files = self.find_files(['.py'])
+
+        findings = [finding for file_findings in self.map_files(extract_file, py_files) for finding in file_findings]
+        findings.sort(key=finding_sort_key)
+
+        logger.info(f"End {self.parser} native scan for {self.source_folder}, found {len(findings)} rule hits")
+
+        return findings
+
+    def parse_report(self, semgrep_data) -> List[CompactObject]:
 
-        parsed_objects: List[CodeObject] = []
-        parsed_objects_dict: Dict[str, CodeObject] = {}
+        parsed_objects: List[CompactObject] = []
+        parsed_objects_dict: Dict[str, CompactObject] = {}
         parsed_fields_dict = {}
 
         for finding in semgrep_data:
@@ -42,7 +61,7 @@ class PythonParser(Parser):
             object_type = None
 
             # parse dto rules
-            if rule_id.startswith("dto-"):
+            if rule_id.startswith("dto-") and self.wants_type("dto"):
 
                 object_type="dto"
                 orm_type = rule_id.split('-')[1]
@@ -56,7 +75,7 @@ class PythonParser(Parser):
 
                 if hash_key not in parsed_objects_dict:
 
-                    parsed_objects_dict[hash_key] = CodeObject(
+                    parsed_objects_dict[hash_key] = CompactObject(
                         hash=hash_key,
                         object_name=f"{orm_type.title()} {object_type} {object}",
                         object_type=object_type,
@@ -67,19 +86,19 @@ class PythonParser(Parser):
                         fields=[]
                     )
 
-                    parsed_objects_dict[hash_key].properties['framework'] = CodeObjectProp(
+                    parsed_objects_dict[hash_key].properties['framework'] = CompactProp(
                         prop_name='framework',
                         prop_value=orm_type
                     )
 
-                    parsed_objects_dict[hash_key].properties['object'] = CodeObjectProp(
+                    parsed_objects_dict[hash_key].properties['object'] = CompactProp(
                         prop_name='object',
                         prop_value=object
                     )
 
                 if field_hash_key not in parsed_fields_dict:
 
-                    parsed_field = CodeObjectField(
+                    parsed_field = CompactField(
                         field_name=field_name,
                         field_type=field_type,
                         file=finding_file,
@@ -91,7 +110,7 @@ class PythonParser(Parser):
                     parsed_fields_dict[field_hash_key] = parsed_field
 
             # parse route rules
-            if rule_id.startswith("route-"):
+            if rule_id.startswith("route-") and self.wants_type("route"):
 
                 object_type="route"
 
@@ -110,7 +129,7 @@ class PythonParser(Parser):
 
                 if hash_key not in parsed_objects_dict:
 
-                    parsed_objects_dict[hash_key] = CodeObject(
+                    parsed_objects_dict[hash_key] = CompactObject(
                         hash=hash_key,
                         object_name=object_name,
                         object_type=object_type,
@@ -121,24 +140,24 @@ class PythonParser(Parser):
                         fields={}
                     )
 
-                    parsed_objects_dict[hash_key].properties['framework'] = CodeObjectProp(
+                    parsed_objects_dict[hash_key].properties['framework'] = CompactProp(
                         prop_name='framework',
                         prop_value=fw_type
                     )
 
-                    parsed_objects_dict[hash_key].properties['func'] = CodeObjectProp(
+                    parsed_objects_dict[hash_key].properties['func'] = CompactProp(
                         prop_name='func',
                         prop_value=route_func
                     )
 
-                    parsed_objects_dict[hash_key].properties['path'] = CodeObjectProp(
+                    parsed_objects_dict[hash_key].properties['path'] = CompactProp(
                         prop_name='path',
                         prop_value=route_path
                     )
 
                     if route_method :
 
-                        parsed_objects_dict[hash_key].properties['method'] = CodeObjectProp(
+                        parsed_objects_dict[hash_key].properties['method'] = CompactProp(
                             prop_name='method',
                             prop_value=route_method
                         )
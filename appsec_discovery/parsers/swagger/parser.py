@@ -1,46 +1,62 @@
-import logging
 import os
+import logging
 from typing import List
 from pathlib import Path
 from openapi_parser import parse
 
 from appsec_discovery.parsers import Parser
-from appsec_discovery.models import CodeObject, CodeObjectProp, CodeObjectField
+from appsec_discovery.models.compact import CompactObject, CompactProp, CompactField, FieldTables
+from appsec_discovery.sources import decode_text
 
 logger = logging.getLogger(__name__)
 
 class SwaggerParser(Parser):
 
-    def find_swagger_files(self, root_dir):
+    def find_swagger_files(self):
 
         swagger_files = []
-        for root, _, files in os.walk(root_dir):
-            for file in files:
-                if file.endswith('.yaml') or file.endswith('.yml') or file.endswith('.json') :
-                    try:
-                        with open(os.path.join(root, file)) as file_obj:
-                            file_str = file_obj.read()
-                            if 'openapi' in file_str and 'paths' in file_str:
-                                swagger_files.append(os.path.join(root, file))
-                    except:
-                        pass
+        for file in self.find_files(['.yaml', '.yml', '.json']):
+            try:
+                if self.file_filter.source is not None:
+                    file_str = decode_text(self.file_filter.read_bytes(file))
+                else:
+                    with open(file) as file_obj:
+                        file_str = file_obj.read()
+
+                if 'openapi' in file_str and 'paths' in file_str:
+                    swagger_files.append(file)
+            except:
+                pass
+
+        return swagger_files
 
-        return sorted(swagger_files)
 
+    def run_scan(self) -> List[CompactObject]:
 
-    def run_scan(self) -> List[CodeObject]:
+        objects_list: List[CompactObject] = []
 
-        objects_list: List[CodeObject] = []
+        if not self.wants_type('route'):
+            return objects_list
 
-        swagger_files = self.find_swagger_files(self.source_folder)
+        swagger_files = self.find_swagger_files()
         swagger_data = {}
 
-        for swagger_file in swagger_files:
+        # specs of archive and git sources are parsed from temp folder with other yaml and json files, so refs between files resolve
+        spec_files = swagger_files
+
+        if self.file_filter.source is not None and swagger_files:
+            spec_folder, _ = self.file_filter.materialize(self.find_files(['.yaml', '.yml', '.json']))
+            spec_files = [os.path.join(spec_folder, self.file_filter.rel_path(file)) for file in swagger_files]
+
+        for index, (swagger_file, spec_file) in enumerate(zip(swagger_files, spec_files)):
+
+            if self.budget_over(len(swagger_files) - index):
+                break
 
             local_swagger_file = swagger_file.replace(self.source_folder, "")
 
             try:
-                swagger_data[local_swagger_file] = parse(swagger_file)
+                swagger_data[local_swagger_file] = parse(spec_file)
             except:
                 pass
             
@@ -62,7 +78,7 @@ class SwaggerParser(Parser):
 
                 if not hasattr(prop.schema, 'items') and not hasattr(prop.schema, 'properties'):
 
-                    resolved_fields[f"{type}.{prop.name}"] = CodeObjectField(
+                    resolved_fields[f"{type}.{prop.name}"] = CompactField(
                         field_name=f"{type}.{prop.name}",
                         field_type=prop.schema.type.value,
                         file=file,
@@ -88,7 +104,7 @@ class SwaggerParser(Parser):
                 resolved_fields[f"{type}.{field_name}"].field_name = f"{type}.{field_name}"
             
         else:
-            resolved_fields[type] = CodeObjectField(
+            resolved_fields[type] = CompactField(
                 field_name=type,
                 field_type=object.type.value,
                 file=file,
@@ -97,9 +113,12 @@ class SwaggerParser(Parser):
 
         return resolved_fields
 
-    def parse_report(self, swagger_data) -> List[CodeObject]:
+    def parse_report(self, swagger_data) -> List[CompactObject]:
+
+        parsed_objects: List[CompactObject] = []
 
-        parsed_objects: List[CodeObject] = []
+        # same request and response schemas are shared by many operations
+        field_tables = FieldTables()
 
         for file, file_spec in swagger_data.items():
 
@@ -109,7 +128,7 @@ class SwaggerParser(Parser):
 
                     unique_hash = self.calc_uniq_hash([method.method.name, path.url, file])
 
-                    code_object = CodeObject(
+                    code_object = CompactObject(
                         hash=unique_hash,
                         object_name=f"Route {path.url} ({method.method.name})",
                         object_type='route',
@@ -120,19 +139,19 @@ class SwaggerParser(Parser):
                         fields={}
                     )
 
-                    code_object.properties['path'] = CodeObjectProp(
+                    code_object.properties['path'] = CompactProp(
                         prop_name='path',
                         prop_value=path.url
                     )
 
-                    code_object.properties['method'] = CodeObjectProp(
+                    code_object.properties['method'] = CompactProp(
                         prop_name='method',
                         prop_value=method.method.name
                     )
 
                     for param in method.parameters:
 
-                        code_object.fields[f"{param.location.value}.param.{param.name}"] = CodeObjectField(
+                        code_object.fields[f"{param.location.value}.param.{param.name}"] = CompactField(
                             field_name=f"{param.location.value}.param.{param.name}",
                             field_type=param.schema.type.value,
                             file=file,
@@ -144,8 +163,7 @@ class SwaggerParser(Parser):
 
                             res = self.resolve_fields('input', content.schema, file, 0)
 
-                            for field_name, field in res.items():
-                                code_object.fields[field_name] = field
+                            code_object.fields.update(field_tables.share(res))
 
                     if method.responses :
                         for response in method.responses :
@@ -154,8 +172,7 @@ class SwaggerParser(Parser):
 
                                     res = self.resolve_fields('output', content.schema, file, 0)
 
-                                    for field_name, field in res.items():
-                                        code_object.fields[field_name] = field
+                                    code_object.fields.update(field_tables.share(res))
 
                     parsed_objects.append(code_object)
             
@@ -0,0 +1,145 @@
+import logging
+import re
+from typing import List, Dict
+from appsec_discovery.sources import decode_text
+
+logger = logging.getLogger(__name__)
+
+# Minimal HCL block reader: top level blocks with labels, their attributes
+# and nested blocks, plain string attribute values are unquoted.
+
+TOKEN_RE = re.compile(r'''
+    (?P<comment>\#[^\n]*|//[^\n]*|/\*.*?\*/)
+  | (?P<heredoc><<-?(?P<marker>[A-Za-z_]\w*)\n.*?\n[ \t]*(?P=marker)(?=\n|$))
+  | (?P<string>"(?:\\.|\$\{(?:[^{}"]|"(?:\\.|[^"\\])*")*\}|[^"\\\n])*")
+  | (?P<ident>[A-Za-z_][\w\-]*)
+  | (?P<newline>\n)
+  | (?P<punct>\S)
+''', re.S | re.X)
+
+BRACKETS = {'{': '}', '[': ']', '(': ')'}
+
+
+def tokenize(source: str):
+
+    tokens = []
+    line = 1
+
+    for match in TOKEN_RE.finditer(source):
+
+        kind = match.lastgroup
+        value = match.group()
+
+        if kind == 'comment':
+            pass
+        elif kind == 'newline':
+            tokens.append(('sep', value, line))
+        else:
+            tokens.append((kind, value, line))
+
+        line += value.count('\n')
+
+    return tokens
+
+
+class HclReader:
+
+    def __init__(self, source: str):
+        self.tokens = tokenize(source)
+
+    def value(self, pos: int) -> str:
+        return self.tokens[pos][1] if pos < len(self.tokens) else ''
+
+    def read(self) -> List[Dict]:
+        blocks, _, _ = self.read_body(0)
+        return blocks
+
+    def read_body(self, pos: int):
+
+        # returns (blocks, attributes, position after closing brace or end of file)
+        blocks = []
+        attributes = {}
+
+        while pos < len(self.tokens):
+
+            kind, value, line = self.tokens[pos]
+
+            if kind == 'sep':
+                pos += 1
+                continue
+
+            if value == '}':
+                return blocks, attributes, pos + 1
+
+            if kind != 'ident':
+                pos += 1
+                continue
+
+            # attribute: name = expression up to end of line outside brackets
+            if self.value(pos + 1) == '=':
+
+                expr_start = pos + 2
+                pos = expr_start
+                depth = 0
+
+                while pos < len(self.tokens) and not (depth == 0 and (self.tokens[pos][0] == 'sep' or self.tokens[pos][1] == '}')):
+
+                    if self.tokens[pos][1] in BRACKETS:
+                        depth += 1
+                    elif self.tokens[pos][1] in BRACKETS.values():
+                        depth -= 1
+
+                    pos += 1
+
+                expr = self.tokens[expr_start:pos]
+                plain_value = None
+
+                if len(expr) == 1 and expr[0][0] == 'string' and '${' not in expr[0][1]:
+                    plain_value = expr[0][1][1:-1]
+
+                if value not in attributes:
+                    attributes[value] = {'value': plain_value, 'line': line}
+
+                continue
+
+            # block: type "label" ... {
+            labels = []
+            label_pos = pos + 1
+
+            while self.tokens[label_pos:label_pos + 1] and self.tokens[label_pos][0] in ['string', 'ident']:
+                labels.append(self.tokens[label_pos][1].strip('"'))
+                label_pos += 1
+
+            if self.value(label_pos) == '{':
+
+                nested_blocks, nested_attributes, pos = self.read_body(label_pos + 1)
+
+                blocks.append({
+                    'type': value,
+                    'labels': labels,
+                    'line': line,
+                    'attributes': nested_attributes,
+                    'blocks': nested_blocks,
+                })
+
+            else:
+                pos += 1
+
+        return blocks, attributes, pos
+
+
+def read_file(file_path: str, local_file: str, content: bytes = None) -> List[Dict]:
+
+    try:
+        if content is not None:
+            source = decode_text(content, 'replace')
+        else:
+            with open(file_path, encoding='utf-8', errors='replace') as file:
+                source = file.read()
+
+        return HclReader(source).read()
+
+    except Exception as ex:
+        logger.error(f"Failed to read terraform file {local_file}: {ex}")
+
+    return []
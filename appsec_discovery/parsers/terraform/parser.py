@@ -4,15 +4,25 @@ from typing import List, Dict
 from pathlib import Path
 
 from appsec_discovery.parsers import Parser
-from appsec_discovery.models import CodeObject, CodeObjectProp
+from appsec_discovery.parsers.terraform.hcl_reader import read_file
+from appsec_discovery.models.compact import CompactObject, CompactProp
 
 logger = logging.getLogger(__name__)
 
 class TerraformParser(Parser):
 
-    def run_scan(self) -> List[CodeObject]:
+    rule_types = {'rules.yaml': ['vm']}
+    semgrep_extensions = ['.tf']
 
-        objects_list: List[CodeObject] = []
+    def run_scan(self) -> List[CompactObject]:
+
+        objects_list: List[CompactObject] = []
+
+        if not self.wants_type('vm'):
+            return objects_list
+
+        if self.config.engine == 'native':
+            return self.parse_modules(self.run_native())
 
         parser_folder = str(Path(__file__).resolve().parent)
 
@@ -25,11 +35,94 @@ class TerraformParser(Parser):
         
         return objects_list
 
+    def run_native(self):
+
+        logger.info(f"Start {self.parser} native scan for {self.source_folder}")
+
+        tf_files = self.find_files(['.tf'])
+
+        modules = []
+
+        for tf_file, file_blocks in zip(tf_files, self.map_files(read_file, tf_files)):
+
+            local_tf_file = tf_file.replace(self.source_folder, '')
+
+            for block in file_blocks:
+                if block['type'] == 'module' and block['labels']:
+                    modules.append((local_tf_file, block))
+
+        logger.info(f"End {self.parser} native scan for {self.source_folder}, found {len(modules)} modules")
+
+        return modules
+
+    def add_vm_prop(self, parsed_objects_dict: Dict[str, CompactObject], file, vm_name, line, prop_name, prop_value):
+
+        hash_key = self.calc_uniq_hash([file, vm_name])
+
+        if hash_key not in parsed_objects_dict:
+
+            parsed_objects_dict[hash_key] = CompactObject(
+                hash=hash_key,
+                object_name=f"Virtual machine {vm_name}",
+                object_type="vm",
+                parser=self.parser,
+                file=file,
+                line=line,
+                properties={},
+                fields={}
+            )
+
+        vm_object = parsed_objects_dict[hash_key]
+
+        vm_object.properties['vm_name'] = CompactProp(
+            prop_name='vm_name',
+            prop_value=vm_name
+        )
+
+        if prop_name != 'vm_name':
+            vm_object.properties[prop_name] = CompactProp(
+                prop_name=prop_name,
+                prop_value=prop_value
+            )
+
+        if prop_name == 'vm_domain':
+            vm_object.object_name = f"Virtual machine {vm_name}.{prop_value}"
 
-    def parse_report(self, semgrep_data) -> List[CodeObject]:
+        return vm_object
 
-        parsed_objects: List[CodeObject] = []
-        parsed_objects_dict: Dict[str, CodeObject] = {}
+    def parse_modules(self, modules) -> List[CompactObject]:
+
+        parsed_objects: List[CompactObject] = []
+        parsed_objects_dict: Dict[str, CompactObject] = {}
+
+        for file, module in modules:
+
+            vm_name = module['labels'][0]
+
+            # same as semgrep rules: vm_name attribute counts only when it equals module name
+            matched = [
+                (attr['line'], attr_name, attr['value']) for attr_name, attr in module['attributes'].items()
+                if attr_name in self.config.terraform_props and attr['value']
+                and (attr_name != 'vm_name' or attr['value'] == vm_name)
+            ]
+
+            for line, attr_name, value in sorted(matched):
+
+                vm_object = self.add_vm_prop(parsed_objects_dict, file, vm_name, line, self.config.terraform_props[attr_name], value)
+
+                if attr_name == 'vm_name':
+                    vm_object.line = line
+
+        if parsed_objects_dict:
+            parsed_objects = list(parsed_objects_dict.values())
+
+        logger.info(f"For scan {self.parser} data parse {len(parsed_objects)} objects")
+        return parsed_objects
+
+    def parse_report(self, semgrep_data) -> List[CompactObject]:
+
+        parsed_objects: List[CompactObject] = []
+        parsed_objects_dict: Dict[str, CompactObject] = {}
 
         for finding in semgrep_data:
 
@@ -38,113 +131,25 @@ class TerraformParser(Parser):
 
             rule_id = finding.get('check_id',"").split('.')[-1]
 
-            vm_name = finding.get('extra').get('metavars').get('$...VM_NAME', {}).get('abstract_content',"")
-            vm_domain = finding.get('extra').get('metavars').get('$...VM_DOMAIN', {}).get('abstract_content',"")
-            vm_template = finding.get('extra').get('metavars').get('$...VM_TEMPLATE', {}).get('abstract_content',"")
-            vm_pool = finding.get('extra').get('metavars').get('$...VM_POOL', {}).get('abstract_content',"")
-            vm_desc = finding.get('extra').get('metavars').get('$...VM_DESC', {}).get('abstract_content',"")
-            vm_server_cluster_name = finding.get('extra').get('metavars').get('$...VM_SERVER_CLUSTER_NAME', {}).get('abstract_content',"")
-            vm_server_role = finding.get('extra').get('metavars').get('$...VM_SERVER_ROLE', {}).get('abstract_content',"")
-            vm_server_owning_team = finding.get('extra').get('metavars').get('$...VM_SERVER_OWNING_TEAM', {}).get('abstract_content',"")
-            vm_server_maintaining_team = finding.get('extra').get('metavars').get('$...VM_SERVER_MAINTAINING_TEAM', {}).get('abstract_content',"")
-            vm_prometheus_env = finding.get('extra').get('metavars').get('$...VM_PROMETHEUS_ENV', {}).get('abstract_content',"")
-            vlan_id = finding.get('extra').get('metavars').get('$...VLAN_ID', {}).get('abstract_content',"")
-            dc = finding.get('extra').get('metavars').get('$...DC', {}).get('abstract_content',"")
+            metavars = finding.get('extra').get('metavars')
 
-            hash_key = self.calc_uniq_hash([finding_file, vm_name])
+            vm_name = metavars.get('$...VM_NAME', {}).get('abstract_content',"")
 
-            if hash_key not in parsed_objects_dict:
+            # every rule captures module name and one attribute as $...ATTR_NAME
+            for attr_name, prop_name in self.config.terraform_props.items():
 
-                parsed_objects_dict[hash_key] = CodeObject(
-                    hash=hash_key,
-                    object_name=f"Virtual machine {vm_name}",
-                    object_type="vm",
-                    parser=self.parser,
-                    file=finding_file,
-                    line=finding_line_int,
-                    properties={},
-                    fields={}
-                )
+                value = metavars.get(f"$...{attr_name.upper()}", {}).get('abstract_content',"")
 
-            if 'get-vm-name' in rule_id:
-                parsed_objects_dict[hash_key].line = finding_line_int
+                if value:
+                    self.add_vm_prop(parsed_objects_dict, finding_file, vm_name, finding_line_int, prop_name, value)
+
+            hash_key = self.calc_uniq_hash([finding_file, vm_name])
 
-            if vm_name :
-                parsed_objects_dict[hash_key].properties['vm_name'] = CodeObjectProp(
-                    prop_name='vm_name',
-                    prop_value=vm_name
-                )
-
-            if vm_domain :
-                parsed_objects_dict[hash_key].properties['vm_domain'] = CodeObjectProp(
-                    prop_name='vm_domain',
-                    prop_value=vm_domain
-                )
-
-                parsed_objects_dict[hash_key].object_name = f"Virtual machine {vm_name}.{vm_domain}"
-
-            if vm_template :
-                parsed_objects_dict[hash_key].properties['vm_template'] = CodeObjectProp(
-                    prop_name='vm_template',
-                    prop_value=vm_template
-                ) 
-
-            if vm_pool :
-                parsed_objects_dict[hash_key].properties['vm_pool'] = CodeObjectProp(
-                    prop_name='vm_pool',
-                    prop_value=vm_pool
-                )
-
-            if vm_desc :
-                parsed_objects_dict[hash_key].properties['vm_desc'] = CodeObjectProp(
-                    prop_name='vm_desc',
-                    prop_value=vm_desc
-                )
-
-            if vm_server_cluster_name :
-                parsed_objects_dict[hash_key].properties['vm_server_cluster_name'] = CodeObjectProp(
-                    prop_name='vm_server_cluster_name',
-                    prop_value=vm_server_cluster_name
-                )
-                
-            if vm_server_role :
-                parsed_objects_dict[hash_key].properties['vm_server_role'] = CodeObjectProp(
-                    prop_name='vm_server_role',
-                    prop_value=vm_server_role
-                )
-
-            if vm_server_owning_team :
-                parsed_objects_dict[hash_key].properties['vm_server_owning_team'] = CodeObjectProp(
-                    prop_name='vm_server_owning_team',
-                    prop_value=vm_server_owning_team
-                )
-
-            if vm_server_maintaining_team :
-                parsed_objects_dict[hash_key].properties['vm_server_maintaining_team'] = CodeObjectProp(
-                    prop_name='vm_server_maintaining_team',
-                    prop_value=vm_server_maintaining_team
-                )
-
-            if vm_prometheus_env :
-                parsed_objects_dict[hash_key].properties['vm_prometheus_env'] = CodeObjectProp(
-                    prop_name='vm_prometheus_env',
-                    prop_value=vm_prometheus_env
-                )
-
-            if vlan_id :
-                parsed_objects_dict[hash_key].properties['vlan_id'] = CodeObjectProp(
-                    prop_name='vlan_id',
-                    prop_value=vlan_id
-                )
-
-            if dc :
-                parsed_objects_dict[hash_key].properties['dc'] = CodeObjectProp(
-                    prop_name='dc',
-                    prop_value=dc
-                )
+            if 'get-vm-name' in rule_id and hash_key in parsed_objects_dict:
+                parsed_objects_dict[hash_key].line = finding_line_int
         
         if parsed_objects_dict:
             parsed_objects = list(parsed_objects_dict.values())
 
         logger.info(f"For scan {self.parser} data parse {len(parsed_objects)} objects")
-        return parsed_objects
\ No newline at end of file
+        return parsed_objects
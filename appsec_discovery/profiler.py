@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import logging
+import resource
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Stage timings for --profile: wall and cpu time (semgrep and worker processes included),
+# peak of python memory allocated during stage (with trace_memory, tracemalloc peak is reset at stage start),
+# max rss of process and children since start, counts reported by stage and semgrep per rule timings.
+# Stages matching hot_stage prefix additionally run under cProfile or pyinstrument.
+
+
+def rss_mb(who) -> float:
+    # ru_maxrss is kilobytes on linux
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+
+def traced_peak_mb() -> float:
+    return round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+
+
+class Profiler:
+
+    def __init__(self, hot_stage: str = None, dump_file: str = None, python_profiler: str = 'cprofile', rule_budget: float = None, top: int = 20, trace_memory: bool = False):
+
+        self.stages: List[Dict] = []
+        self.semgrep: List[Dict] = []
+
+        # seconds of match and parse time per rule before warning, slowest files kept per semgrep run
+        self.rule_budget = rule_budget
+        self.top = top
+
+        self.hot_stage = hot_stage
+        self.dump_file = dump_file
+        self.python_profiler = python_profiler
+        self.hot_profiler = None
+
+        # tracemalloc slows allocations, so it runs only for --profile, tracing started by caller is left running
+        self.trace_memory = trace_memory
+        self.own_tracing = trace_memory and not tracemalloc.is_tracing()
+
+        if self.own_tracing:
+            tracemalloc.start()
+
+        self.started = time.perf_counter()
+
+    def start_hot_profiler(self, name: str) -> bool:
+
+        if not self.hot_stage or not name.startswith(self.hot_stage):
+            return False
+
+        if self.hot_profiler is None:
+
+            if self.python_profiler == 'pyinstrument':
+                try:
+                    from pyinstrument import Profiler as PyinstrumentProfiler
+                except ImportError:
+                    raise Exception("pyinstrument profiler needs pyinstrument package installed")
+
+                self.hot_profiler = PyinstrumentProfiler()
+            else:
+                import cProfile
+                self.hot_profiler = cProfile.Profile()
+
+        # both profilers accumulate samples over several start and stop calls
+        if self.python_profiler == 'pyinstrument':
+            self.hot_profiler.start()
+        else:
+            self.hot_profiler.enable()
+
+        return True
+
+    def stop_hot_profiler(self):
+
+        if self.python_profiler == 'pyinstrument':
+            self.hot_profiler.stop()
+        else:
+            self.hot_profiler.disable()
+
+    @contextmanager
+    def stage(self, name: str):
+
+        # caller adds counts like files, objects and fields to yielded dict
+        info = {'stage': name}
+        hot = self.start_hot_profiler(name)
+
+        wall = time.perf_counter()
+        cpu = sum(os.times()[:4])
+
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+
+        try:
+            yield info
+
+        finally:
+
+            if hot:
+                self.stop_hot_profiler()
+
+            info['wall_s'] = round(time.perf_counter() - wall, 3)
+            info['cpu_s'] = round(sum(os.times()[:4]) - cpu, 3)
+            info['python_peak_mb'] = traced_peak_mb() if self.trace_memory else None
+            info['process_max_rss_mb'] = rss_mb(resource.RUSAGE_SELF)
+            info['children_max_rss_mb'] = rss_mb(resource.RUSAGE_CHILDREN)
+
+            self.stages.append(info)
+
+            logger.debug(f"Profile stage {name}: {info['wall_s']}s wall, {info['cpu_s']}s cpu, python peak {info['python_peak_mb']}MB, max rss {info['process_max_rss_mb']}MB")
+
+    def add_semgrep_time(self, parser: str, semgrep_time: Dict):
+
+        # semgrep --time output: rules list, per target match and parse times in rules order
+        rules = semgrep_time.get('rules', [])
+        match_times = [0.0] * len(rules)
+        parse_times = [0.0] * len(rules)
+        files = []
+
+        for target in semgrep_time.get('targets', []):
+
+            for index, value in enumerate(target.get('match_times', [])[:len(rules)]):
+                match_times[index] += value or 0
+            for index, value in enumerate(target.get('parse_times', [])[:len(rules)]):
+                parse_times[index] += value or 0
+
+            files.append({'file': target.get('path'), 'run_s': round(target.get('run_time') or 0, 3), 'bytes': target.get('num_bytes')})
+
+        rule_times = []
+
+        for index, rule in enumerate(rules):
+
+            rule_time = {'rule': rule, 'match_s': round(match_times[index], 3), 'parse_s': round(parse_times[index], 3), 'total_s': round(match_times[index] + parse_times[index], 3)}
+            rule_times.append(rule_time)
+
+            if self.rule_budget is not None and rule_time['total_s'] > self.rule_budget:
+                logger.warning(f"Semgrep rule {rule} of {parser} parser took {rule_time['total_s']}s, over budget of {self.rule_budget}s")
+
+        self.semgrep.append({
+            'parser': parser,
+            'targets': len(files),
+            'total_bytes': semgrep_time.get('total_bytes'),
+            'max_memory_bytes': semgrep_time.get('max_memory_bytes'),
+            'profiling_times': semgrep_time.get('profiling_times', {}),
+            'rules': sorted(rule_times, key=lambda rule: rule['total_s'], reverse=True),
+            'slowest_files': sorted(files, key=lambda file: file['run_s'], reverse=True)[:self.top],
+        })
+
+    def rules_report(self) -> Dict:
+
+        # all semgrep runs together: slowest rules and files, rules over budget
+        rules = [dict(rule, parser=run['parser']) for run in self.semgrep for rule in run['rules']]
+        files = {}
+
+        for run in self.semgrep:
+            for file in run['slowest_files']:
+                files.setdefault(file['file'], {'file': file['file'], 'run_s': 0, 'bytes': file['bytes']})
+                files[file['file']]['run_s'] = round(files[file['file']]['run_s'] + file['run_s'], 3)
+
+        return {
+            'rule_budget': self.rule_budget,
+            'over_budget': [dict(rule) for rule in rules if self.rule_budget is not None and rule['total_s'] > self.rule_budget],
+            'slowest_rules': [dict(rule) for rule in sorted(rules, key=lambda rule: rule['total_s'], reverse=True)[:self.top]],
+            'slowest_files': sorted(files.values(), key=lambda file: file['run_s'], reverse=True)[:self.top],
+            'runs': [{key: value for key, value in run.items() if key not in ['rules', 'slowest_files']} for run in self.semgrep],
+        }
+
+    def save(self, profile_file: str):
+
+        if self.own_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+        with open(profile_file, 'w') as profile:
+            json.dump({
+                'total_wall_s': round(time.perf_counter() - self.started, 3),
+                'stages': self.stages,
+                'semgrep': self.semgrep,
+                'hot_stage': self.hot_stage,
+                'hot_stage_dump': self.dump_file if self.hot_profiler is not None else None,
+            }, profile, indent=4)
+
+        if self.hot_profiler is not None and self.dump_file:
+
+            if self.python_profiler == 'pyinstrument':
+                with open(self.dump_file, 'w') as dump:
+                    dump.write(self.hot_profiler.output_html())
+            else:
+                self.hot_profiler.dump_stats(self.dump_file)
+
+        logger.info(f"Saved profile to {profile_file}")
@@ -1,2 +1,6 @@
 from appsec_discovery.services.scan_service import ScanService
-from appsec_discovery.services.report_service import ReportService
\ No newline at end of file
+from appsec_discovery.services.report_service import ReportService
+from appsec_discovery.services.diff_service import DiffService
+from appsec_discovery.services.serve_service import ServeService, submit_job
+from appsec_discovery.services.batch_service import BatchService, load_manifest
+from appsec_discovery.services.watch_service import WatchService
@@ -2,6 +2,8 @@ from llama_cpp import Llama, LlamaRAMCache
 from openai import OpenAI
 
 import re
+import time
+import threading
 
 from typing import List, Dict
 import logging
@@ -13,6 +15,40 @@ skip_ai = ['created_at', 'updated_at', 'deleted_at']
 
 logger = logging.getLogger(__name__)
 
+# local models are loaded once per process and reused by next objects and serve mode jobs
+loaded_models = {}
+models_lock = threading.Lock()
+
+
+class LockedModel:
+
+    # llama context is not thread safe, serve mode jobs take turns
+    def __init__(self, llm):
+        self.llm = llm
+        self.lock = threading.Lock()
+
+    def create_chat_completion(self, **kwargs):
+        with self.lock:
+            return self.llm.create_chat_completion(**kwargs)
+
+
+def load_model(ai_local: AiLocal) -> LockedModel:
+
+    key = (ai_local.model_id, ai_local.gguf_file, ai_local.model_folder)
+
+    with models_lock:
+
+        if key not in loaded_models:
+
+            loaded_models[key] = LockedModel(Llama.from_pretrained(
+                repo_id=ai_local.model_id,
+                filename=ai_local.gguf_file,
+                verbose=False,
+                cache_dir=ai_local.model_folder,
+            ))
+
+    return loaded_models[key]
+
 class AiService:
 
     def __init__(self, exclude_scoring: List[ExcludeScoring], ai_local: AiLocal = None, ai_api: AiApi = None):
@@ -22,13 +58,23 @@ class AiService:
 
         self.exclude_scoring = exclude_scoring       
 
-    def ai_score_objects(self, code_objects: List[CodeObject]) -> List[CodeObject]:
+        # objects not scored because of time budget
+        self.skipped_objects = 0
+
+    def ai_score_objects(self, code_objects: List[CodeObject], deadline: float = None) -> List[CodeObject]:
 
         scored_objects: List[CodeObject] = []
 
         try:
 
-            for object in code_objects:
+            for index, object in enumerate(code_objects):
+
+                # objects left after time budget deadline keep rule based scoring only
+                if deadline is not None and time.monotonic() > deadline:
+                    self.skipped_objects = len(code_objects) - index
+                    scored_objects += code_objects[index:]
+                    logger.warning(f"Time budget is over, {self.skipped_objects} objects are not scored with AI")
+                    break
 
                 choosen_fields = []
                 fields_str = ''
@@ -85,13 +131,7 @@ class AiService:
                 # Local
                 if choosen_fields and self.ai_local:
 
-                    llm = Llama.from_pretrained(
-                        repo_id=self.ai_local.model_id,
-                        filename=self.ai_local.gguf_file,
-                        verbose=False,
-                        cache_dir=self.ai_local.model_folder,
-
-                    )
+                    llm = load_model(self.ai_local)
 
                     response = llm.create_chat_completion(
                         messages = [
@@ -230,6 +270,9 @@ class AiService:
 
                         if not excluded :
 
+                            if hasattr(object, 'own_field'):
+                                field = object.own_field(field_name)
+
                             if not field.severity:
                                 field.severity = severity
                                 field.tags = tags
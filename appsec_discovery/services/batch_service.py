@@ -0,0 +1,165 @@
+from typing import List, Dict
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import yaml
+
+from appsec_discovery.models import ScoreConfig
+from appsec_discovery.parsers import ParserFactory
+from appsec_discovery.parsers.content_cache import ContentCache
+from appsec_discovery.services.scan_service import ScanService
+from appsec_discovery.services.report_service import ReportService
+from appsec_discovery.services.ai_service import load_model
+
+logger = logging.getLogger(__name__)
+
+# Many repositories in one process: scoring config is parsed once, parser registry, local llm
+# and content cache of native extract results are shared by all repos, repos run in thread pool.
+
+report_extensions = {'json': '.json', 'yaml': '.yaml', 'sarif': '.sarif', 'compact': '.jsonl.gz', 'sqlite': '.sqlite'}
+
+
+def load_manifest(manifest_file: str) -> List[Dict]:
+
+    # yaml with repos list and optional output_folder, repo is source path or dict with source,
+    # output, output_type and engine, relative paths are relative to manifest folder
+    with open(manifest_file) as manifest_stream:
+        manifest = yaml.safe_load(manifest_stream) or {}
+
+    if isinstance(manifest, list):
+        manifest = {'repos': manifest}
+
+    manifest_folder = os.path.dirname(os.path.abspath(manifest_file))
+    output_folder = manifest.get('output_folder')
+
+    if output_folder:
+        output_folder = os.path.join(manifest_folder, output_folder)
+
+    repos = []
+    names = {}
+
+    for entry in manifest.get('repos', []):
+
+        repo = dict(entry) if isinstance(entry, dict) else {'source': entry}
+
+        if not repo.get('source'):
+            raise Exception(f"Manifest repo {entry} has no source")
+
+        repo['source'] = os.path.join(manifest_folder, repo['source'])
+
+        if repo.get('output'):
+            repo['output'] = os.path.join(manifest_folder, repo['output'])
+
+        elif output_folder:
+            # same folder names of different repos get number suffix
+            name = os.path.basename(os.path.normpath(repo['source']))
+            names[name] = names.get(name, 0) + 1
+            repo['name'] = name if names[name] == 1 else f"{name}-{names[name]}"
+
+        else:
+            raise Exception(f"Manifest repo {repo['source']} has no output and manifest has no output_folder")
+
+        repos.append(repo)
+
+    return [dict(repo, output_folder=output_folder) for repo in repos]
+
+
+class BatchService:
+
+    def __init__(self, repos: List[Dict], conf_file=None, workers: int = 4, output_type: str = 'json', engine: str = None,
+                 only_scored_objects: bool = False, sarif_snippets: bool = True):
+
+        self.repos = repos
+        self.workers = workers
+        self.output_type = output_type
+        self.engine = engine
+        self.only_scored_objects = only_scored_objects
+        self.sarif_snippets = sarif_snippets
+
+        self.config: ScoreConfig = ScanService(conf_file=conf_file).config
+        self.content_cache = ContentCache()
+
+    def repo_output(self, repo: Dict, output_type: str) -> str:
+
+        if repo.get('output'):
+            return repo['output']
+
+        return os.path.join(repo['output_folder'], repo['name'] + report_extensions[output_type])
+
+    def scan_repo(self, repo: Dict) -> Dict:
+
+        output_type = repo.get('output_type', self.output_type)
+        result = {'source': repo['source'], 'output': self.repo_output(repo, output_type), 'output_type': output_type}
+
+        started = time.perf_counter()
+
+        try:
+            if not os.path.isdir(repo['source']):
+                raise Exception("source folder not found")
+
+            # scan service changes engine and parsers of config, every repo gets own copy
+            scan_service = ScanService(source_folder=repo['source'], config=self.config.copy(deep=True), only_scored_objects=self.only_scored_objects,
+                                       engine=repo.get('engine', self.engine), content_cache=self.content_cache)
+
+            scanned_objects = scan_service.scan_folder()
+
+            os.makedirs(os.path.dirname(result['output']) or '.', exist_ok=True)
+
+            report_service = ReportService(code_objects=scanned_objects, report_type=output_type,
+                                           report_file=result['output'] if output_type == 'sqlite' else open(result['output'], 'w'),
+                                           sarif_snippets=self.sarif_snippets, source=repo['source'], profiler=scan_service.profiler)
+            report_service.save_report_to_disk()
+
+            result['status'] = 'done'
+            result['files'] = sum(stage.get('files', 0) for stage in scan_service.profiler.stages if stage['stage'] == 'files')
+            result['objects'] = len(scanned_objects)
+            result['scored_objects'] = sum(1 for object in scanned_objects if object.severity)
+
+        except Exception as ex:
+            logger.error(f"Failed batch scan of {repo['source']}: {ex}")
+            result['status'] = 'failed'
+            result['error'] = str(ex)
+
+        result['wall_s'] = round(time.perf_counter() - started, 3)
+
+        logger.info(f"Batch scan of {repo['source']} {result['status']} in {result['wall_s']}s")
+
+        return result
+
+    def run(self) -> Dict:
+
+        # parsers and local model are loaded before workers start
+        for parser_type in ParserFactory.get_parser_types():
+            ParserFactory.get_parser(parser_type)
+
+        if self.config.ai_local:
+            load_model(self.config.ai_local)
+
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(self.scan_repo, self.repos))
+
+        wall = time.perf_counter() - started
+
+        done = [result for result in results if result['status'] == 'done']
+
+        files = sum(result['files'] for result in done)
+        objects = sum(result['objects'] for result in done)
+
+        return {
+            'repos': len(results),
+            'done': len(done),
+            'failed': len(results) - len(done),
+            'workers': self.workers,
+            'wall_s': round(wall, 3),
+            'files': files,
+            'objects': objects,
+            'scored_objects': sum(result['scored_objects'] for result in done),
+            'repos_per_s': round(len(results) / wall, 2) if wall else None,
+            'files_per_s': round(files / wall, 1) if wall else None,
+            'objects_per_s': round(objects / wall, 1) if wall else None,
+            'content_cache': self.content_cache.stats(),
+            'results': results,
+        }
@@ -0,0 +1,292 @@
+from typing import List, Dict, Iterator
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import tempfile
+
+from appsec_discovery.models import ScoreConfig, CodeObject, DiffReport
+from appsec_discovery.services.scan_service import ScanService
+from appsec_discovery.json_stream import iter_json_array
+
+logger = logging.getLogger(__name__)
+
+# objects from these files are resolved across files, any change rescans all of them
+context_extensions = ['.proto', '.graphql']
+
+
+def digest(value) -> str:
+    return hashlib.md5(json.dumps(value, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def field_digests(object_dict: Dict) -> Dict[str, str]:
+    # type, score and tags of each field, lines are not a change
+    return {
+        field_name: digest([field.get('field_type'), field.get('severity'), field.get('tags')])
+        for field_name, field in object_dict.get('fields', {}).items()
+    }
+
+
+def object_digest(object_dict: Dict, fields: Dict[str, str]) -> str:
+
+    properties = {prop_name: [prop.get('prop_value'), prop.get('severity')] for prop_name, prop in object_dict.get('properties', {}).items()}
+
+    return digest([object_dict.get('object_name'), object_dict.get('severity'), object_dict.get('tags'), properties, fields])
+
+
+class DiffService:
+
+    def __init__(self, source_folder, base_ref, config: ScoreConfig, only_scored_objects=False):
+
+        # base checkout lives in temp folder, object hashes match only with same relative paths
+        self.source_folder = source_folder.rstrip('/') if len(source_folder) > 1 else source_folder
+        self.base_ref = base_ref
+        self.config = config
+        self.only_scored_objects = only_scored_objects
+
+        self.prefix = ''
+
+    def git(self, args: List[str]) -> str:
+
+        result = subprocess.run(["git", "-C", self.source_folder] + args, capture_output=True, text=True)
+
+        if result.returncode != 0:
+            raise Exception(f"git {' '.join(args)} failed: {result.stderr.strip()}")
+
+        return result.stdout
+
+    def changed_files(self):
+
+        # committed, staged, unstaged and untracked changes since merge base, relative to source folder
+        self.prefix = self.git(["rev-parse", "--show-prefix"]).strip()
+
+        merge_base = self.git(["merge-base", self.base_ref, "HEAD"]).strip()
+
+        changed = self.git(["diff", "--name-only", "--relative", "--no-renames", "-z", merge_base]).split('\0')
+        untracked = self.git(["ls-files", "--others", "--exclude-standard", "-z"]).split('\0')
+
+        changed_files = set(file for file in changed + untracked if file)
+
+        for extension in context_extensions:
+
+            if any(file.endswith(extension) for file in changed_files):
+
+                head_files = self.git(["ls-files", "--cached", "--others", "--exclude-standard", "-z", "--", f"*{extension}"]).split('\0')
+                base_files = [
+                    file[len(self.prefix):]
+                    for file in self.git(["ls-tree", "-r", "--name-only", "--full-tree", "-z", merge_base]).split('\0')
+                    if file.startswith(self.prefix) and file.endswith(extension)
+                ]
+
+                changed_files.update(file for file in head_files + base_files if file)
+
+        return merge_base, sorted(changed_files)
+
+    def checkout_base(self, revision: str, files: List[str], target_folder: str):
+
+        # one git cat-file process for all files, files missing in base are skipped
+        batch_input = ''.join(f"{revision}:{self.prefix}{file}\n" for file in files)
+
+        result = subprocess.run(["git", "-C", self.source_folder, "cat-file", "--batch"], input=batch_input.encode(), capture_output=True)
+
+        output = result.stdout
+        pos = 0
+
+        for file in files:
+
+            header_end = output.index(b'\n', pos)
+            header = output[pos:header_end].decode(errors='replace').split(' ')
+            pos = header_end + 1
+
+            if len(header) != 3 or header[2] == 'missing':
+                continue
+
+            size = int(header[2])
+            content = output[pos:pos + size]
+            pos += size + 1
+
+            if header[1] != 'blob':
+                continue
+
+            file_path = os.path.join(target_folder, file)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+            with open(file_path, 'wb') as base_file:
+                base_file.write(content)
+
+    def scan_diff(self) -> List[DiffReport]:
+
+        try:
+            merge_base, changed_files = self.changed_files()
+        except Exception as ex:
+            logger.error(f"Failed to get changed files for {self.source_folder} against {self.base_ref}: {ex}")
+            return []
+
+        logger.info(f"Found {len(changed_files)} changed files in {self.source_folder} against {self.base_ref} ({merge_base})")
+
+        if not changed_files:
+            return []
+
+        head_service = ScanService(source_folder=self.source_folder, only_files=changed_files, config=self.config)
+        head_objects = head_service.scan_folder()
+
+        # base objects are only compared, llm scoring is not needed
+        base_config = self.config.copy(update={'ai_local': None, 'ai_api': None})
+
+        with tempfile.TemporaryDirectory() as base_folder:
+
+            self.checkout_base(merge_base, changed_files, base_folder)
+
+            base_service = ScanService(source_folder=base_folder, config=base_config)
+            base_objects = base_service.scan_folder()
+
+        return self.diff_objects(base_objects, head_objects, self.only_scored_objects)
+
+    @staticmethod
+    def object_changes(base_object: CodeObject, head_object: CodeObject):
+
+        # lines and scores are ignored, only extracted content counts as change
+        changed_fields = []
+
+        for field_name in list(head_object.fields) + [name for name in base_object.fields if name not in head_object.fields]:
+
+            base_field = base_object.fields.get(field_name)
+            head_field = head_object.fields.get(field_name)
+
+            if not base_field or not head_field or base_field.field_type != head_field.field_type:
+                changed_fields.append(field_name)
+
+        changed_properties = []
+
+        for prop_name in list(head_object.properties) + [name for name in base_object.properties if name not in head_object.properties]:
+
+            base_prop = base_object.properties.get(prop_name)
+            head_prop = head_object.properties.get(prop_name)
+
+            if not base_prop or not head_prop or base_prop.prop_value != head_prop.prop_value:
+                changed_properties.append(prop_name)
+
+        return changed_fields, changed_properties
+
+    @staticmethod
+    def diff_report(change: str, code_object: CodeObject, changed_fields: List[str] = [], changed_properties: List[str] = [], old_severity: str = None) -> DiffReport:
+
+        return DiffReport(
+            file=code_object.file,
+            object_type=code_object.object_type,
+            object_name=code_object.object_name,
+            change=change,
+            hash=code_object.hash,
+            parser=code_object.parser,
+            line=code_object.line,
+            severity=code_object.severity,
+            old_severity=old_severity,
+            tags=code_object.tags,
+            changed_fields=changed_fields,
+            changed_properties=changed_properties,
+            code_object=code_object
+        )
+
+    @staticmethod
+    def diff_objects(base_objects: List[CodeObject], head_objects: List[CodeObject], only_scored_objects=False) -> List[DiffReport]:
+
+        diff_reports: List[DiffReport] = []
+
+        base_index: Dict[str, CodeObject] = {object.hash: object for object in base_objects}
+        head_hashes = set()
+
+        for object in head_objects:
+
+            head_hashes.add(object.hash)
+            base_object = base_index.get(object.hash)
+
+            if base_object is None:
+                diff_reports.append(DiffService.diff_report('new', object))
+                continue
+
+            changed_fields, changed_properties = DiffService.object_changes(base_object, object)
+
+            if changed_fields or changed_properties or base_object.object_name != object.object_name:
+                diff_reports.append(DiffService.diff_report('changed', object, changed_fields, changed_properties, old_severity=base_object.severity))
+
+        for object in base_objects:
+            if object.hash not in head_hashes:
+                diff_reports.append(DiffService.diff_report('removed', object))
+
+        return [report for report in diff_reports if report.severity or not only_scored_objects]
+
+    @staticmethod
+    def diff_report_files(old_report: str, new_report: str, only_scored_objects=False) -> Iterator[DiffReport]:
+
+        # smaller report is indexed by hash with digests, bigger one is streamed against it,
+        # reports are emitted while streaming: new and changed in new report order, then removed
+        old_is_small = os.path.getsize(old_report) <= os.path.getsize(new_report)
+        small_report, big_report = (old_report, new_report) if old_is_small else (new_report, old_report)
+
+        index: Dict[str, List] = {}
+
+        with open(small_report) as report:
+            for object_dict in iter_json_array(report):
+                fields = field_digests(object_dict)
+                index[object_dict['hash']] = [object_digest(object_dict, fields), object_dict.get('severity'), fields]
+
+        logger.info(f"Indexed {len(index)} objects from {small_report}")
+
+        # for bigger old report: hash => (changed fields, old severity) and hashes of removed objects
+        changes: Dict[str, tuple] = {}
+        removed = set()
+
+        with open(big_report) as report:
+
+            for object_dict in iter_json_array(report):
+
+                entry = index.pop(object_dict['hash'], None)
+
+                if entry is None:
+                    if old_is_small:
+                        yield from DiffService.scored_report('new', object_dict, only_scored_objects)
+                    else:
+                        removed.add(object_dict['hash'])
+                    continue
+
+                fields = field_digests(object_dict)
+
+                if object_digest(object_dict, fields) == entry[0]:
+                    continue
+
+                changed_fields = [name for name in fields if entry[2].get(name) != fields[name]] + [name for name in entry[2] if name not in fields]
+
+                if old_is_small:
+                    yield from DiffService.scored_report('changed', object_dict, only_scored_objects, changed_fields, entry[1])
+                else:
+                    changes[object_dict['hash']] = (changed_fields, object_dict.get('severity'))
+
+        # objects left in index are missing in bigger report
+        missing = set(index)
+        del index
+
+        with open(small_report) as report:
+
+            for object_dict in iter_json_array(report):
+
+                object_hash = object_dict['hash']
+
+                if object_hash in missing:
+                    yield from DiffService.scored_report('removed' if old_is_small else 'new', object_dict, only_scored_objects)
+
+                elif object_hash in changes:
+                    changed_fields, old_severity = changes[object_hash]
+                    yield from DiffService.scored_report('changed', object_dict, only_scored_objects, changed_fields, old_severity)
+
+        if removed:
+            with open(big_report) as report:
+                for object_dict in iter_json_array(report):
+                    if object_dict['hash'] in removed:
+                        yield from DiffService.scored_report('removed', object_dict, only_scored_objects)
+
+    @staticmethod
+    def scored_report(change: str, object_dict: Dict, only_scored_objects=False, changed_fields: List[str] = [], old_severity: str = None) -> Iterator[DiffReport]:
+
+        if object_dict.get('severity') or not only_scored_objects:
+            yield DiffService.diff_report(change, CodeObject(**object_dict), changed_fields, old_severity=old_severity)
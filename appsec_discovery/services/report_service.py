@@ -1,157 +1,519 @@
-from typing import List, Dict
+from typing import List, Dict, Iterable
 import logging
+import sys
+import io
+import gzip
+import sqlite3
+import datetime
+import textwrap
 import yaml
 import json
-import sarif_om as om
-from jschema_to_python.to_json import to_json
 
-from appsec_discovery.models import CodeObject
+from appsec_discovery.models import CodeObject, DiffReport
+from appsec_discovery.models.compact import CompactObject, CompactField, to_models
+from appsec_discovery.profiler import Profiler
 
 logger = logging.getLogger(__name__)
 
+compact_format = 'appsec-discovery-compact'
+
+# one database may hold reports of many scans, rows of each scan are linked to reports row
+sqlite_schema = '''
+CREATE TABLE IF NOT EXISTS reports (id INTEGER PRIMARY KEY, source TEXT, created_at TEXT, scan TEXT);
+CREATE TABLE IF NOT EXISTS objects (id INTEGER PRIMARY KEY, report_id INTEGER, hash TEXT, object_name TEXT, object_type TEXT, parser TEXT, severity TEXT, file TEXT, line INTEGER);
+CREATE TABLE IF NOT EXISTS properties (id INTEGER PRIMARY KEY, object_id INTEGER, name TEXT, prop_name TEXT, prop_value TEXT, file TEXT, line INTEGER, severity TEXT);
+CREATE TABLE IF NOT EXISTS fields (id INTEGER PRIMARY KEY, object_id INTEGER, name TEXT, field_name TEXT, field_type TEXT, file TEXT, line INTEGER, severity TEXT);
+CREATE TABLE IF NOT EXISTS tags (object_id INTEGER, property_id INTEGER, field_id INTEGER, tag TEXT);
+CREATE INDEX IF NOT EXISTS objects_report_id ON objects (report_id);
+CREATE INDEX IF NOT EXISTS objects_parser ON objects (parser);
+CREATE INDEX IF NOT EXISTS objects_object_type ON objects (object_type);
+CREATE INDEX IF NOT EXISTS objects_severity ON objects (severity);
+CREATE INDEX IF NOT EXISTS properties_object_id ON properties (object_id);
+CREATE INDEX IF NOT EXISTS fields_object_id ON fields (object_id);
+CREATE INDEX IF NOT EXISTS fields_field_name ON fields (field_name);
+CREATE INDEX IF NOT EXISTS fields_severity ON fields (severity);
+CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag);
+CREATE INDEX IF NOT EXISTS tags_object_id ON tags (object_id);
+'''
+
+# libyaml emitter when available, same text as yaml.safe_dump
+SnippetDumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+zstd_magic = b'\x28\xb5\x2f\xfd'
+
+
+def zstd_module():
+
+    # zstandard is optional, gzip is used by default
+    try:
+        import zstandard
+    except ImportError:
+        raise Exception("zstd compressed compact reports need zstandard package, install appsec-discovery[zstd]")
+
+    return zstandard
+
+
+def field_runs(fields: Dict):
+
+    # consecutive fields with same first name part, like input.* or output.*, form one field set
+    runs = []
+
+    for key, field in fields.items():
+
+        prefix = key.split('.')[0]
+
+        if runs and runs[-1][0] == prefix:
+            runs[-1][1].append((key, field))
+        else:
+            runs.append((prefix, [(key, field)]))
+
+    return [run for _, run in runs]
+
 
 class ReportService:
 
-    def __init__(self, code_objects: List[CodeObject], report_type, report_file):
+    def __init__(self, code_objects: List[CodeObject], report_type, report_file, diff_reports: Iterable[DiffReport] = None, sarif_snippets: bool = True, source: str = None, profiler: Profiler = None,
+                 scan_status: Dict = None):
 
         self.report_type = report_type
         self.report_file = report_file
 
         self.code_objects = code_objects
 
+        # diff scan reports new, changed and removed objects instead of all objects,
+        # may be a generator that is consumed once by streamed json and yaml writers
+        self.diff_reports = diff_reports
+
+        # yaml dump of every object as sarif result snippet, slowest part of big sarif reports
+        self.sarif_snippets = sarif_snippets
+
+        # scanned source saved with sqlite reports to tell apart scans in one database
+        self.source = source
+
+        self.profiler = profiler if profiler else Profiler()
+
+        # time budgeted scan status, partial reports are marked with it
+        self.scan_status = scan_status
+
 
     def save_report_to_disk(self):
 
-        if self.report_type == 'yaml':
-            report_str = self.get_yaml_report()
+        with self.profiler.stage(f"report:{self.report_type}") as stage:
 
-        if self.report_type == 'json':
-            report_str = self.get_json_report()
+            stage['objects'] = len(self.code_objects)
+
+            if self.report_type in ['json', 'yaml']:
+                self.write_report()
+
+            if self.report_type == 'compact':
+                self.write_compact_report()
+
+            if self.report_type == 'sqlite':
+                self.write_sqlite_report()
+
+            if self.report_type == 'sarif':
+
+                self.write_sarif_report(self.report_file if self.report_file else sys.stdout)
+
+                if self.report_file:
+                    self.report_file.close()
+                else:
+                    sys.stdout.write("\n")
+
+
+    def dump_objects(self):
+
+        if self.diff_reports is not None:
+            return (report.dict(exclude_none=True) for report in self.diff_reports)
+
+        return (object.dict(exclude_none=True) for object in self.code_objects)
+
+    def write_report(self):
+
+        # same text as get_json_report and get_yaml_report, written object by object
+        output = self.report_file if self.report_file else sys.stdout
+        written = 0
+
+        # yaml report keeps scan status in leading comment, json report in <report>.scan.json next to it
+        if self.scan_status is not None and self.report_type == 'yaml':
+            output.write(f"# scan: {json.dumps(self.scan_status)}\n")
+
+        if self.scan_status is not None and self.report_type == 'json' and self.report_file and getattr(self.report_file, 'name', '-') != '-':
+            with open(f"{self.report_file.name}.scan.json", 'w') as status_file:
+                json.dump(self.scan_status, status_file, indent=4)
+
+        for dumped_object in self.dump_objects():
 
-        if self.report_type == 'sarif':
-            report_str = self.get_sarif_report()
+            if self.report_type == 'json':
+                output.write(("[\n" if not written else ",\n") + textwrap.indent(json.dumps(dumped_object, indent=4), ' ' * 4))
+            else:
+                output.write(yaml.dump([dumped_object], default_flow_style=False, sort_keys=False))
 
-        if self.report_file :
+            written += 1
 
-            self.report_file.write(report_str)
+        if self.report_type == 'json':
+            output.write("\n]" if written else "[]")
+        elif not written:
+            output.write("[]\n")
+
+        if self.report_file:
             self.report_file.close()
+        else:
+            output.write("\n")
+
+    def write_compact_report(self):
+
+        # gzip (or zstd for .zst output file) json lines: files and field sets are written once
+        # on first use and referenced by index from objects, tables always precede references
+        if self.diff_reports is not None:
+            raise Exception("compact report type is not supported for diff reports")
 
+        output = self.report_file if self.report_file else sys.stdout
+        output.flush()
+
+        binary = getattr(output, 'buffer', output)
+
+        if str(getattr(output, 'name', '')).endswith('.zst'):
+            compressed = zstd_module().ZstdCompressor().stream_writer(binary, closefd=False)
         else:
-            print(report_str)
+            compressed = gzip.GzipFile(fileobj=binary, mode='wb')
+
+        files = {}
+        field_sets = {}
+
+        with io.TextIOWrapper(compressed, encoding='utf-8') as stream:
+
+            def write(record):
+                stream.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+            def file_index(file):
+
+                if file is None:
+                    return None
+
+                if file not in files:
+                    files[file] = len(files)
+                    write({'file': file})
+
+                return files[file]
+
+            write({'format': compact_format, 'version': 1, **({'scan': self.scan_status} if self.scan_status is not None else {})})
+
+            for object in self.code_objects:
+
+                object_sets = []
+
+                for run in field_runs(object.fields):
 
+                    field_set = []
+
+                    for key, field in run:
+
+                        entry = [key, field.field_type, file_index(field.file), field.line, field.severity, field.tags]
+
+                        if field.field_name != key:
+                            entry.append(field.field_name)
+
+                        field_set.append(entry)
+
+                    set_key = json.dumps(field_set)
+
+                    if set_key not in field_sets:
+                        field_sets[set_key] = len(field_sets)
+                        write({'field_set': field_set})
+
+                    object_sets.append(field_sets[set_key])
+
+                object_dict = object.dict(exclude_none=True, exclude={'fields'})
+                object_dict['file'] = file_index(object.file)
+                object_dict['field_sets'] = object_sets
+
+                write({'object': object_dict})
+
+        logger.info(f"Saved {len(self.code_objects)} objects with {len(files)} files and {len(field_sets)} field sets to compact report")
+
+        if self.report_file:
+            self.report_file.close()
+
+    def write_sqlite_report(self, batch_size: int = 1000):
+
+        # appends scan to sqlite database at output path, all rows are inserted in one transaction
+        if self.diff_reports is not None:
+            raise Exception("sqlite report type is not supported for diff reports")
+
+        if not self.report_file:
+            raise Exception("sqlite report type needs output file")
+
+        # lazy click file is never opened, so existing database is not truncated
+        db_file = self.report_file if isinstance(self.report_file, str) else self.report_file.name
+
+        if not isinstance(self.report_file, str):
+            self.report_file.close()
+
+        connection = sqlite3.connect(db_file, isolation_level=None)
+
+        try:
+            connection.executescript(sqlite_schema)
+
+            # databases created before scan status column
+            if 'scan' not in [column[1] for column in connection.execute("PRAGMA table_info(reports)")]:
+                connection.execute("ALTER TABLE reports ADD COLUMN scan TEXT")
+
+            connection.execute("BEGIN IMMEDIATE")
+
+            report_id = connection.execute("INSERT INTO reports (source, created_at, scan) VALUES (?, ?, ?)",
+                                           (self.source, datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                                            json.dumps(self.scan_status) if self.scan_status is not None else None)).lastrowid
+
+            # ids are assigned here to insert child rows with executemany, database is locked by transaction
+            object_id, prop_id, field_id = [connection.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+                                            for table in ['objects', 'properties', 'fields']]
+
+            for start in range(0, len(self.code_objects), batch_size):
+
+                objects, props, fields, tags = [], [], [], []
+
+                for object in self.code_objects[start:start + batch_size]:
+
+                    object_id += 1
+                    objects.append((object_id, report_id, object.hash, object.object_name, object.object_type, object.parser, object.severity, object.file, object.line))
+                    tags += [(object_id, None, None, tag) for tag in object.tags or []]
+
+                    for name, prop in object.properties.items():
+                        prop_id += 1
+                        props.append((prop_id, object_id, name, prop.prop_name, prop.prop_value, prop.file, prop.line, prop.severity))
+                        tags += [(object_id, prop_id, None, tag) for tag in prop.tags or []]
+
+                    for name, field in object.fields.items():
+                        field_id += 1
+                        fields.append((field_id, object_id, name, field.field_name, field.field_type, field.file, field.line, field.severity))
+                        tags += [(object_id, None, field_id, tag) for tag in field.tags or []]
+
+                connection.executemany("INSERT INTO objects VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", objects)
+                connection.executemany("INSERT INTO properties VALUES (?, ?, ?, ?, ?, ?, ?, ?)", props)
+                connection.executemany("INSERT INTO fields VALUES (?, ?, ?, ?, ?, ?, ?, ?)", fields)
+                connection.executemany("INSERT INTO tags VALUES (?, ?, ?, ?)", tags)
+
+            connection.execute("COMMIT")
+
+        except Exception:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+
+        finally:
+            connection.close()
+
+        logger.info(f"Saved {len(self.code_objects)} objects to sqlite report {db_file} with report id {report_id}")
+
+    @staticmethod
+    def read_compact_report(report_file: str) -> List[CodeObject]:
+
+        # expands compact report back into code objects, fields of one field set are shared between objects
+        files = []
+        field_sets = []
+        code_objects = []
+
+        with open(report_file, 'rb') as report:
+
+            if report.read(4) == zstd_magic:
+                report.seek(0)
+                compressed = zstd_module().ZstdDecompressor().stream_reader(report)
+            else:
+                report.seek(0)
+                compressed = gzip.GzipFile(fileobj=report, mode='rb')
+
+            stream = io.TextIOWrapper(compressed, encoding='utf-8')
+            header = json.loads(stream.readline() or '{}')
+
+            if header.get('format') != compact_format:
+                raise Exception(f"{report_file} is not a compact report")
+
+            for line in stream:
+
+                record = json.loads(line)
+
+                if 'file' in record:
+                    files.append(record['file'])
+
+                elif 'field_set' in record:
+
+                    field_set = []
+
+                    for entry in record['field_set']:
+
+                        key, field_type, file, line, severity, tags = entry[:6]
+
+                        field = CompactField(
+                            field_name=entry[6] if len(entry) > 6 else key,
+                            field_type=field_type,
+                            file=files[file] if file is not None else None,
+                            line=line,
+                            severity=severity,
+                            tags=tags
+                        )
+                        field.shared = True
+
+                        field_set.append((key, field))
+
+                    field_sets.append(field_set)
+
+                elif 'object' in record:
+
+                    object_dict = record['object']
+                    object_dict['file'] = files[object_dict['file']]
+                    object_dict['fields'] = {}
+
+                    code_object = CompactObject.from_dict(object_dict)
+
+                    for set_index in object_dict['field_sets']:
+                        code_object.fields.update(field_sets[set_index])
+
+                    code_objects.append(code_object)
+
+        return to_models(code_objects)
 
     def get_json_report(self):
 
-        dumped_objects = []
+        dumped_objects = list(self.dump_objects())
 
-        for object in self.code_objects:
-            dumped_objects.append(object.dict(exclude_none=True))
-            
         return json.dumps(dumped_objects, indent=4)
     
     def get_yaml_report(self):
 
-        dumped_objects = []
+        dumped_objects = list(self.dump_objects())
 
-        for object in self.code_objects:
-            dumped_objects.append(object.dict(exclude_none=True))
-            
         return yaml.dump(dumped_objects, default_flow_style=False, sort_keys=False)
 
 
-    def get_sarif_report(self):
+    def sarif_objects(self):
 
-        report = om.SarifLog(
-            schema_uri="https://json.schemastore.org/sarif-2.1.0.json",
-            version="2.1.0",
-            runs=[
-                om.Run(
-                    tool=om.Tool(
-                        driver=om.ToolComponent(
-                            name="appsec-discovery",
-                            semantic_version="0.1.0",
-                            information_uri="https://github.com/dmarushkin/appsec-discovery",
-                            rules=[]
-                        )
-                    ),
-                    results=[]
-                )
-            ]
-        )
+        # (object, sarif baseline state), diff changes map to new, updated and absent results
+        if self.diff_reports is not None:
+            self.diff_reports = list(self.diff_reports)
+            baseline_states = {'new': 'new', 'changed': 'updated', 'removed': 'absent'}
+            return [(report.code_object, baseline_states[report.change]) for report in self.diff_reports]
 
-        rules: Dict[str, om.ReportingDescriptor] = {}
+        return [(object, None) for object in self.code_objects]
 
-        for object in self.code_objects:
+    def sarif_result(self, object: CodeObject, baseline_state: str = None) -> Dict:
 
-            rule = om.ReportingDescriptor(
-                id=f"{object.parser}.{object.object_type}",
-                short_description={
-                    "text": f"Discovered object {object.parser}.{object.object_type}"
-                },
-                full_description={
-                    "text": f"Discovered object {object.parser}.{object.object_type}"
-                },
-                help={
-                    "text": f"Discovered object {object.parser}.{object.object_type}"
+        # key order and omitted defaults (level warning) follow former sarif_om output
+        level = 'note'
+        properties = {}
+
+        if object.severity and object.severity in ['critical','high']:
+            level = 'error'
+
+        if object.severity and object.severity in ['medium','low']:
+            level = 'warning'
+
+        if object.severity and object.tags :
+            properties = {"tags": object.tags }
+
+        physical_location = {
+            "region": {
+                "startLine": object.line
+            },
+            "artifactLocation": {
+                "uri": object.file,
+                "uriBaseId": "%SRCROOT%"
+            }
+        }
+
+        if self.sarif_snippets:
+            physical_location["contextRegion"] = {
+                "snippet": {
+                    "text": yaml.dump(object.dict(exclude_none=True), Dumper=SnippetDumper, sort_keys=False)
                 },
-                properties={},
-                default_configuration={},
-            )
-
-            rules[f"{object.parser}.{object.object_type}"] = rule
-
-        report.runs[0].tool.driver.rules = [rule for rule in rules.values()]
-
-        for object in self.code_objects:
-
-            object_snippet = yaml.safe_dump(object.dict(exclude_none=True), sort_keys=False)
-
-            region = om.Region(
-                start_line=object.line,
-            )
-            context_region=om.Region(
-                start_line=object.line,
-                snippet=om.ArtifactContent(text=object_snippet)
-            )
-
-            level = 'note'
-            properties = {}
-            severity = 'info'
-
-            if object.severity and object.severity in ['critical','high']:
-                level = 'error'
-                severity = object.severity
-            
-            if object.severity and object.severity in ['medium','low']:
-                level = 'warning'
-                severity = object.severity
-
-            if object.severity and object.tags :
-                properties = {"tags": object.tags }
-
-            result = om.Result(
-                rule_id=f"{object.parser}.{object.object_type}",
-                level=level,
-                properties=properties,
-                message=om.Message(
-                    text=f"[{object.parser}.{object.object_type}] {object.object_name}"
-                ),
-                locations=[
-                    om.Location(
-                        physical_location=om.PhysicalLocation(
-                            artifact_location=om.ArtifactLocation(
-                                uri=object.file,
-                                uri_base_id="%SRCROOT%"
-                            ),
-                            region=region,
-                            context_region=context_region
-                        )
-                    )
-                ]
-            )
+                "startLine": object.line
+            }
+
+        result = {
+            "message": {
+                "text": f"[{object.parser}.{object.object_type}] {object.object_name}"
+            }
+        }
+
+        if level != 'warning':
+            result["level"] = level
+
+        result["locations"] = [{"physicalLocation": physical_location}]
+        result["properties"] = properties
+
+        if baseline_state:
+            result["baselineState"] = baseline_state
 
-            report.runs[0].results.append(result)
+        result["ruleId"] = f"{object.parser}.{object.object_type}"
+
+        return result
+
+    def sarif_invocation(self) -> Dict:
+
+        # partial scan is reported as unsuccessful execution with notification of skipped work
+        invocation = {"executionSuccessful": not self.scan_status['partial'], "properties": self.scan_status}
+
+        if self.scan_status['partial']:
+            invocation["toolExecutionNotifications"] = [{
+                "level": "warning",
+                "message": {"text": "Scan stopped by time budget, report is partial: "
+                                    f"skipped parsers {', '.join(self.scan_status['parsers_skipped']) or 'none'}, "
+                                    f"skipped files {sum(self.scan_status['parsers_partial'].values())}, "
+                                    f"objects not scored with AI {self.scan_status['ai_skipped_objects']}"},
+            }]
+
+        return invocation
+
+    def write_sarif_report(self, output):
+
+        # sarif 2.1.0 log written directly, results are serialized one by one
+        sarif_objects = self.sarif_objects()
+        rules: Dict[str, Dict] = {}
+
+        for object, _ in sarif_objects:
+
+            rule_id = f"{object.parser}.{object.object_type}"
+            description = {"text": f"Discovered object {rule_id}"}
+
+            rules[rule_id] = {
+                "id": rule_id,
+                "help": description,
+                "properties": {},
+                "defaultConfiguration": {},
+                "fullDescription": description,
+                "shortDescription": description,
+            }
+
+        report = {
+            "runs": [
+                {
+                    "tool": {
+                        "driver": {
+                            "name": "appsec-discovery",
+                            "rules": list(rules.values()),
+                            "informationUri": "https://github.com/dmarushkin/appsec-discovery",
+                            "semanticVersion": "0.1.0"
+                        }
+                    },
+                    **({"invocations": [self.sarif_invocation()]} if self.scan_status is not None else {}),
+                    "results": []
+                }
+            ],
+            "version": "2.1.0",
+            "$schema": "https://json.schemastore.org/sarif-2.1.0.json"
+        }
+
+        head, tail = json.dumps(report, indent=2).split('"results": []')
+
+        output.write(head + '"results": [')
+
+        for index, (object, baseline_state) in enumerate(sarif_objects):
+            output.write(("\n" if not index else ",\n") + textwrap.indent(json.dumps(self.sarif_result(object, baseline_state), indent=2), ' ' * 8))
+
+        output.write(("\n      ]" if sarif_objects else "]") + tail)
+
+    def get_sarif_report(self):
 
-        return to_json(report)
+        report = io.StringIO()
+        self.write_sarif_report(report)
 
-    
\ No newline at end of file
+        return report.getvalue()
@@ -1,32 +1,89 @@
-from typing import List
+from typing import List, Dict, Tuple
+import os
+import time
+import tempfile
+import gzip
+import json
 import logging
 import yaml
 import re
 
 from appsec_discovery.models import ScoreConfig, CodeObject
+from appsec_discovery.models.compact import CompactObject, to_models
 from appsec_discovery.parsers import ParserFactory, Parser
+from appsec_discovery.parsers.file_filter import FileFilter
+from appsec_discovery.parsers.content_cache import ContentCache
 from appsec_discovery.services.ai_service import AiService
+from appsec_discovery.profiler import Profiler
+from appsec_discovery.sources import Source, open_source
 
 logger = logging.getLogger(__name__)
 
 severities_int = {'critical': 5, 'high': 4, 'medium': 3, 'low': 2, 'info': 1}
 
+objects_format = 'appsec-discovery-objects'
+partial_format = 'appsec-discovery-shard'
+
+# time budgeted scans start parsers by expected value: api specs, dto and db models, then the rest
+parser_priority = ['swagger', 'protobuf', 'graphql', 'python', 'golang', 'java', 'db', 'javascript', 'client', 'terraform']
+
+# share of time budget kept for scoring and report writing
+BUDGET_RESERVE = 0.1
+
 class ScanService:
 
-    def __init__(self, source_folder=None, conf_file=None, only_scored_objects=False):
+    def __init__(self, source_folder=None, conf_file=None, only_scored_objects=False, engine=None, only_files=None, config=None, profiler: Profiler = None, content_cache: ContentCache = None,
+                 shard: Tuple[int, int] = None, time_budget: float = None, git_ref: str = None):
 
         self.conf_file = conf_file
         self.source_folder = source_folder
 
+        # scan only these files relative to source folder, e.g. changed ones
+        self.only_files = only_files
+
+        # (index, count) scans only files of one shard, contents of global view parsers input files are kept for merge,
+        # read while source is open, archive and git sources are closed after parsing
+        self.shard = shard
+        self.shard_sources: Dict[str, str] = {}
+
         self.config = None
 
-        if conf_file:
+        if config:
+            self.config = config
+        elif conf_file:
             self.config = self.load_conf_from_yaml(conf_file)
         else:
             self.config = ScoreConfig()
 
+        if engine:
+            self.config.engine = engine
+
+        # tar or zip archive, piped archive or git tree at ref are read without checkout, files keep paths under source root
+        self.source: Source = open_source(source_folder, git_ref, self.config.ignore) if source_folder else None
+
+        if self.source is not None:
+            self.source_folder = self.source.root
+
         self.only_scored_objects = only_scored_objects
 
+        # stage timings are always collected, semgrep rule timings only for given profiler
+        self.profiler = profiler if profiler else Profiler()
+        self.profile_semgrep = profiler is not None
+
+        # native extract results shared with other scans of this process
+        self.content_cache = content_cache
+
+        # no new parsers, files or AI requests are started after deadline, part of budget is kept for scoring and report
+        self.started = time.monotonic()
+        self.deadline = self.started + time_budget * (1 - BUDGET_RESERVE) if time_budget else None
+        self.budget_status = {
+            'time_budget_s': time_budget,
+            'parsers_done': [],
+            'parsers_partial': {},
+            'parsers_skipped': [],
+            'ai_skipped_objects': 0,
+        }
+
     def load_conf_from_yaml(self, score_config_file_stream):
 
         try:
@@ -42,7 +99,11 @@ class ScanService:
 
     def scan_folder(self) -> List[CodeObject]:
 
-        parsed_objects: List[CodeObject] = []
+        parsed_objects = self.parse_folder()
+
+        return self.process_objects(parsed_objects)
+
+    def selected_parsers(self) -> List[str]:
 
         all_parsers = ParserFactory.get_parser_types()
 
@@ -55,33 +116,294 @@ class ScanService:
                 if parser in all_parsers:
                     parsers_to_scan.append(parser)
 
+        # parser only exclude_scan entries drop whole parser before scan
+        parsers_to_scan = [
+            parser for parser in parsers_to_scan
+            if not any(
+                exclude.parser and exclude.parser.lower() == parser.lower()
+                and exclude.file is None and exclude.object_name is None and exclude.object_type is None
+                for exclude in self.config.exclude_scan
+            )
+        ]
+
+        return parsers_to_scan
+
+    def parse_folder(self) -> List[CompactObject]:
+
+        parsers_to_scan = self.selected_parsers()
+
+        file_filter = FileFilter(self.source_folder, self.config.ignore, self.config.exclude_scan, self.only_files, self.shard, self.source)
+
+        try:
+            return self.run_parsers(parsers_to_scan, file_filter)
+        finally:
+            file_filter.cleanup()
+
+            if self.source is not None:
+                self.source.close()
+
+    def run_parsers(self, parsers_to_scan: List[str], file_filter: FileFilter) -> List[CompactObject]:
+
+        parsed_objects: List[CompactObject] = []
+
+        with self.profiler.stage('files') as stage:
+            stage['files'] = len(file_filter.files())
+            stage['skipped'] = {reason: stats[0] for reason, stats in file_filter.skipped.items()}
+
+        parser_results: Dict[str, List[CompactObject]] = {}
+        scan_order = parsers_to_scan
+
+        # time budgeted scan starts api specs and dto parsers first, report keeps usual parsers order
+        if self.deadline is not None:
+            scan_order = sorted(parsers_to_scan, key=lambda parser: parser_priority.index(parser) if parser in parser_priority else len(parser_priority))
+
+        for parser in scan_order:
+
+            if self.deadline is not None and time.monotonic() > self.deadline:
+                logger.warning(f"Time budget is over, {parser} scan is skipped")
+                self.budget_status['parsers_skipped'].append(parser)
+                continue
+
+            with self.profiler.stage(f"parse:{parser}") as stage:
+
+                ParserCls = ParserFactory.get_parser(parser)
+                parser_instance: Parser = ParserCls(parser=parser, source_folder=self.source_folder, config=self.config, file_filter=file_filter)
+
+                if self.profile_semgrep:
+                    parser_instance.profiler = self.profiler
+
+                if self.content_cache is not None:
+                    parser_instance.content_cache = self.content_cache
+
+                if self.shard and ParserCls.global_view:
+
+                    # types are resolved across files of all shards on merge
+                    for file in parser_instance.input_files():
+                        self.shard_sources[file.replace(self.source_folder, '')] = file_filter.read_bytes(file).decode('utf-8', 'surrogateescape')
+
+                    stage['files'] = parser_instance.files_count
+                    stage['objects'] = 0
+                    continue
+
+                if self.deadline is not None:
+                    parser_instance.deadline = self.deadline
+
+                res = parser_instance.run_scan()
+
+                stage['files'] = parser_instance.files_count
+                stage['objects'] = len(res) if res else 0
+                stage['fields'] = sum(len(object.fields) for object in res) if res else 0
+
+                if self.deadline is not None:
+
+                    # per file parsers got files recently changed first, objects are put back in path order
+                    if res and not ParserCls.global_view:
+                        res = sorted(res, key=lambda object: object.file or '')
+
+                    if parser_instance.skipped_files:
+                        self.budget_status['parsers_partial'][parser] = parser_instance.skipped_files
+                    else:
+                        self.budget_status['parsers_done'].append(parser)
+
+            parser_results[parser] = res or []
+
         for parser in parsers_to_scan:
+            parsed_objects += parser_results.get(parser, [])
 
-            ParserCls = ParserFactory.get_parser(parser)
-            parser_instance: Parser = ParserCls(parser=parser, source_folder=self.source_folder)
+        return parsed_objects
 
-            res = parser_instance.run_scan()
+    def scan_status(self) -> Dict:
 
-            if res:
-                parsed_objects += res
+        # what time budgeted scan did and skipped, saved with report
+        status = dict(self.budget_status)
+        status['partial'] = bool(status['parsers_skipped'] or status['parsers_partial'] or status['ai_skipped_objects'])
+        status['elapsed_s'] = round(time.monotonic() - self.started, 3)
 
-        filtered_objects = self.filter_objects(parsed_objects)
-        scored_objects = self.score_objects(filtered_objects)
+        return status
 
-        if self.config.ai_local or self.config.ai_api:
-            ai = AiService(exclude_scoring=self.config.exclude_scoring, ai_local=self.config.ai_local, ai_api=self.config.ai_api)
-            ai_scored_objects = ai.ai_score_objects(scored_objects)
+    def process_objects(self, parsed_objects: List[CompactObject]) -> List[CodeObject]:
 
-            result_objects = [ obj for obj in ai_scored_objects if obj.severity or not self.only_scored_objects ]
-            return result_objects
+        # filtering, scoring and llm stages, parsed objects may come from dump of earlier scan
+        with self.profiler.stage('filter') as stage:
+            filtered_objects = self.filter_objects(parsed_objects)
+            stage['objects'] = len(filtered_objects)
+
+        with self.profiler.stage('score') as stage:
+            scored_objects = self.score_objects(filtered_objects)
+            stage['objects'] = len(scored_objects)
+            stage['fields'] = sum(len(object.fields) for object in scored_objects)
+            stage['scored_objects'] = sum(1 for object in scored_objects if object.severity)
+
+        if (self.config.ai_local or self.config.ai_api) and self.deadline is not None and time.monotonic() > self.deadline:
+
+            logger.warning("Time budget is over, AI scoring is skipped")
+            self.budget_status['ai_skipped_objects'] = len(scored_objects)
+
+        elif self.config.ai_local or self.config.ai_api:
+
+            with self.profiler.stage('ai') as stage:
+                ai = AiService(exclude_scoring=self.config.exclude_scoring, ai_local=self.config.ai_local, ai_api=self.config.ai_api)
+                scored_objects = ai.ai_score_objects(scored_objects, self.deadline)
+                stage['objects'] = len(scored_objects)
+
+            if self.deadline is not None:
+                self.budget_status['ai_skipped_objects'] = ai.skipped_objects
+
+        # parsers produce compact objects, pydantic models are built only for results
+        with self.profiler.stage('models') as stage:
+            result_objects = to_models([ obj for obj in scored_objects if obj.severity or not self.only_scored_objects ])
+            stage['objects'] = len(result_objects)
 
-        result_objects = [ obj for obj in scored_objects if obj.severity or not self.only_scored_objects ]
         return result_objects
 
     
-    def filter_objects(self, parsed_objects: List[CodeObject]):
+    def dump_objects(self, parsed_objects: List[CompactObject], objects_file: str):
 
-        filtered_objects: List[CodeObject] = []
+        # gzipped json lines: header with source folder, then one unscored object per line
+        with gzip.open(objects_file, 'wt', encoding='utf-8') as objects_stream:
+
+            objects_stream.write(json.dumps({'format': objects_format, 'version': 1, 'source_folder': self.source_folder}) + '\n')
+
+            for object in parsed_objects:
+                objects_stream.write(json.dumps(object.dict(exclude_none=True)) + '\n')
+
+        logger.info(f"Saved {len(parsed_objects)} parsed objects to {objects_file}")
+
+    def load_objects(self, objects_file: str) -> List[CompactObject]:
+
+        parsed_objects: List[CompactObject] = []
+
+        try:
+            with gzip.open(objects_file, 'rt', encoding='utf-8') as objects_stream:
+
+                header = json.loads(objects_stream.readline())
+
+                if header.get('format') != objects_format:
+                    raise Exception("not a parsed objects file")
+
+                self.source_folder = header.get('source_folder')
+
+                for line in objects_stream:
+                    if line.strip():
+                        parsed_objects.append(CompactObject.from_dict(json.loads(line)))
+
+        except Exception as ex:
+            logger.error(f"Failed to load parsed objects from {objects_file}: {ex}")
+
+        logger.info(f"Loaded {len(parsed_objects)} parsed objects from {objects_file}")
+
+        return parsed_objects
+
+    def dump_partial(self, parsed_objects: List[CompactObject], partial_file: str):
+
+        # gzipped json lines: header with shard and config, then objects of per file parsers
+        # and sources of global view parsers, bytes that are not utf-8 survive as surrogates
+        with gzip.open(partial_file, 'wt', encoding='utf-8') as partial_stream:
+
+            partial_stream.write(json.dumps({'format': partial_format, 'version': 1, 'shard': list(self.shard), 'source_folder': self.source_folder,
+                                             'config': json.loads(self.config.json())}) + '\n')
+
+            for object in parsed_objects:
+                partial_stream.write(json.dumps({'object': object.dict(exclude_none=True)}) + '\n')
+
+            for local_file, content in sorted(self.shard_sources.items()):
+                partial_stream.write(json.dumps({'source': local_file, 'content': content}) + '\n')
+
+        logger.info(f"Saved shard {self.shard[0] + 1}/{self.shard[1]} with {len(parsed_objects)} objects and {len(self.shard_sources)} sources to {partial_file}")
+
+    @staticmethod
+    def load_partials(partial_files: List[str]):
+
+        # header of first shard, objects and sources of all shards, shards must be complete set of one scan
+        header = None
+        shards = set()
+        parsed_objects: List[CompactObject] = []
+        sources: Dict[str, str] = {}
+
+        for partial_file in partial_files:
+
+            with gzip.open(partial_file, 'rt', encoding='utf-8') as partial_stream:
+
+                partial_header = json.loads(partial_stream.readline())
+
+                if partial_header.get('format') != partial_format:
+                    raise Exception(f"{partial_file} is not a shard scan file")
+
+                if header is None:
+                    header = partial_header
+
+                if partial_header['shard'][1] != header['shard'][1] or partial_header['config'] != header['config']:
+                    raise Exception(f"{partial_file} is shard of other scan, shard count or config differ")
+
+                if partial_header['shard'][0] in shards:
+                    raise Exception(f"{partial_file} repeats shard {partial_header['shard'][0] + 1}")
+
+                shards.add(partial_header['shard'][0])
+
+                for line in partial_stream:
+
+                    if not line.strip():
+                        continue
+
+                    record = json.loads(line)
+
+                    if 'object' in record:
+                        parsed_objects.append(CompactObject.from_dict(record['object']))
+                    else:
+                        sources[record['source']] = record['content']
+
+        if header is None:
+            raise Exception("no shard scan files")
+
+        missing = [str(index + 1) for index in range(header['shard'][1]) if index not in shards]
+
+        if missing:
+            raise Exception(f"missing shards {', '.join(missing)} of {header['shard'][1]}")
+
+        return header, parsed_objects, sources
+
+    def merge_partials(self, parsed_objects: List[CompactObject], sources: Dict[str, str]) -> List[CompactObject]:
+
+        # objects in same order as single scan: parsers in scan order, per file parsers by file path
+        # like semgrep and native walkers, global view parsers run on sources of all shards
+        merged_objects: List[CompactObject] = []
+        parser_objects: Dict[str, List[CompactObject]] = {}
+
+        for object in parsed_objects:
+            parser_objects.setdefault(object.parser, []).append(object)
+
+        with tempfile.TemporaryDirectory() as merge_folder:
+
+            for local_file, content in sources.items():
+
+                file_path = os.path.join(merge_folder, local_file.lstrip('/'))
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+                with open(file_path, 'wb') as file:
+                    file.write(content.encode('utf-8', 'surrogateescape'))
+
+            file_filter = FileFilter(merge_folder, self.config.ignore, self.config.exclude_scan)
+
+            for parser in self.selected_parsers():
+
+                with self.profiler.stage(f"merge:{parser}") as stage:
+
+                    ParserCls = ParserFactory.get_parser(parser)
+
+                    if ParserCls.global_view:
+                        res = ParserCls(parser=parser, source_folder=merge_folder, config=self.config, file_filter=file_filter).run_scan() or []
+                    else:
+                        res = sorted(parser_objects.get(parser, []), key=lambda object: object.file or '')
+
+                    stage['objects'] = len(res)
+
+                merged_objects += res
+
+        return merged_objects
+
+    def filter_objects(self, parsed_objects: List[CompactObject]):
+
+        filtered_objects: List[CompactObject] = []
 
         for object in parsed_objects:
 
@@ -97,15 +419,20 @@ class ScanService:
                     
                     fitered = True
 
+            if 'all' not in self.config.object_types \
+                and not any(re.match(object_type, object.object_type) or object_type.lower() in object.object_type.lower() for object_type in self.config.object_types):
+
+                fitered = True
+
             if not fitered:
                 filtered_objects.append(object)
 
         return filtered_objects
     
 
-    def score_objects(self, filtered_objects: List[CodeObject]):
+    def score_objects(self, filtered_objects: List[CompactObject]):
 
-        scored_objects: List[CodeObject] = []
+        scored_objects: List[CompactObject] = []
 
         for object in filtered_objects:
 
@@ -183,6 +510,8 @@ class ScanService:
 
                                 if not excluded :
 
+                                    field = object.own_field(field_name)
+
                                     if not field.severity:
                                         field.severity = severity
                                         field.tags = [tag]
@@ -0,0 +1,404 @@
+from typing import Dict
+import os
+import json
+import time
+import hmac
+import uuid
+import socket
+import logging
+import tempfile
+import threading
+import http.client
+import socketserver
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import yaml
+
+from appsec_discovery.models import ScoreConfig
+from appsec_discovery.parsers import ParserFactory
+from appsec_discovery.parsers.content_cache import ContentCache
+from appsec_discovery.services.scan_service import ScanService
+from appsec_discovery.services.report_service import ReportService
+from appsec_discovery.services.ai_service import load_model
+
+logger = logging.getLogger(__name__)
+
+# Local scan daemon: parser registry, parsed scoring configs and local llm stay loaded between jobs,
+# jobs run in thread pool with limited concurrency. Semgrep is still started as process per parser and job.
+# Jobs read any folder daemon user can read, so tcp listen needs shared token, browsers are kept out by
+# json content type and origin checks, output files are written only under output dir and llm endpoints
+# come only from daemon config.
+
+inline_report_types = ['json', 'yaml', 'sarif']
+job_keys = ['source', 'output', 'output_type', 'config', 'engine', 'only_scored_objects', 'sarif_snippets']
+
+# llm endpoints and models of job configs would let clients send code to any host or load any model file
+daemon_only_config_keys = ['ai_local', 'ai_api']
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+
+class ServeHandler(BaseHTTPRequestHandler):
+
+    def send_json(self, code: int, data: Dict):
+
+        body = json.dumps(data).encode()
+
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def authorized(self) -> bool:
+
+        token = self.server.serve_service.token
+
+        if not token:
+            return True
+
+        return hmac.compare_digest(self.headers.get('Authorization', ''), f"Bearer {token}")
+
+    def do_GET(self):
+
+        serve_service = self.server.serve_service
+        path = urlparse(self.path).path
+
+        if path == '/health':
+            return self.send_json(200, serve_service.health())
+
+        if not self.authorized():
+            return self.send_json(401, {'error': 'missing or wrong token'})
+
+        if path.startswith('/jobs/'):
+
+            job = serve_service.get_job(path[len('/jobs/'):])
+
+            if job is None:
+                return self.send_json(404, {'error': 'job not found'})
+
+            return self.send_json(200, job)
+
+        self.send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+
+        serve_service = self.server.serve_service
+        url = urlparse(self.path)
+
+        if url.path != '/jobs':
+            return self.send_json(404, {'error': 'not found'})
+
+        # browser pages can post to localhost, but always send origin and can not send json without cors preflight
+        if self.headers.get('Origin') is not None:
+            return self.send_json(403, {'error': 'cross origin requests are not allowed'})
+
+        if not self.authorized():
+            return self.send_json(401, {'error': 'missing or wrong token'})
+
+        if self.headers.get('Content-Type', '').split(';')[0].strip().lower() != 'application/json':
+            return self.send_json(415, {'error': 'job request needs application/json content type'})
+
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            job_id = serve_service.submit(request)
+        except Exception as ex:
+            return self.send_json(400, {'error': str(ex)})
+
+        if parse_qs(url.query).get('wait', ['0'])[0] not in ['0', '']:
+            return self.send_json(200, serve_service.wait_job(job_id))
+
+        self.send_json(202, serve_service.get_job(job_id))
+
+    def log_message(self, format, *args):
+        # unix socket clients have no address
+        logger.debug(f"Serve request: {format % args}")
+
+
+class ServeService:
+
+    def __init__(self, conf_file=None, concurrency: int = 2, keep_jobs: int = 100, token: str = None, output_dir: str = None):
+
+        # config from serve command is used for jobs without own config
+        self.config = ScanService(conf_file=conf_file).config
+
+        # parsed job configs by yaml text
+        self.configs: Dict[str, ScoreConfig] = {}
+
+        # native extract results of unchanged files are reused by next jobs
+        self.content_cache = ContentCache()
+
+        self.concurrency = concurrency
+        self.keep_jobs = keep_jobs
+
+        # clients send token as bearer authorization, jobs without output dir return reports inline only
+        self.token = token
+        self.output_dir = os.path.realpath(output_dir) if output_dir else None
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+
+        self.jobs: Dict[str, Dict] = OrderedDict()
+        self.futures = {}
+        self.lock = threading.Lock()
+
+        self.server = None
+
+        self.warm_up()
+
+    def warm_up(self):
+
+        for parser_type in ParserFactory.get_parser_types():
+            ParserFactory.get_parser(parser_type)
+
+        if self.config.ai_local:
+            load_model(self.config.ai_local)
+
+        logger.info(f"Serve warmed up {len(ParserFactory.get_parser_types())} parsers")
+
+    def job_config(self, config_text: str = None) -> ScoreConfig:
+
+        config = self.config
+
+        if config_text:
+
+            with self.lock:
+
+                if config_text not in self.configs:
+
+                    config_data = yaml.safe_load(config_text) or {}
+                    daemon_only = [key for key in daemon_only_config_keys if isinstance(config_data, dict) and key in config_data]
+
+                    if daemon_only:
+                        raise Exception(f"Job config can not set {', '.join(daemon_only)}, llm is set in serve config")
+
+                    # llm of daemon config is used for all jobs
+                    self.configs[config_text] = ScoreConfig(**config_data).copy(update={key: getattr(self.config, key) for key in daemon_only_config_keys})
+
+                config = self.configs[config_text]
+
+        # scan service changes engine and parsers of config, every job gets own copy
+        return config.copy(deep=True)
+
+    def job_output(self, output: str = None) -> str:
+
+        if not output:
+            return None
+
+        if not self.output_dir:
+            raise Exception("Job output files are disabled, start serve with --output-dir or get report inline")
+
+        # links and .. parts are resolved before check
+        output_file = os.path.realpath(os.path.join(self.output_dir, output))
+
+        if os.path.commonpath([self.output_dir, output_file]) != self.output_dir:
+            raise Exception(f"Job output {output} is outside of output dir {self.output_dir}")
+
+        return output_file
+
+    def submit(self, request: Dict) -> str:
+
+        unknown = [key for key in request if key not in job_keys]
+
+        if unknown:
+            raise Exception(f"Unknown job keys {', '.join(unknown)}")
+
+        if not request.get('source') or not os.path.isdir(request['source']):
+            raise Exception(f"Job source folder {request.get('source')} not found")
+
+        output_type = request.get('output_type', 'yaml')
+
+        if output_type not in inline_report_types + ['compact', 'sqlite']:
+            raise Exception(f"Unknown report type {output_type}")
+
+        if not request.get('output') and output_type not in inline_report_types:
+            raise Exception(f"{output_type.capitalize()} report type needs output file")
+
+        output = self.job_output(request.get('output'))
+        config = self.job_config(request.get('config'))
+
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': 'queued',
+            'source': request['source'],
+            'output': output,
+            'output_type': output_type,
+            'queued_at': time.time(),
+        }
+
+        with self.lock:
+
+            self.jobs[job['id']] = job
+
+            # forget oldest finished jobs
+            finished = [job_id for job_id, old_job in self.jobs.items() if old_job['status'] in ['done', 'failed']]
+
+            for job_id in finished[:max(len(self.jobs) - self.keep_jobs, 0)]:
+                self.jobs.pop(job_id)
+                self.futures.pop(job_id, None)
+
+            self.futures[job['id']] = self.executor.submit(self.run_job, job, request, config)
+
+        logger.info(f"Queued job {job['id']} for {job['source']}")
+
+        return job['id']
+
+    def run_job(self, job: Dict, request: Dict, config: ScoreConfig):
+
+        job['status'] = 'running'
+        started = time.perf_counter()
+
+        try:
+            scan_service = ScanService(source_folder=request['source'], config=config,
+                                       only_scored_objects=request.get('only_scored_objects', False), engine=request.get('engine'),
+                                       content_cache=self.content_cache)
+
+            scanned_objects = scan_service.scan_folder()
+
+            output = job['output']
+            report_file = output
+
+            if not output:
+                report_fd, report_file = tempfile.mkstemp(prefix='appsec-discovery-serve-')
+                os.close(report_fd)
+
+            try:
+                report_args = {'code_objects': scanned_objects, 'report_type': job['output_type'], 'sarif_snippets': request.get('sarif_snippets', True),
+                               'source': scan_service.source_folder, 'profiler': scan_service.profiler}
+
+                if job['output_type'] == 'sqlite':
+                    ReportService(report_file=report_file, **report_args).save_report_to_disk()
+                else:
+                    with open(report_file, 'w') as report:
+                        ReportService(report_file=report, **report_args).save_report_to_disk()
+
+                if not output:
+                    with open(report_file) as report:
+                        job['report'] = report.read()
+            finally:
+                if not output:
+                    os.remove(report_file)
+
+            job['objects'] = len(scanned_objects)
+            job['stages'] = scan_service.profiler.stages
+            job['status'] = 'done'
+
+        except Exception as ex:
+            logger.error(f"Failed job {job['id']} for {job['source']}: {ex}")
+            job['error'] = str(ex)
+            job['status'] = 'failed'
+
+        job['wall_s'] = round(time.perf_counter() - started, 3)
+
+        logger.info(f"Job {job['id']} {job['status']} in {job['wall_s']}s")
+
+    def get_job(self, job_id: str) -> Dict:
+
+        with self.lock:
+            job = self.jobs.get(job_id)
+
+            return dict(job) if job else None
+
+    def wait_job(self, job_id: str) -> Dict:
+
+        with self.lock:
+            future = self.futures.get(job_id)
+
+        if future:
+            future.result()
+
+        return self.get_job(job_id)
+
+    def health(self) -> Dict:
+
+        with self.lock:
+            statuses = [job['status'] for job in self.jobs.values()]
+
+        return {
+            'status': 'ok',
+            'concurrency': self.concurrency,
+            'parsers': ParserFactory.get_parser_types(),
+            'queued': statuses.count('queued'),
+            'running': statuses.count('running'),
+            'content_cache': self.content_cache.stats(),
+        }
+
+    def start(self, host: str = '127.0.0.1', port: int = 8765, socket_path: str = None):
+
+        # unix socket is only reachable by local users with access to socket file
+        if socket_path:
+
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+
+            self.server = UnixHTTPServer(socket_path, ServeHandler)
+            os.chmod(socket_path, 0o600)
+            logger.info(f"Serving scans on unix://{socket_path}")
+        else:
+
+            if not self.token:
+                raise Exception("Listening on host and port needs token, or use unix socket")
+
+            self.server = ThreadingHTTPServer((host, port), ServeHandler)
+            logger.info(f"Serving scans on http://{host}:{self.server.server_port}")
+
+        self.server.serve_service = self
+
+        return self.server
+
+    def serve_forever(self, host: str = '127.0.0.1', port: int = 8765, socket_path: str = None):
+
+        server = self.start(host, port, socket_path)
+
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            self.executor.shutdown(wait=False)
+
+            if socket_path and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+
+    def __init__(self, socket_path: str, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+def submit_job(server_url: str, request: Dict, wait: bool = True, token: str = None) -> Dict:
+
+    # server url is http://host:port or unix:///path/to/socket
+    url = urlparse(server_url)
+
+    if url.scheme == 'unix':
+        connection = UnixHTTPConnection(url.path)
+    else:
+        connection = http.client.HTTPConnection(url.hostname, url.port or 80)
+
+    try:
+        body = json.dumps(request)
+        headers = {'Content-Type': 'application/json'}
+
+        if token:
+            headers['Authorization'] = f"Bearer {token}"
+
+        connection.request('POST', '/jobs?wait=1' if wait else '/jobs', body=body, headers=headers)
+
+        response = connection.getresponse()
+        data = json.loads(response.read() or b'{}')
+
+        if response.status >= 400:
+            raise Exception(f"Scan server rejected job: {data.get('error')}")
+
+        return data
+    finally:
+        connection.close()
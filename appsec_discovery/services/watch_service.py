@@ -0,0 +1,169 @@
+from typing import List, Dict, Set
+import os
+import time
+import logging
+
+from appsec_discovery.models import CodeObject
+from appsec_discovery.parsers import ParserFactory
+from appsec_discovery.parsers.file_filter import FileFilter
+from appsec_discovery.parsers.content_cache import ContentCache
+from appsec_discovery.services.scan_service import ScanService
+from appsec_discovery.services.report_service import ReportService
+from appsec_discovery.watcher import create_watcher
+
+logger = logging.getLogger(__name__)
+
+# Watch mode: scored objects stay in memory by parser and file, changed files of per file parsers are
+# parsed and scored again. Global view parsers (swagger, protobuf, graphql) are not incremental, change of
+# any of their input files reruns them over all files, protobuf and graphql take unchanged parsed files
+# from content cache, but all types are resolved and all objects scored again.
+# Report is written to temp file and renamed over old one.
+
+watch_report_types = ['json', 'yaml', 'sarif', 'compact']
+
+
+class WatchService:
+
+    def __init__(self, scan_service: ScanService, report_type: str, report_file: str, sarif_snippets: bool = True, poll: bool = False):
+
+        self.scan_service = scan_service
+        self.source_folder = scan_service.source_folder
+        self.config = scan_service.config
+
+        self.report_type = report_type
+        self.report_file = report_file
+        self.sarif_snippets = sarif_snippets
+        self.poll = poll
+
+        self.content_cache = ContentCache()
+
+        self.parsers = scan_service.selected_parsers()
+        self.global_parsers = [parser for parser in self.parsers if ParserFactory.get_parser(parser).global_view]
+        self.file_parsers = [parser for parser in self.parsers if parser not in self.global_parsers]
+
+        # parser => local file => scored objects, objects of global view parsers are kept under None
+        self.objects: Dict[str, Dict[str, List[CodeObject]]] = {parser: {} for parser in self.parsers}
+
+    def scan(self, parsers: List[str], only_files: List[str] = None) -> Dict[str, Dict[str, List[CodeObject]]]:
+
+        # scan config is copied, scan service changes engine and parsers of it
+        config = self.config.copy(deep=True, update={'parsers': parsers})
+
+        scan_service = ScanService(source_folder=self.source_folder, config=config, only_scored_objects=self.scan_service.only_scored_objects,
+                                   only_files=only_files, content_cache=self.content_cache)
+
+        scanned: Dict[str, Dict[str, List[CodeObject]]] = {parser: {} for parser in parsers}
+
+        for object in scan_service.scan_folder():
+            file = None if object.parser in self.global_parsers else object.file
+            scanned.setdefault(object.parser, {}).setdefault(file, []).append(object)
+
+        return scanned
+
+    def full_scan(self):
+
+        self.objects = {parser: {} for parser in self.parsers}
+        self.objects.update(self.scan(self.parsers))
+
+    def update(self, changed_paths: Set[str]):
+
+        started = time.perf_counter()
+
+        # local paths like in objects, removed folders end with /
+        changed = set()
+        removed_folders = []
+
+        for path in changed_paths:
+
+            local_path = path.replace(self.source_folder, '', 1)
+
+            if local_path.endswith(os.sep):
+                removed_folders.append(local_path)
+            else:
+                changed.add(local_path)
+
+        global_parsers = [
+            parser for parser in self.global_parsers
+            if any(file.endswith(tuple(ParserFactory.get_parser(parser).input_extensions)) for file in changed) or removed_folders
+        ]
+
+        # objects of changed and removed files are dropped and scanned again if file still exists
+        for parser in self.file_parsers:
+            for file in list(self.objects[parser]):
+                if file in changed or any(file.startswith(folder) for folder in removed_folders):
+                    self.objects[parser].pop(file)
+
+        existing = [file.lstrip('/') for file in changed if os.path.isfile(os.path.join(self.source_folder, file.lstrip('/')))]
+
+        if existing and self.file_parsers:
+            for parser, files in self.scan(self.file_parsers, existing).items():
+                self.objects[parser].update(files)
+
+        if global_parsers:
+            for parser in global_parsers:
+                self.objects[parser] = {}
+            self.objects.update(self.scan(global_parsers))
+
+        self.write_report()
+
+        logger.info(f"Rescanned {len(changed)} changed files, {len(global_parsers)} global parsers over all their files, report updated in {round(time.perf_counter() - started, 3)}s")
+
+    def code_objects(self) -> List[CodeObject]:
+
+        # same order as full scan: parsers in scan order, objects of per file parsers by file path
+        code_objects: List[CodeObject] = []
+
+        for parser in self.parsers:
+
+            files = self.objects.get(parser, {})
+
+            if parser in self.global_parsers:
+                code_objects += files.get(None, [])
+            else:
+                for file in sorted(files, key=lambda file: file or ''):
+                    code_objects += files[file]
+
+        return code_objects
+
+    def write_report(self):
+
+        temp_file = f"{self.report_file}.tmp"
+
+        report_service = ReportService(code_objects=self.code_objects(), report_type=self.report_type, report_file=open(temp_file, 'w'),
+                                       sarif_snippets=self.sarif_snippets, source=self.source_folder)
+        report_service.save_report_to_disk()
+
+        os.replace(temp_file, self.report_file)
+
+    def watch(self, timeout: float = 1.0, max_updates: int = None):
+
+        file_filter = FileFilter(self.source_folder, self.config.ignore, self.config.exclude_scan)
+        watcher = create_watcher(self.source_folder, file_filter.watched_dir, self.poll)
+
+        self.full_scan()
+        self.write_report()
+
+        logger.info(f"Watching {self.source_folder} for changes, report {self.report_file}")
+
+        updates = 0
+
+        try:
+            while max_updates is None or updates < max_updates:
+
+                changed, overflow = watcher.changes(timeout)
+
+                if overflow:
+                    logger.warning("Too many changes at once, scanning whole folder")
+                    self.full_scan()
+                    self.write_report()
+                    updates += 1
+
+                elif changed:
+                    self.update(changed)
+                    updates += 1
+
+        except KeyboardInterrupt:
+            pass
+
+        finally:
+            watcher.close()
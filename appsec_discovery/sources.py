@@ -0,0 +1,365 @@
+import io
+import os
+import sys
+import stat
+import time
+import shutil
+import tarfile
+import tempfile
+import zipfile
+import threading
+import subprocess
+import logging
+from abc import ABC, abstractmethod
+from fnmatch import fnmatch
+from typing import Dict, List, Set, Tuple
+
+from appsec_discovery.models import ScanIgnore
+
+logger = logging.getLogger(__name__)
+
+# Scan sources without checkout: files of tar and zip archives (also piped to stdin) and of git
+# tree at any ref read through git cat-file --batch. Files are listed by path relative to archive
+# or repo root, parsers keep paths under source root like in folder scans and read content from
+# source, semgrep gets only its files written to temp folder. Tar is read once as stream, its files
+# are written to temp folder while reading, semgrep scans them there.
+
+STDIN_SOURCE = '-'
+STDIN_ROOT = '<stdin>'
+
+ZIP_MAGIC = b'PK\x03\x04'
+
+GIT_SYMLINK_MODE = '120000'
+
+
+def decode_text(content: bytes, errors: str = 'strict') -> str:
+    # same text as open() in text mode gives, with universal newlines
+    return content.decode('utf-8', errors).replace('\r\n', '\n').replace('\r', '\n')
+
+
+def normalize_path(name: str) -> str:
+
+    # archive members like ./src/main.go or /src/main.go
+    while name.startswith('./'):
+        name = name[2:]
+
+    name = name.lstrip('/')
+
+    # None for members leaving archive root like ../main.go, they are not listed
+    if not name or '..' in name.split('/'):
+        return None
+
+    return name
+
+
+class Source(ABC):
+
+    def __init__(self, root: str):
+
+        # paths of files are root + local path, like file paths of folder scan
+        self.root = root
+
+        # rel path => (size, mtime)
+        self.entries: Dict[str, Tuple[int, float]] = None
+
+        # ref for recently changed files of time budgeted scans
+        self.git_ref: str = None
+
+        # temp folder already holding files under local paths, materialize uses it instead of writing files again
+        self.folder: str = None
+
+    @abstractmethod
+    def load_entries(self) -> Dict[str, Tuple[int, float]]:
+        pass
+
+    def files(self) -> Dict[str, Tuple[int, float]]:
+
+        if self.entries is None:
+            self.entries = self.load_entries()
+            logger.info(f"Listed {len(self.entries)} files in {self.root}")
+
+        return self.entries
+
+    @abstractmethod
+    def read(self, rel_file: str) -> bytes:
+        pass
+
+    def read_many(self, rel_files: List[str]) -> List[bytes]:
+        return [self.read(rel_file) for rel_file in rel_files]
+
+    def close(self):
+        pass
+
+
+class TarSource(Source):
+
+    # archive is read once as stream, so gzipped and piped tars work, files scan can accept are
+    # written to temp folder as they are read, files of ignored dirs and big files are only listed
+    def __init__(self, root: str, archive: str = None, fileobj=None, ignore: ScanIgnore = None):
+
+        super().__init__(root)
+
+        self.archive = archive
+        self.fileobj = fileobj
+        self.ignore = ignore if ignore else ScanIgnore()
+
+        self.stored: Set[str] = set()
+        self.closed = False
+
+    def wanted(self, rel_file: str, size: int) -> bool:
+
+        if self.ignore.size_limit(rel_file) and size > self.ignore.size_limit(rel_file):
+            return False
+
+        return not any(fnmatch(folder, pattern) for folder in rel_file.split('/')[:-1] for pattern in self.ignore.dirs)
+
+    def store(self, archive: tarfile.TarFile, member: tarfile.TarInfo, rel_file: str):
+
+        path = os.path.join(self.folder, rel_file)
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            with archive.extractfile(member) as member_file, open(path, 'wb') as stored_file:
+                shutil.copyfileobj(member_file, stored_file)
+
+        # file and folder of same name in one archive
+        except OSError as ex:
+            logger.warning(f"Skipped {member.name} of {self.root}: {ex}")
+            return
+
+        self.stored.add(rel_file)
+
+    def load_entries(self) -> Dict[str, Tuple[int, float]]:
+
+        entries = {}
+
+        # piped archive is consumed by first listing
+        if self.closed and self.fileobj is not None:
+            raise Exception(f"{self.root} is already read, piped archive can be scanned once")
+
+        self.closed = False
+        self.folder = tempfile.mkdtemp(prefix='appsec-discovery-tar-')
+        self.stored = set()
+
+        with tarfile.open(name=self.archive, fileobj=self.fileobj, mode='r|*') as archive:
+
+            for member in archive:
+
+                # symlinks and hardlinks can point outside of archive, only regular files are read
+                if not member.isfile() or member.issym() or member.islnk():
+                    continue
+
+                rel_file = normalize_path(member.name)
+
+                if rel_file is None:
+                    logger.warning(f"Skipped {member.name} of {self.root}, path is outside of archive root")
+                    continue
+
+                entries[rel_file] = (member.size, float(member.mtime))
+
+                if self.wanted(rel_file, member.size):
+                    self.store(archive, member, rel_file)
+
+        return entries
+
+    def read(self, rel_file: str) -> bytes:
+
+        # files of closed source are removed, listing again would extract whole archive to new temp folder
+        if self.closed:
+            raise Exception(f"Can not read {rel_file}, {self.root} is closed")
+
+        self.files()
+
+        if rel_file not in self.stored:
+            raise FileNotFoundError(f"{rel_file} is not loaded from {self.root}")
+
+        with open(os.path.join(self.folder, rel_file), 'rb') as stored_file:
+            return stored_file.read()
+
+    def close(self):
+
+        # archive file is read again on next listing, piped archive can be scanned once
+        if self.folder is not None:
+            shutil.rmtree(self.folder, ignore_errors=True)
+            self.folder = None
+            self.entries = None
+            self.stored = set()
+            self.closed = True
+
+
+class ZipSource(Source):
+
+    # zip has central directory, members are read on demand, closed archive is opened again on next read
+    def __init__(self, root: str, archive):
+
+        super().__init__(root)
+
+        self.archive = archive
+        self.zip_file: zipfile.ZipFile = None
+        self.names: Dict[str, str] = {}
+        self.lock = threading.Lock()
+
+    def open_zip(self) -> zipfile.ZipFile:
+
+        if self.zip_file is None:
+            self.zip_file = zipfile.ZipFile(self.archive)
+
+        return self.zip_file
+
+    def load_entries(self) -> Dict[str, Tuple[int, float]]:
+
+        entries = {}
+
+        with self.lock:
+            infos = self.open_zip().infolist()
+
+        for info in infos:
+
+            # unix mode of symlinks is kept in high bits of external attributes
+            if info.is_dir() or stat.S_ISLNK(info.external_attr >> 16):
+                continue
+
+            try:
+                mtime = time.mktime(info.date_time + (0, 0, -1))
+            except (OverflowError, ValueError):
+                mtime = 0.0
+
+            rel_file = normalize_path(info.filename)
+
+            if rel_file is None:
+                logger.warning(f"Skipped {info.filename} of {self.root}, path is outside of archive root")
+                continue
+
+            self.names[rel_file] = info.filename
+            entries[rel_file] = (info.file_size, mtime)
+
+        return entries
+
+    def read(self, rel_file: str) -> bytes:
+
+        self.files()
+
+        with self.lock:
+            return self.open_zip().read(self.names[rel_file])
+
+    def close(self):
+
+        with self.lock:
+
+            if self.zip_file is not None:
+                self.zip_file.close()
+                self.zip_file = None
+
+
+class GitSource(Source):
+
+    # files of tree at ref, also of bare repos, one cat-file process serves reads until source is closed
+    def __init__(self, repo: str, ref: str):
+
+        super().__init__(repo)
+
+        self.git_ref = ref
+        self.objects: Dict[str, str] = {}
+
+        self.process: subprocess.Popen = None
+        self.lock = threading.Lock()
+
+        # ref is resolved once, so moved branch does not change files in the middle of scan
+        self.git_ref = self.git("rev-parse", "--verify", "--end-of-options", f"{ref}^{{commit}}").decode().strip()
+
+    def git(self, *args) -> bytes:
+
+        result = subprocess.run(["git", "-C", self.root] + list(args), capture_output=True)
+
+        if result.returncode != 0:
+            raise Exception(f"Failed git {args[0]} for {self.root} at {self.git_ref}: {result.stderr.decode(errors='replace').strip()}")
+
+        return result.stdout
+
+    def load_entries(self) -> Dict[str, Tuple[int, float]]:
+
+        entries = {}
+
+        # files have no own modification time in git, commit time is used for all
+        commit_time = float(self.git("log", "-1", "--format=%ct", self.git_ref, "--").strip() or 0)
+
+        # paths are relative to root, subfolder of repo lists only its own files
+        for line in self.git("ls-tree", "-r", "-l", "-z", self.git_ref).split(b'\0'):
+
+            if not line:
+                continue
+
+            info, path = line.split(b'\t', 1)
+            mode, object_type, object_id, size = info.decode().split()
+
+            if object_type != 'blob' or mode == GIT_SYMLINK_MODE:
+                continue
+
+            rel_file = os.fsdecode(path)
+            self.objects[rel_file] = object_id
+            entries[rel_file] = (int(size), commit_time)
+
+        return entries
+
+    def read(self, rel_file: str) -> bytes:
+
+        self.files()
+
+        with self.lock:
+
+            if self.process is None:
+                self.process = subprocess.Popen(["git", "-C", self.root, "cat-file", "--batch"], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+            self.process.stdin.write(f"{self.objects[rel_file]}\n".encode())
+            self.process.stdin.flush()
+
+            # <object> <type> <size>, then content and newline
+            header = self.process.stdout.readline().split()
+
+            if len(header) != 3:
+                raise FileNotFoundError(f"{rel_file} is not found in {self.root} at {self.git_ref}")
+
+            content = self.process.stdout.read(int(header[2]))
+            self.process.stdout.read(1)
+
+            return content
+
+    def close(self):
+
+        with self.lock:
+
+            if self.process is not None:
+                self.process.stdin.close()
+                self.process.wait()
+                self.process.stdout.close()
+                self.process = None
+
+
+def open_source(source: str, git_ref: str = None, ignore: ScanIgnore = None) -> Source:
+
+    # None for plain folder, it is walked and read from disk as before
+    if git_ref:
+        return GitSource(source, git_ref)
+
+    if source == STDIN_SOURCE:
+
+        stream = sys.stdin.buffer
+
+        # zip needs central directory at the end, so piped zip is kept in memory
+        if stream.peek(len(ZIP_MAGIC))[:len(ZIP_MAGIC)] == ZIP_MAGIC:
+            return ZipSource(STDIN_ROOT, io.BytesIO(stream.read()))
+
+        return TarSource(STDIN_ROOT, fileobj=stream, ignore=ignore)
+
+    if os.path.isfile(source):
+
+        if zipfile.is_zipfile(source):
+            return ZipSource(source, source)
+
+        if tarfile.is_tarfile(source):
+            return TarSource(source, archive=source, ignore=ignore)
+
+        raise Exception(f"Source {source} is not folder, tar or zip archive")
+
+    return None
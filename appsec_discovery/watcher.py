@@ -0,0 +1,215 @@
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+from typing import Callable, Dict, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Changed files of source folder for watch mode: inotify on linux through libc, polling of
+# modification times elsewhere or when inotify watches run out. changes() returns absolute paths
+# of created, written, moved and deleted files (removed folders end with separator),
+# events of one save are collected together.
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+EVENT_HEADER = struct.Struct('iIII')
+
+# seconds to wait for more events after first one, editors write, rename and chmod on save
+DEBOUNCE = 0.05
+
+
+def walk_files(folder: str, watched_dir: Callable[[str], bool], base_folder: str = None):
+
+    # watched_dir gets folder path relative to base folder
+    for root, dirs, files in os.walk(folder):
+
+        rel_root = os.path.relpath(root, base_folder or folder)
+        rel_root = '' if rel_root == '.' else rel_root.replace(os.sep, '/') + '/'
+
+        dirs[:] = [name for name in dirs if watched_dir(f"{rel_root}{name}")]
+
+        yield root, dirs, files
+
+
+class InotifyWatcher:
+
+    def __init__(self, folder: str, watched_dir: Callable[[str], bool]):
+
+        self.folder = folder
+        self.watched_dir = watched_dir
+
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.dirs: Dict[int, str] = {}
+
+        try:
+            self.add_tree(folder)
+        except OSError:
+            self.close()
+            raise
+
+    def add_watch(self, path: str):
+
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+
+        if wd < 0:
+            error = ctypes.get_errno()
+
+            # folder removed before watch was added
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                return
+
+            raise OSError(error, f"inotify_add_watch failed for {path}, check fs.inotify.max_user_watches")
+
+        self.dirs[wd] = path
+
+    def add_tree(self, path: str) -> Set[str]:
+
+        # watches for folder and subfolders, files already inside are returned as changed
+        files = set()
+        rel_path = os.path.relpath(path, self.folder)
+
+        if rel_path != '.' and not self.watched_dir(rel_path.replace(os.sep, '/')):
+            return files
+
+        for root, dirs, names in walk_files(path, self.watched_dir, self.folder):
+            self.add_watch(root)
+            files.update(os.path.join(root, name) for name in names)
+
+        return files
+
+    def read_events(self, changed: Set[str]) -> bool:
+
+        # false on queue overflow, then caller rescans whole folder
+        try:
+            buffer = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return True
+
+        offset = 0
+
+        while offset < len(buffer):
+
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(buffer, offset)
+            name = buffer[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+            offset += EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                return False
+
+            folder = self.dirs.get(wd)
+
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+
+            if folder is None or not name:
+                continue
+
+            path = os.path.join(folder, os.fsdecode(name))
+
+            if mask & IN_ISDIR:
+                # new or moved in folder brings its files, removed folder is reported with trailing separator
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    changed.update(self.add_tree(path))
+                else:
+                    changed.add(path + os.sep)
+                continue
+
+            changed.add(path)
+
+        return True
+
+    def changes(self, timeout: float) -> Tuple[Set[str], bool]:
+
+        # changed paths and full rescan flag
+        changed: Set[str] = set()
+
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return changed, False
+
+        ok = self.read_events(changed)
+
+        # collect rest of events of same save
+        while ok and select.select([self.fd], [], [], DEBOUNCE)[0]:
+            ok = self.read_events(changed)
+
+        return changed, not ok
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+
+    def __init__(self, folder: str, watched_dir: Callable[[str], bool], interval: float = 0.5):
+
+        self.folder = folder
+        self.watched_dir = watched_dir
+        self.interval = interval
+
+        self.snapshot = self.take_snapshot()
+
+    def take_snapshot(self) -> Dict[str, Tuple[int, int]]:
+
+        snapshot = {}
+
+        for root, dirs, files in walk_files(self.folder, self.watched_dir):
+            for name in files:
+
+                path = os.path.join(root, name)
+
+                try:
+                    stat = os.stat(path)
+                    snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+                except OSError:
+                    pass
+
+        return snapshot
+
+    def changes(self, timeout: float) -> Tuple[Set[str], bool]:
+
+        time.sleep(min(timeout, self.interval))
+
+        snapshot = self.take_snapshot()
+        changed = set(path for path in snapshot.keys() | self.snapshot.keys() if snapshot.get(path) != self.snapshot.get(path))
+
+        self.snapshot = snapshot
+
+        return changed, False
+
+    def close(self):
+        pass
+
+
+def create_watcher(folder: str, watched_dir: Callable[[str], bool], poll: bool = False):
+
+    if not poll:
+        try:
+            return InotifyWatcher(folder, watched_dir)
+        except (OSError, AttributeError) as ex:
+            logger.warning(f"Inotify is not available, falling back to polling: {ex}")
+
+    return PollingWatcher(folder, watched_dir)
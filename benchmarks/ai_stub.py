@@ -0,0 +1,45 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# OpenAI compatible chat completions stub for AI scoring benchmarks: always answers yes,
+# pii and echoes question, so every offered field is scored without a real model.
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        question = next((message['content'] for message in reversed(request.get('messages', [])) if message.get('role') == 'user'), '')
+
+        body = json.dumps({
+            'id': 'chatcmpl-stub',
+            'object': 'chat.completion',
+            'created': 0,
+            'model': request.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': f"yes, pii. {question}"},
+                'finish_reason': 'stop',
+            }],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+        }).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub() -> ThreadingHTTPServer:
+
+    # random free port, base url for AiApi config is f"http://127.0.0.1:{server.server_port}/v1"
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
@@ -0,0 +1,32 @@
+import json
+import click
+
+# Side by side view of two benchmark result files, ratio above 1 means new run is slower or bigger.
+
+
+def ratio(old, new):
+    return f"{new / old:.2f}x" if old and new is not None else '-'
+
+
+@click.command()
+@click.argument('old_results', type=click.File('r'))
+@click.argument('new_results', type=click.File('r'))
+def main(old_results, new_results):
+
+    old = json.load(old_results)
+    new = json.load(new_results)
+
+    old_cases = {result['case']: result for result in old['results']}
+
+    click.echo(f"{'case':<22}{'old wall':>10}{'new wall':>10}{'wall':>8}{'old rss':>10}{'new rss':>10}{'rss':>8}")
+
+    for result in new['results']:
+
+        old_result = old_cases.get(result['case'], {})
+
+        click.echo(f"{result['case']:<22}{old_result.get('wall_s', '-'):>10}{result['wall_s']:>10}{ratio(old_result.get('wall_s'), result['wall_s']):>8}"
+                   f"{old_result.get('peak_rss_mb', '-'):>10}{result['peak_rss_mb']:>10}{ratio(old_result.get('peak_rss_mb'), result['peak_rss_mb']):>8}")
+
+
+if __name__ == '__main__':
+    main()
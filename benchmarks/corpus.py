@@ -0,0 +1,98 @@
+import os
+import re
+from typing import Dict, List
+
+# Deterministic synthetic repo: every sample folder from tests is copied N times,
+# names that parsers deduplicate across files (graphql types, proto services) get copy suffix.
+
+samples_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests')
+
+languages = {
+    'proto': ['protobuf_samples', 'protobuf_multi_samples'],
+    'graphql': ['graphql_samples'],
+    'openapi': ['swagger_samples'],
+    'python': ['python_samples'],
+    'go': ['golang_samples'],
+    'java': ['java_samples'],
+    'ts': ['javascript_samples'],
+    'tf': ['terraform_samples'],
+}
+
+# parsers that handle files of each corpus language
+language_parsers = {
+    'proto': 'protobuf',
+    'graphql': 'graphql',
+    'openapi': 'swagger',
+    'python': 'python',
+    'go': 'golang',
+    'java': 'java',
+    'ts': 'javascript',
+    'tf': 'terraform',
+}
+
+graphql_keep = {
+    'type', 'input', 'extend', 'enum', 'interface', 'union', 'scalar', 'schema', 'implements',
+    'directive', 'on', 'fragment', 'query', 'mutation', 'subscription', 'true', 'false', 'null',
+    'Query', 'Mutation', 'Subscription', 'String', 'Int', 'Float', 'Boolean', 'ID', 'repeatable',
+}
+
+graphql_name_re = re.compile(r'\b[A-Za-z_]\w*\b')
+proto_service_re = re.compile(r'\bservice\s+(\w+)')
+
+
+def rename_graphql(source: str, suffix: str) -> str:
+    return graphql_name_re.sub(lambda match: match.group() if match.group() in graphql_keep else match.group() + suffix, source)
+
+
+def rename_proto(source: str, suffix: str) -> str:
+    return proto_service_re.sub(lambda match: f"service {match.group(1)}{suffix}", source)
+
+
+renames = {
+    'graphql': rename_graphql,
+    'proto': rename_proto,
+}
+
+
+def sample_files(sample_folder: str) -> List[str]:
+
+    files = []
+
+    for root, dirs, names in os.walk(sample_folder):
+        dirs.sort()
+        files += [os.path.join(root, name) for name in sorted(names)]
+
+    return files
+
+
+def generate_corpus(target_folder: str, copies: int, corpus_languages: List[str] = None) -> Dict[str, int]:
+
+    # target/<language>/c<n>/<sample folder>/..., first copy keeps original names
+    files_count = {}
+
+    for language in corpus_languages or list(languages):
+
+        files_count[language] = 0
+
+        for sample in languages[language]:
+
+            sample_folder = os.path.join(samples_root, sample)
+
+            for sample_file in sample_files(sample_folder):
+
+                with open(sample_file, encoding='utf-8', errors='replace') as file:
+                    source = file.read()
+
+                for copy in range(copies):
+
+                    copy_file = os.path.join(target_folder, language, f"c{copy}", sample, os.path.relpath(sample_file, sample_folder))
+                    os.makedirs(os.path.dirname(copy_file), exist_ok=True)
+
+                    copy_source = renames[language](source, f"C{copy}") if copy and language in renames else source
+
+                    with open(copy_file, 'w', encoding='utf-8') as file:
+                        file.write(copy_source)
+
+                    files_count[language] += 1
+
+    return files_count
@@ -0,0 +1,226 @@
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import subprocess
+import shutil
+import tempfile
+import logging
+import click
+
+from appsec_discovery.models import AiApi
+from appsec_discovery.services import ScanService, ReportService
+from appsec_discovery.profiler import Profiler
+
+from benchmarks.corpus import languages, language_parsers, generate_corpus
+from benchmarks.ai_stub import start_stub
+
+logger = logging.getLogger(__name__)
+
+# Every case runs in own python process, so peak rss belongs to that case only.
+# Objects for scoring, ai and report cases are parsed once and loaded from dump before timing.
+
+report_types = ['json', 'yaml', 'sarif', 'compact', 'sqlite']
+
+
+def rss_mb(who) -> float:
+    # ru_maxrss is kilobytes on linux
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+
+def load_scored(case):
+
+    scan_service = ScanService(source_folder=case['corpus'])
+    return scan_service.process_objects(scan_service.load_objects(case['objects_file']))
+
+
+def run_case(case):
+
+    # returns number of processed objects, preparation before timer start is excluded from time
+    name = case['name']
+
+    if name.startswith('parse:'):
+
+        scan_service = ScanService(source_folder=case['corpus'], engine=case['engine'])
+        scan_service.config.parsers = [name.split(':')[1]]
+
+        start_timer()
+        parsed_objects = scan_service.parse_folder()
+
+        if name == 'parse:all':
+            scan_service.dump_objects(parsed_objects, case['objects_file'])
+
+        return len(parsed_objects)
+
+    if name == 'rules':
+
+        # semgrep rule packs with timings, slow rules are kept in result to catch rule regressions
+        profiler = Profiler(rule_budget=case['rule_budget'])
+        scan_service = ScanService(source_folder=case['corpus'], engine='semgrep', profiler=profiler)
+
+        start_timer()
+        parsed_objects = scan_service.parse_folder()
+        timer['extra'] = {'rules': profiler.rules_report()}
+
+        return len(parsed_objects)
+
+    if name == 'score':
+
+        scan_service = ScanService(source_folder=case['corpus'])
+        parsed_objects = scan_service.load_objects(case['objects_file'])
+
+        start_timer()
+        return len(scan_service.process_objects(parsed_objects))
+
+    if name == 'ai':
+
+        scan_service = ScanService(source_folder=case['corpus'])
+        parsed_objects = scan_service.load_objects(case['objects_file'])[:case['ai_objects']]
+
+        stub = start_stub()
+        scan_service.config.ai_api = AiApi(base_url=f"http://127.0.0.1:{stub.server_port}/v1", api_key='stub', model='stub', system_prompt='stub')
+
+        start_timer()
+        scored_objects = scan_service.process_objects(parsed_objects)
+        stub.shutdown()
+
+        return len(scored_objects)
+
+    if name.startswith('report:'):
+
+        report_type = name.split(':')[1]
+        scored_objects = load_scored(case)
+        report_file = os.path.join(case['work_folder'], f"report.{report_type}")
+
+        if os.path.exists(report_file):
+            os.remove(report_file)
+
+        start_timer()
+        ReportService(code_objects=scored_objects, report_type=report_type, report_file=open(report_file, 'w') if report_type != 'sqlite' else report_file).save_report_to_disk()
+
+        return len(scored_objects)
+
+    raise Exception(f"Unknown benchmark case {name}")
+
+
+timer = {}
+
+
+def start_timer():
+    timer['rss_before_mb'] = rss_mb(resource.RUSAGE_SELF)
+    timer['wall'] = time.perf_counter()
+    timer['cpu'] = sum(os.times()[:4])
+
+
+def case_process(case):
+
+    objects = run_case(case)
+
+    wall = time.perf_counter() - timer['wall']
+    cpu = sum(os.times()[:4]) - timer['cpu']
+
+    return {
+        'case': case['name'],
+        'objects': objects,
+        'wall_s': round(wall, 3),
+        'cpu_s': round(cpu, 3),
+        'peak_rss_mb': rss_mb(resource.RUSAGE_SELF),
+        'rss_before_mb': timer['rss_before_mb'],
+        'children_peak_rss_mb': rss_mb(resource.RUSAGE_CHILDREN),
+        'objects_per_s': round(objects / wall, 1) if wall else None,
+        **timer.get('extra', {}),
+    }
+
+
+def git_commit():
+
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)), text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+@click.command()
+@click.option('--scale', default=10, show_default=True, help='Copies of every tests sample folder in generated corpus')
+@click.option('--languages', 'corpus_languages', default=','.join(languages), show_default=True, help='Corpus languages, comma separated')
+@click.option('--corpus', default=None, type=click.Path(file_okay=False), help='Keep generated corpus and dumps in this folder instead of temp folder')
+@click.option('--engine', default='native', show_default=True, type=click.Choice(['semgrep', 'native']), help='Engine for parsers with native support')
+@click.option('--reports', default=','.join(report_types), show_default=True, help='Report writers to time, comma separated')
+@click.option('--ai-objects', default=50, show_default=True, help='Objects scored against AI stub, 0 skips AI case')
+@click.option('--rule-budget', default=None, type=float, help='Profile semgrep rule packs and list rules slower than this many seconds')
+@click.option('--output', default='benchmark.json', show_default=True, type=click.Path(dir_okay=False), help='Results json file')
+@click.option('--case', 'case_json', default=None, hidden=True)
+def main(scale, corpus_languages, corpus, engine, reports, ai_objects, rule_budget, output, case_json):
+
+    if case_json:
+        print(json.dumps(case_process(json.loads(case_json))))
+        return
+
+    logging.basicConfig(format="[%(levelname)-8s] %(message)s", level=logging.INFO)
+
+    work_folder = corpus or tempfile.mkdtemp(prefix='appsec-discovery-bench-')
+
+    # generated corpus is removed after run unless kept with --corpus
+    try:
+        corpus_folder = os.path.join(work_folder, 'corpus')
+        selected = [language for language in corpus_languages.split(',') if language]
+
+        files_count = generate_corpus(corpus_folder, scale, selected)
+        logger.info(f"Generated corpus with {sum(files_count.values())} files in {corpus_folder}")
+
+        names = [f"parse:{language_parsers[language]}" for language in selected] + ['parse:all', 'score']
+        names += ['ai'] if ai_objects else []
+        names += ['rules'] if rule_budget is not None else []
+        names += [f"report:{report_type}" for report_type in reports.split(',') if report_type]
+
+        results = []
+
+        for name in names:
+
+            case = {
+                'name': name,
+                'corpus': corpus_folder,
+                'work_folder': work_folder,
+                'objects_file': os.path.join(work_folder, 'objects.jsonl.gz'),
+                'engine': engine,
+                'ai_objects': ai_objects,
+                'rule_budget': rule_budget,
+            }
+
+            process = subprocess.run([sys.executable, '-m', 'benchmarks.run', '--case', json.dumps(case)], capture_output=True, text=True,
+                                     cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+            if process.returncode:
+                logger.error(f"Benchmark case {name} failed: {process.stderr[-2000:]}")
+                continue
+
+            result = json.loads(process.stdout.strip().splitlines()[-1])
+            results.append(result)
+
+            logger.info(f"{name}: {result['objects']} objects in {result['wall_s']}s wall, {result['cpu_s']}s cpu, peak rss {result['peak_rss_mb']}MB")
+
+            for rule in result.get('rules', {}).get('over_budget', []):
+                logger.warning(f"Rule {rule['rule']} took {rule['total_s']}s, over budget of {rule_budget}s")
+
+        with open(output, 'w') as results_file:
+            json.dump({
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'scale': scale,
+                'engine': engine,
+                'corpus_files': files_count,
+                'results': results,
+            }, results_file, indent=4)
+
+        logger.info(f"Saved benchmark results to {output}")
+
+    finally:
+        if not corpus:
+            shutil.rmtree(work_folder, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
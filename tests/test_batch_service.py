@@ -0,0 +1,39 @@
+import os
+import json
+from pathlib import Path
+
+from appsec_discovery.services import BatchService, ScanService, load_manifest
+
+
+def test_batch_service_manifest(tmp_path):
+
+    test_folder = str(Path(__file__).resolve().parent)
+    manifest_file = os.path.join(str(tmp_path), "manifest.yaml")
+
+    with open(manifest_file, 'w') as manifest:
+        manifest.write(f"output_folder: reports\n"
+                       f"repos:\n"
+                       f"  - {test_folder}/golang_samples\n"
+                       f"  - source: {test_folder}/golang_samples\n"
+                       f"    output: golang.yaml\n"
+                       f"    output_type: yaml\n"
+                       f"  - {test_folder}/missing_samples\n")
+
+    batch_service = BatchService(load_manifest(manifest_file), workers=1, engine='native')
+    summary = batch_service.run()
+
+    scanned_objects = ScanService(source_folder=os.path.join(test_folder, "golang_samples"), engine='native').scan_folder()
+
+    assert summary['repos'] == 3
+    assert summary['done'] == 2
+    assert summary['failed'] == 1
+    assert summary['objects'] == 2 * len(scanned_objects)
+    assert summary['results'][2]['error'] == 'source folder not found'
+
+    # second scan of same files takes native extract results from content cache
+    assert summary['content_cache']['hits'] >= 1
+
+    with open(os.path.join(str(tmp_path), "reports", "golang_samples.json")) as report:
+        assert len(json.load(report)) == len(scanned_objects)
+
+    assert os.path.getsize(os.path.join(str(tmp_path), "golang.yaml"))
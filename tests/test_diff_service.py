@@ -0,0 +1,99 @@
+from appsec_discovery.services import DiffService, ReportService
+from appsec_discovery.models import ScoreConfig
+
+import os
+import json
+import subprocess
+
+
+def git(folder, *args):
+    subprocess.run(["git", "-C", folder, "-c", "user.name=test", "-c", "user.email=test@test"] + list(args), check=True, capture_output=True)
+
+def write_file(folder, name, content):
+
+    path = os.path.join(folder, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, 'w') as file:
+        file.write(content)
+
+def test_diff_service_base_ref(tmp_path):
+
+    repo_folder = str(tmp_path)
+    source_folder = os.path.join(repo_folder, "svc")
+
+    git(repo_folder, "init", "-q", "-b", "main")
+
+    write_file(source_folder, "dto/models.py", "from pydantic import BaseModel\n\nclass User(BaseModel):\n    name: str\n\nclass Old(BaseModel):\n    token: str\n")
+    write_file(source_folder, "dto/same.py", "from pydantic import BaseModel\n\nclass Same(BaseModel):\n    city: str\n")
+
+    git(repo_folder, "add", "-A")
+    git(repo_folder, "commit", "-q", "-m", "base")
+    git(repo_folder, "checkout", "-q", "-b", "feature")
+
+    write_file(source_folder, "dto/models.py", "from pydantic import BaseModel\n\nclass User(BaseModel):\n    name: str\n    password: str\n\nclass Card(BaseModel):\n    card_number: str\n")
+
+    git(repo_folder, "commit", "-q", "-a", "-m", "feature")
+
+    config = ScoreConfig(engine='native', parsers=['python'])
+
+    diff_service = DiffService(source_folder=source_folder, base_ref="main", config=config)
+    diff_reports = diff_service.scan_diff()
+
+    changes = {report.object_name: report for report in diff_reports}
+
+    assert sorted(changes) == ['Pydantic dto Card', 'Pydantic dto Old', 'Pydantic dto User']
+
+    assert changes['Pydantic dto User'].change == 'changed'
+    assert changes['Pydantic dto User'].changed_fields == ['password']
+    assert changes['Pydantic dto User'].severity == 'high'
+    assert changes['Pydantic dto Card'].change == 'new'
+    assert changes['Pydantic dto Old'].change == 'removed'
+
+    report_service = ReportService(code_objects=[], report_type='sarif', report_file=None, diff_reports=diff_reports)
+    sarif_report = json.loads(report_service.get_sarif_report())
+
+    assert sorted(result['baselineState'] for result in sarif_report['runs'][0]['results']) == ['absent', 'new', 'updated']
+
+def test_diff_service_report_files(tmp_path):
+
+    test_folder = os.path.dirname(os.path.abspath(__file__))
+
+    with open(os.path.join(test_folder, "report_samples/report.json")) as report_file:
+        old_objects = json.load(report_file)
+
+    new_objects = json.loads(json.dumps(old_objects))
+
+    # first object gets new scored field, second one is removed, third one is new
+    field_name = 'password'
+    new_objects[0]['fields'][field_name] = {'field_name': field_name, 'field_type': 'string', 'severity': 'high', 'tags': ['auth']}
+
+    removed_object = new_objects.pop(1)
+
+    added_object = json.loads(json.dumps(removed_object))
+    added_object['hash'] = 'new-object-hash'
+    added_object['object_name'] = 'new object'
+    new_objects.append(added_object)
+
+    # bigger new report is streamed against indexed old one and vice versa
+    for padding in [0, 100000]:
+
+        old_report = os.path.join(str(tmp_path), "old.json")
+        new_report = os.path.join(str(tmp_path), "new.json")
+
+        with open(old_report, 'w') as report_file:
+            report_file.write(json.dumps(old_objects, indent=4) + " " * padding)
+
+        with open(new_report, 'w') as report_file:
+            report_file.write(json.dumps(new_objects, indent=4))
+
+        diff_reports = list(DiffService.diff_report_files(old_report, new_report))
+
+        assert [(report.change, report.hash) for report in diff_reports] == [
+            ('changed', new_objects[0]['hash']),
+            ('new', 'new-object-hash'),
+            ('removed', removed_object['hash']),
+        ]
+
+        assert diff_reports[0].changed_fields == [field_name]
+        assert diff_reports[0].code_object.fields[field_name].severity == 'high'
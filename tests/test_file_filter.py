@@ -0,0 +1,51 @@
+import os
+
+from appsec_discovery.parsers.file_filter import FileFilter
+from appsec_discovery.models import ScanIgnore
+
+def write_file(folder, name, content):
+
+    path = os.path.join(folder, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, 'w') as file:
+        file.write(content)
+
+def test_file_filter_default_skips(tmp_path):
+
+    source_folder = str(tmp_path)
+
+    write_file(source_folder, "src/user.py", "class User: pass\n")
+    write_file(source_folder, "src/user_pb2.py", "class User: pass\n")
+    write_file(source_folder, "src/gen.go", "// Code generated by protoc-gen-go. DO NOT EDIT.\npackage gen\n")
+    write_file(source_folder, "src/app.min.js", "var a=1;\n")
+    write_file(source_folder, "src/big.js", "var a=1;" + " " * 3000000)
+    write_file(source_folder, "api/big.yaml", "openapi: 3.0.0" + " " * 3000000)
+    write_file(source_folder, "node_modules/lib/index.js", "module.exports = {}\n")
+    write_file(source_folder, "vendor/github.com/lib/lib.go", "package lib\n")
+    write_file(source_folder, "build/user.py", "class User: pass\n")
+    write_file(source_folder, "src/handler.py", "# DO NOT EDIT without review\nclass Handler: pass\n")
+
+    file_filter = FileFilter(source_folder)
+
+    # build folders, bare DO NOT EDIT and big spec files are scanned by default
+    assert file_filter.files() == [os.path.join(source_folder, "api/big.yaml"), os.path.join(source_folder, "build/user.py"), os.path.join(source_folder, "src/handler.py"), os.path.join(source_folder, "src/user.py")]
+    assert file_filter.is_accepted("/src/user.py")
+    assert not file_filter.is_accepted("/src/gen.go")
+
+    assert file_filter.skipped_dirs == 2
+    assert file_filter.skipped['generated'][0] == 1
+    assert file_filter.skipped['pattern'][0] == 2
+    assert file_filter.skipped['size'][0] == 1
+
+    # custom lists replace defaults
+    file_filter = FileFilter(source_folder, ScanIgnore(dirs=['node_modules'], files=[], generated_markers=[], max_file_size=0))
+
+    assert len(file_filter.find_files(['.go'])) == 2
+    assert len(file_filter.find_files(['.js', '.json'])) == 2
+
+    # broader lists are opt-in
+    file_filter = FileFilter(source_folder, ScanIgnore(build_dirs=True, generated_markers=['DO NOT EDIT'], max_spec_size=1000000))
+
+    assert file_filter.files() == [os.path.join(source_folder, "src/user.py")]
+    assert file_filter.skipped_dirs == 3
@@ -0,0 +1,28 @@
+import io
+import json
+
+from appsec_discovery.json_stream import JsonStreamReader, iter_json_array, read_json_key
+
+def test_json_stream_results_items():
+
+    results = [
+        {"check_id": "rule-a", "path": "/src/a.py", "start": {"line": 1}, "extra": {"metavars": {"$X": {"abstract_content": "a]}, \"b"}}}},
+        {"check_id": "rule-b", "path": "/src/b.py", "start": {"line": 12345}, "extra": {"score": -2.5e10, "flags": [True, False, None]}},
+    ]
+
+    report = json.dumps({"errors": [{"message": "results"}], "results": results, "version": "1.62.0"})
+
+    # tiny chunks split numbers, strings and literals between reads
+    for chunk_size in [1, 2, 3, 7, 1024]:
+
+        reader = JsonStreamReader(io.StringIO(report), chunk_size=chunk_size)
+
+        assert reader.find_key('results')
+        assert list(reader.items()) == results
+
+    assert list(iter_json_array(io.StringIO(report), 'results')) == results
+    assert list(iter_json_array(io.StringIO(report), 'paths')) == []
+    assert list(iter_json_array(io.StringIO(json.dumps(results)))) == results
+    assert list(iter_json_array(io.StringIO('{"results": [ ]}'), 'results')) == []
+    assert read_json_key(io.StringIO(report), 'version') == '1.62.0'
+    assert read_json_key(io.StringIO(report), 'time') is None
@@ -1,5 +1,7 @@
 from appsec_discovery.parsers import ParserFactory
 from appsec_discovery.parsers.golang.parser import GolangParser
+from appsec_discovery.parsers.golang.go_extractor import FileExtractor
+from appsec_discovery.models import ScoreConfig
 import os
 from pathlib import Path
 
@@ -32,3 +34,34 @@ def test_parser_golang_parse_folder():
     assert results[-1].parser == 'golang'
     assert results[-1].object_name == 'Struct dto FullAccessRecoveryComment'
     assert results[-1].fields['ID'].field_name == 'ID'
+
+
+def test_parser_golang_native_engine_parity():
+
+    test_folder = str(Path(__file__).resolve().parent)
+    samples_folder = os.path.join(test_folder, "golang_samples")
+
+    semgrep_results = GolangParser(parser='golang', source_folder=samples_folder, config=ScoreConfig(engine='semgrep')).run_scan()
+    native_results = GolangParser(parser='golang', source_folder=samples_folder, config=ScoreConfig(engine='native')).run_scan()
+
+    assert [obj.dict() for obj in native_results] == [obj.dict() for obj in semgrep_results]
+
+
+def test_parser_golang_native_extract_struct_fields():
+
+    source = """
+type (
+    Card struct {
+        Pan, Holder *string `json:"pan"` // Comment int
+        Tokens      []string
+        Meta        map[string]int
+        Embedded
+    }
+)
+"""
+
+    findings = FileExtractor(source, '/card.go').extract()
+
+    fields = [(finding['extra']['metavars']['$FIELD']['abstract_content'], finding['extra']['metavars']['$TYPE']['abstract_content']) for finding in findings]
+
+    assert fields == [('Pan', 'string'), ('Holder', 'string'), ('Tokens', 'string')]
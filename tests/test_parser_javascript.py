@@ -31,6 +31,29 @@ def test_parser_javascript_parse_folder():
     assert "JS GQL Resolver" in results[0].object_name
 
 
+def test_parser_javascript_extract_operation():
+
+    pr = JsGqlParser(parser='javascript', source_folder='some')
+
+    request = """mutation CreateUser($input: CreateUserInput!) {
+        createUser(input: $input) {
+            id
+            email
+        }
+        audit { id }
+    }"""
+
+    gql_type, req_name, resolvers = pr.extract_operation(request)
+
+    assert gql_type == 'mutation'
+    assert req_name == 'CreateUser'
+
+    assert [name for name, _ in resolvers] == ['createUser', 'audit']
+    assert resolvers[1][1] == 'audit { id }'
+
+    assert pr.extract_operation('fragment UserParts on User { id }') is None
+
+
 def test_parser_javascript_local_debug():
 
     if os.getenv("ENV") != "local":
@@ -29,3 +29,27 @@ def test_parser_protobuf_parse_folder():
     assert 'Rpc' in results[5].object_name
 
     assert len(results[6].fields) > 0 
+
+
+def test_parser_protobuf_resolve_imported_types():
+
+    pf = ParserFactory()
+
+    parserCls = pf.get_parser('protobuf')
+
+    test_folder = str(Path(__file__).resolve().parent)
+    samples_folder = os.path.join(test_folder, "protobuf_multi_samples")
+
+    pr: ProtobufParser = parserCls(parser='protobuf', source_folder=samples_folder)
+
+    results = pr.run_scan()
+
+    assert len(results) == 1
+
+    assert results[0].object_name == 'Rpc /payments.v1.PaymentService/Pay'
+    assert results[0].file == '/payments/v1/payments.proto'
+
+    assert results[0].fields['input.PayRequest.payer.User.email'].file == '/common/v1/user.proto'
+    assert results[0].fields['input.PayRequest.payer.User.address.Address.city'].field_type == 'string'
+    assert results[0].fields['input.PayRequest.amount.Money.units'].field_type == 'int64'
+    assert results[0].fields['output.PayResponse.billing.Address.street'].field_name == 'Address.street'
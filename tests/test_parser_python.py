@@ -1,5 +1,7 @@
 from appsec_discovery.parsers import ParserFactory
 from appsec_discovery.parsers.python.parser import PythonParser
+from appsec_discovery.parsers.python.ast_extractor import FileExtractor
+from appsec_discovery.models import ScoreConfig, ExcludeScan
 import os
 from pathlib import Path
 
@@ -31,3 +33,60 @@ def test_parser_python_parse_folder():
 
     assert results[-1].parser == 'python'
     assert results[-1].object_name == 'Starlette route / calls Hello handler'
+
+
+def test_parser_python_native_engine_parity():
+
+    test_folder = str(Path(__file__).resolve().parent)
+    samples_folder = os.path.join(test_folder, "python_samples")
+
+    semgrep_results = PythonParser(parser='python', source_folder=samples_folder, config=ScoreConfig(engine='semgrep')).run_scan()
+    native_results = PythonParser(parser='python', source_folder=samples_folder, config=ScoreConfig(engine='native')).run_scan()
+
+    assert len(semgrep_results) == 14
+    assert len(native_results) == 14
+
+    for semgrep_obj, native_obj in zip(semgrep_results, native_results):
+
+        assert semgrep_obj.hash == native_obj.hash
+        assert semgrep_obj.object_name == native_obj.object_name
+        assert semgrep_obj.line == native_obj.line
+        assert semgrep_obj.properties == native_obj.properties
+        assert list(semgrep_obj.fields) == list(native_obj.fields)
+
+        for field_name, semgrep_field in semgrep_obj.fields.items():
+
+            native_type = native_obj.fields[field_name].field_type
+
+            # semgrep reports sqlalchemy column types twice: 'Integer Integer' vs 'Integer'
+            if semgrep_obj.object_name == 'Sqlalchemy dto users':
+                assert semgrep_field.field_type == f"{native_type} {native_type}"
+            else:
+                assert semgrep_field.field_type == native_type
+
+
+def test_parser_python_native_offsets_non_ascii():
+
+    source = "class Пользователь(BaseModel): name: str = 'имя'; email: str\n"
+    extractor = FileExtractor(source, 'models.py')
+
+    # ast gives utf-8 byte columns, cyrillic chars take two bytes each
+    assert extractor.offset(1, len(source.split('email')[0].encode('utf-8'))) == source.index('email')
+
+
+def test_parser_python_object_types_and_file_excludes():
+
+    test_folder = str(Path(__file__).resolve().parent)
+    samples_folder = os.path.join(test_folder, "python_samples")
+    rules_folder = os.path.join(test_folder, "..", "appsec_discovery", "parsers", "python", "scanner_rules")
+
+    pr = PythonParser(parser='python', source_folder=samples_folder, config=ScoreConfig(engine='native', object_types=['route']))
+
+    assert [os.path.basename(rule_file) for rule_file in pr.rule_files(rules_folder)] == ['route.yaml']
+    assert {obj.object_type for obj in pr.run_scan()} == {'route'}
+
+    config = ScoreConfig(engine='native', exclude_scan=[ExcludeScan(file='/route/'), ExcludeScan(parser='python', file='pydantic')])
+    results = PythonParser(parser='python', source_folder=samples_folder, config=config).run_scan()
+
+    assert results
+    assert all(obj.file.startswith('/dto/') and 'pydantic' not in obj.file for obj in results)
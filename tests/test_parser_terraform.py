@@ -1,5 +1,6 @@
 from appsec_discovery.parsers import ParserFactory
 from appsec_discovery.parsers.terraform.parser import TerraformParser
+from appsec_discovery.models import ScoreConfig
 import os
 from pathlib import Path
 
@@ -32,4 +33,30 @@ def test_parser_terraform_parse_folder():
 
     assert results[0].properties['vm_template'].prop_value == 'ubuntu-2204'
 
-    assert results[-1].properties['vm_domain'].prop_value == 'v.pci-prod.example.local'
\ No newline at end of file
+    assert results[-1].properties['vm_domain'].prop_value == 'v.pci-prod.example.local'
+
+def test_parser_terraform_native_engine_parity():
+
+    test_folder = str(Path(__file__).resolve().parent)
+    samples_folder = os.path.join(test_folder, "terraform_samples")
+
+    semgrep_results = TerraformParser(parser='terraform', source_folder=samples_folder, config=ScoreConfig(engine='semgrep')).run_scan()
+    native_results = TerraformParser(parser='terraform', source_folder=samples_folder, config=ScoreConfig(engine='native')).run_scan()
+
+    assert [obj.dict() for obj in native_results] == [obj.dict() for obj in semgrep_results]
+
+
+def test_parser_terraform_native_custom_props():
+
+    test_folder = str(Path(__file__).resolve().parent)
+    samples_folder = os.path.join(test_folder, "terraform_samples")
+
+    config = ScoreConfig(engine='native', terraform_props={'vm_name': 'vm_name', 'vm_node': 'node', 'pdns_server_url': 'dns_api'})
+
+    results = TerraformParser(parser='terraform', source_folder=samples_folder, config=config).run_scan()
+
+    assert len(results) == 3
+
+    assert results[0].object_name == 'Virtual machine keycloak01-dc1'
+    assert list(results[0].properties) == ['vm_name', 'node', 'dns_api']
+    assert results[0].properties['node'].prop_value == 'pve01-dc1'
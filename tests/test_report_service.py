@@ -1,6 +1,7 @@
 from appsec_discovery.services import ScanService, ReportService
 
 import yaml
+import json
 import os
 from pathlib import Path
 
@@ -56,4 +57,85 @@ def test_report_service_save_sarif():
 
         report_service.save_report_to_disk()
 
-    assert "json.schemastore.org" in report_str 
\ No newline at end of file
+    assert "json.schemastore.org" in report_str 
+
+def test_report_service_save_and_read_compact(tmp_path):
+
+    test_folder = str(Path(__file__).resolve().parent)
+    config_file = os.path.join(test_folder, "config_samples/conf.yaml")
+    samples_folder = os.path.join(test_folder, "swagger_samples")
+    report_file = os.path.join(str(tmp_path), "report.gz")
+
+    with open(config_file, 'r') as conf_file:
+        scan_service = ScanService(source_folder=samples_folder, conf_file=conf_file)
+
+    scanned_objects = scan_service.scan_folder()
+
+    with open(report_file, 'w') as report:
+
+        report_service = ReportService(
+            code_objects=scanned_objects,
+            report_type='compact',
+            report_file=report
+        )
+
+        report_service.save_report_to_disk()
+
+    read_objects = ReportService.read_compact_report(report_file)
+
+    assert [obj.dict() for obj in read_objects] == [obj.dict() for obj in scanned_objects]
+    assert list(read_objects[16].fields) == list(scanned_objects[16].fields)
+
+
+def test_report_service_sarif_without_snippets():
+
+    test_folder = str(Path(__file__).resolve().parent)
+    samples_folder = os.path.join(test_folder, "terraform_samples")
+
+    scanned_objects = ScanService(source_folder=samples_folder).scan_folder()
+
+    report_service = ReportService(code_objects=scanned_objects, report_type='sarif', report_file=None)
+    report = json.loads(report_service.get_sarif_report())
+
+    report_service.sarif_snippets = False
+    short_report = json.loads(report_service.get_sarif_report())
+
+    assert report['version'] == '2.1.0'
+    assert len(short_report['runs'][0]['results']) == len(scanned_objects)
+    assert 'snippet' in report['runs'][0]['results'][0]['locations'][0]['physicalLocation']['contextRegion']
+    assert 'contextRegion' not in short_report['runs'][0]['results'][0]['locations'][0]['physicalLocation']
+    assert short_report['runs'][0]['results'][0]['ruleId'] == 'terraform.vm'
+
+
+def test_report_service_save_sqlite(tmp_path):
+
+    import sqlite3
+
+    test_folder = str(Path(__file__).resolve().parent)
+    config_file = os.path.join(test_folder, "config_samples/conf.yaml")
+    samples_folder = os.path.join(test_folder, "swagger_samples")
+    report_file = os.path.join(str(tmp_path), "inventory.db")
+
+    with open(config_file, 'r') as conf_file:
+        scan_service = ScanService(source_folder=samples_folder, conf_file=conf_file)
+
+    scanned_objects = scan_service.scan_folder()
+
+    # second scan is appended to same database
+    for _ in range(2):
+        ReportService(code_objects=scanned_objects, report_type='sqlite', report_file=report_file, source=samples_folder).save_report_to_disk()
+
+    connection = sqlite3.connect(report_file)
+
+    assert connection.execute("SELECT COUNT(*) FROM reports WHERE source = ?", (samples_folder,)).fetchone()[0] == 2
+    assert connection.execute("SELECT COUNT(*) FROM objects").fetchone()[0] == 2 * len(scanned_objects)
+
+    fields = connection.execute("""
+        SELECT f.name, f.severity FROM fields f
+        JOIN tags t ON t.field_id = f.id
+        JOIN objects o ON o.id = f.object_id
+        JOIN properties p ON p.object_id = o.id AND p.prop_name = 'path'
+        WHERE o.report_id = 1 AND t.tag = 'pii' AND p.prop_value = '/user'
+    """).fetchall()
+
+    assert ('input.firstName', 'high') in fields
@@ -56,3 +56,223 @@ def test_scan_service_run_scanners():
 
     assert scanned_objects[16].fields['input.firstName'].severity == 'high'
 
+
+def test_scan_service_dump_and_load_objects(tmp_path):
+
+    test_folder = str(Path(__file__).resolve().parent)
+    samples_folder = os.path.join(test_folder, "terraform_samples")
+    config_file = os.path.join(test_folder, "config_samples/conf.yaml")
+    objects_file = os.path.join(str(tmp_path), "objects.jsonl.gz")
+
+    scan_service = ScanService(source_folder=samples_folder, engine='native')
+    scan_service.dump_objects(scan_service.parse_folder(), objects_file)
+
+    # rescoring with other config does not touch sources
+    with open(config_file, 'r') as conf_file:
+        rescore_service = ScanService(conf_file=conf_file)
+
+    rescored_objects = rescore_service.process_objects(rescore_service.load_objects(objects_file))
+
+    with open(config_file, 'r') as conf_file:
+        scanned_objects = ScanService(source_folder=samples_folder, conf_file=conf_file, engine='native').scan_folder()
+
+    assert rescore_service.source_folder == samples_folder
+    assert [obj.dict() for obj in rescored_objects] == [obj.dict() for obj in scanned_objects]
+    assert any(obj.severity for obj in rescored_objects)
+
+
+def test_scan_service_compact_objects():
+
+    test_folder = str(Path(__file__).resolve().parent)
+    samples_folder = os.path.join(test_folder, "protobuf_samples")
+
+    scan_service = ScanService(source_folder=samples_folder)
+
+    parsed_objects = scan_service.parse_folder()
+    scanned_objects = scan_service.process_objects(parsed_objects)
+
+    assert type(parsed_objects[0]).__name__ == 'CompactObject'
+    assert type(scanned_objects[0]).__name__ == 'CodeObject'
+    assert [obj.hash for obj in parsed_objects] == [obj.hash for obj in scanned_objects]
+    assert scanned_objects[0].json() == scanned_objects[0].copy().json()
+
+
+def test_scan_service_shared_fields_copy_on_write():
+
+    from appsec_discovery.models import ExcludeScoring
+    from appsec_discovery.models.compact import CompactObject, CompactField, FieldTables
+
+    field_tables = FieldTables()
+    code_objects = []
+
+    for name in ['Rpc GetUser', 'Rpc GetProfile']:
+
+        code_object = CompactObject(hash=name, object_name=name, object_type='rpc', parser='protobuf', file='/user.proto', line=1)
+        code_object.fields.update(field_tables.share({'output.User.email': CompactField(field_name='User.email', field_type='string', file='/user.proto', line=2)}))
+        code_objects.append(code_object)
+
+    assert code_objects[0].fields['output.User.email'] is code_objects[1].fields['output.User.email']
+
+    scan_service = ScanService(source_folder="some")
+    scan_service.config.exclude_scoring = [ExcludeScoring(object_name='GetProfile', field_name='email')]
+
+    scanned_objects = scan_service.process_objects(code_objects)
+
+    assert scanned_objects[0].fields['output.User.email'].severity == 'medium'
+    assert scanned_objects[1].fields['output.User.email'].severity is None
+
+
+def test_scan_service_profile(tmp_path):
+
+    import json
+    from appsec_discovery.profiler import Profiler
+
+    test_folder = str(Path(__file__).resolve().parent)
+    samples_folder = os.path.join(test_folder, "graphql_samples")
+    profile_file = os.path.join(str(tmp_path), "profile.json")
+
+    profiler = Profiler(hot_stage='parse:graphql', dump_file=profile_file + '.prof')
+    scan_service = ScanService(source_folder=samples_folder, profiler=profiler)
+
+    scanned_objects = scan_service.scan_folder()
+    profiler.save(profile_file)
+
+    with open(profile_file) as profile:
+        stages = {stage['stage']: stage for stage in json.load(profile)['stages']}
+
+    assert stages['files']['files'] == 2
+    assert stages['parse:graphql']['objects'] == len(scanned_objects)
+    assert stages['parse:graphql']['fields'] == sum(len(obj.fields) for obj in scanned_objects)
+    assert stages['score']['wall_s'] >= 0
+    assert os.path.getsize(profile_file + '.prof')
+
+
+def test_scan_service_profile_stage_peaks():
+
+    from appsec_discovery.profiler import Profiler
+
+    profiler = Profiler(trace_memory=True)
+
+    with profiler.stage('big'):
+        big = bytearray(50 * 1024 * 1024)
+        del big
+
+    with profiler.stage('small'):
+        small = bytearray(1024 * 1024)
+        del small
+
+    profiler.save(os.devnull)
+
+    big_stage, small_stage = profiler.stages
+
+    # peak is per stage, later smaller stage is not shadowed by earlier one
+    assert big_stage['python_peak_mb'] >= 50
+    assert small_stage['python_peak_mb'] < 10
+
+
+def test_scan_service_semgrep_rules_profile():
+
+    from appsec_discovery.profiler import Profiler
+
+    profiler = Profiler(rule_budget=0.5, top=1)
+
+    profiler.add_semgrep_time('python', {
+        'rules': ['dto-pydantic-data-object', 'route-flask-object'],
+        'targets': [
+            {'path': 'models.py', 'num_bytes': 100, 'run_time': 0.7, 'match_times': [0.4, 0.01], 'parse_times': [0.2, 0.02]},
+            {'path': 'views.py', 'num_bytes': 50, 'run_time': 0.1, 'match_times': [0.05, 0.02], 'parse_times': [0.01, 0.01]},
+        ],
+    })
+
+    report = profiler.rules_report()
+
+    assert [rule['rule'] for rule in report['over_budget']] == ['dto-pydantic-data-object']
+    assert report['slowest_rules'][0]['total_s'] == 0.66
+    assert report['slowest_files'] == [{'file': 'models.py', 'run_s': 0.7, 'bytes': 100}]
+    assert report['runs'][0]['targets'] == 2
+
+
+def test_scan_service_shards_merge(tmp_path):
+
+    import pytest
+
+    test_folder = str(Path(__file__).resolve().parent)
+    samples_folder = os.path.join(test_folder, "protobuf_multi_samples")
+
+    scanned_objects = ScanService(source_folder=samples_folder, engine='native').scan_folder()
+
+    partial_files = []
+
+    for index in range(3):
+
+        scan_service = ScanService(source_folder=samples_folder, engine='native', shard=(index, 3))
+
+        partial_file = os.path.join(str(tmp_path), f"shard{index}.jsonl.gz")
+        scan_service.dump_partial(scan_service.parse_folder(), partial_file)
+        partial_files.append(partial_file)
+
+    header, parsed_objects, sources = ScanService.load_partials(partial_files)
+
+    # imports between proto files of different shards are resolved on merge
+    scan_service = ScanService(source_folder=header['source_folder'], engine='native')
+    merged_objects = scan_service.process_objects(scan_service.merge_partials(parsed_objects, sources))
+
+    assert len(sources) > 1
+    assert [obj.dict() for obj in merged_objects] == [obj.dict() for obj in scanned_objects]
+
+    with pytest.raises(Exception, match='missing shards 3 of 3'):
+        ScanService.load_partials(partial_files[:2])
+
+
+def test_scan_service_time_budget(tmp_path):
+
+    import json
+    from appsec_discovery.services import ReportService
+
+    test_folder = str(Path(__file__).resolve().parent)
+    samples_folder = os.path.join(test_folder, "golang_samples")
+
+    scanned_objects = ScanService(source_folder=samples_folder, engine='native').scan_folder()
+
+    # enough time, report is complete and same as without budget
+    scan_service = ScanService(source_folder=samples_folder, engine='native', time_budget=60)
+    budget_objects = scan_service.scan_folder()
+
+    assert [obj.dict() for obj in budget_objects] == [obj.dict() for obj in scanned_objects]
+    assert scan_service.scan_status()['partial'] is False
+
+    # deadline before first parser, nothing is scanned but report is still written
+    scan_service = ScanService(source_folder=samples_folder, engine='native', time_budget=1e-9)
+    budget_objects = scan_service.scan_folder()
+    scan_status = scan_service.scan_status()
+
+    assert budget_objects == []
+    assert scan_status['partial'] is True
+    assert scan_status['parsers_skipped'][0] == 'swagger'
+
+    report_file = os.path.join(str(tmp_path), "report.sarif")
+    ReportService(code_objects=budget_objects, report_type='sarif', report_file=open(report_file, 'w'), scan_status=scan_status).save_report_to_disk()
+
+    with open(report_file) as report:
+        invocation = json.load(report)['runs'][0]['invocations'][0]
+
+    assert invocation['executionSuccessful'] is False
+    assert invocation['properties']['parsers_skipped'] == scan_status['parsers_skipped']
+
+
+def test_scan_service_time_budget_global_parsers():
+
+    import time
+    from appsec_discovery.parsers import ParserFactory
+    from appsec_discovery.models import ScoreConfig
+
+    test_folder = str(Path(__file__).resolve().parent)
+
+    # deadline passed while parser runs, spec files are not read
+    for parser, samples in [('protobuf', 'protobuf_multi_samples'), ('graphql', 'graphql_samples'), ('swagger', 'swagger_samples')]:
+
+        parser_instance = ParserFactory.get_parser(parser)(parser=parser, source_folder=os.path.join(test_folder, samples), config=ScoreConfig(engine='native'))
+        parser_instance.deadline = time.monotonic() - 1
+
+        assert not parser_instance.run_scan()
+        assert parser_instance.skipped_files > 0
@@ -0,0 +1,155 @@
+import os
+import json
+import threading
+import http.client
+import pytest
+import yaml
+from pathlib import Path
+
+from appsec_discovery.services import ServeService, ScanService, submit_job
+from appsec_discovery.services.serve_service import UnixHTTPConnection
+
+
+def test_serve_service_jobs(tmp_path):
+
+    test_folder = str(Path(__file__).resolve().parent)
+    samples_folder = os.path.join(test_folder, "graphql_samples")
+    socket_path = os.path.join(str(tmp_path), "serve.sock")
+
+    serve_service = ServeService(concurrency=2, output_dir=str(tmp_path))
+    server = serve_service.start(socket_path=socket_path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        config = "engine: native\nparsers: [graphql]\n"
+
+        # report text comes back inline without output file
+        job = submit_job(f"unix://{socket_path}", {'source': samples_folder, 'output_type': 'yaml', 'config': config})
+        scanned_objects = ScanService(source_folder=samples_folder, engine='native').scan_folder()
+
+        assert job['status'] == 'done'
+        assert job['objects'] == len(scanned_objects)
+        assert len(yaml.safe_load(job['report'])) == len(scanned_objects)
+
+        # second job with same config reuses parsed config, daemon writes output file
+        output_file = os.path.join(str(tmp_path), "report.json")
+        job = submit_job(f"unix://{socket_path}", {'source': samples_folder, 'output': output_file, 'output_type': 'json', 'config': config})
+
+        assert job['status'] == 'done'
+        assert 'report' not in job
+        assert os.path.getsize(output_file)
+        assert len(serve_service.configs) == 1
+
+        assert serve_service.get_job(job['id'])['status'] == 'done'
+        assert serve_service.health()['running'] == 0
+
+        with pytest.raises(Exception, match='not found'):
+            submit_job(f"unix://{socket_path}", {'source': os.path.join(str(tmp_path), "missing")})
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def post_job(connection, request, headers):
+
+    connection.request('POST', '/jobs', body=json.dumps(request), headers=headers)
+    response = connection.getresponse()
+
+    return response.status, json.loads(response.read())
+
+
+def test_serve_service_security(tmp_path):
+
+    test_folder = str(Path(__file__).resolve().parent)
+    samples_folder = os.path.join(test_folder, "graphql_samples")
+    socket_path = os.path.join(str(tmp_path), "serve.sock")
+    output_dir = os.path.join(str(tmp_path), "reports")
+    os.makedirs(output_dir)
+
+    # host and port listen needs token
+    with pytest.raises(Exception, match='needs token'):
+        ServeService(concurrency=1).start(port=0)
+
+    serve_service = ServeService(concurrency=1, output_dir=output_dir)
+    server = serve_service.start(socket_path=socket_path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    request = {'source': samples_folder, 'config': "engine: native\nparsers: [graphql]\n"}
+
+    try:
+        assert os.stat(socket_path).st_mode & 0o777 == 0o600
+
+        # browser form posts and cross origin requests
+        assert post_job(UnixHTTPConnection(socket_path), request, {'Content-Type': 'text/plain'})[0] == 415
+        assert post_job(UnixHTTPConnection(socket_path), request, {'Content-Type': 'application/json', 'Origin': 'http://example.com'})[0] == 403
+
+        with pytest.raises(Exception, match='outside of output dir'):
+            submit_job(f"unix://{socket_path}", dict(request, output=os.path.join(str(tmp_path), "report.json")))
+
+        with pytest.raises(Exception, match='outside of output dir'):
+            submit_job(f"unix://{socket_path}", dict(request, output=os.path.join(output_dir, "..", "report.json")))
+
+        with pytest.raises(Exception, match='can not set ai_api'):
+            submit_job(f"unix://{socket_path}", dict(request, config=request['config'] + "ai_api:\n  base_url: http://example.com\n"))
+
+        assert submit_job(f"unix://{socket_path}", dict(request, output=os.path.join(output_dir, "report.yaml")))['status'] == 'done'
+        assert os.path.getsize(os.path.join(output_dir, "report.yaml"))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    serve_service = ServeService(concurrency=1, token='secret')
+    server = serve_service.start(port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    server_url = f"http://127.0.0.1:{server.server_port}"
+
+    try:
+        with pytest.raises(Exception, match='wrong token'):
+            submit_job(server_url, request)
+
+        with pytest.raises(Exception, match='wrong token'):
+            submit_job(server_url, request, token='other')
+
+        assert submit_job(server_url, request, token='secret')['status'] == 'done'
+
+        connection = http.client.HTTPConnection('127.0.0.1', server.server_port)
+        connection.request('GET', '/jobs/missing')
+        assert connection.getresponse().status == 401
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_serve_service_cli_client(tmp_path):
+
+    from click.testing import CliRunner
+    from appsec_discovery.cli import main
+
+    test_folder = str(Path(__file__).resolve().parent)
+    samples_folder = os.path.join(test_folder, "graphql_samples")
+    socket_path = os.path.join(str(tmp_path), "serve.sock")
+    output_dir = os.path.join(str(tmp_path), "reports")
+    os.makedirs(output_dir)
+
+    config = "engine: native\nparsers: [graphql]\n"
+    config_file = os.path.join(str(tmp_path), "conf.yaml")
+
+    with open(config_file, 'w') as conf:
+        conf.write(config)
+
+    serve_service = ServeService(concurrency=1, output_dir=output_dir)
+    server = serve_service.start(socket_path=socket_path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        # client sends text of its --config, output is path in daemon output dir
+        result = CliRunner().invoke(main, ['--source', samples_folder, '--config', config_file, '--server', f"unix://{socket_path}",
+                                           '--output', 'report.json', '--output-type', 'json'])
+
+        assert result.exit_code == 0, result.output
+        assert list(serve_service.configs) == [config]
+        assert os.path.getsize(os.path.join(output_dir, "report.json"))
+    finally:
+        server.shutdown()
+        server.server_close()
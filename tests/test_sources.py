@@ -0,0 +1,195 @@
+from appsec_discovery.services import ScanService
+from appsec_discovery.sources import Source, open_source
+from appsec_discovery.parsers.file_filter import FileFilter
+
+import io
+import os
+import sys
+import json
+import shutil
+import tarfile
+import zipfile
+import tempfile
+import subprocess
+import pytest
+from pathlib import Path
+
+
+def git(folder, *args):
+    subprocess.run(["git", "-C", folder, "-c", "user.name=test", "-c", "user.email=test@test"] + list(args), check=True, capture_output=True)
+
+def scan(source, engine='native', **kwargs):
+
+    scan_service = ScanService(source_folder=source, engine=engine, **kwargs)
+    scan_service.config.parsers = ['golang', 'protobuf', 'swagger', 'java']
+
+    return [json.loads(object.json()) for object in scan_service.scan_folder()]
+
+def make_source(tmp_path):
+
+    test_folder = str(Path(__file__).resolve().parent)
+    source_folder = os.path.join(str(tmp_path), "source")
+
+    for samples in ["golang_samples", "protobuf_multi_samples", "swagger_samples", "java_samples"]:
+        shutil.copytree(os.path.join(test_folder, samples), os.path.join(source_folder, samples))
+
+    return source_folder
+
+def test_sources_archives(tmp_path):
+
+    source_folder = make_source(tmp_path)
+
+    tar_file = os.path.join(str(tmp_path), "source.tar.gz")
+    zip_file = os.path.join(str(tmp_path), "source.zip")
+
+    with tarfile.open(tar_file, 'w:gz') as archive:
+        archive.add(source_folder, arcname='.')
+
+    with zipfile.ZipFile(zip_file, 'w') as archive:
+        for root, dirs, files in os.walk(source_folder):
+            for file in files:
+                archive.write(os.path.join(root, file), os.path.relpath(os.path.join(root, file), source_folder))
+
+    folder_objects = scan(source_folder)
+    temp_folders = set(os.listdir(tempfile.gettempdir()))
+
+    assert folder_objects
+    assert scan(tar_file) == folder_objects
+    assert scan(zip_file) == folder_objects
+
+    # tar files are streamed to temp folder and semgrep scans them there, folder is removed after scan
+    assert scan(tar_file, engine='semgrep') == scan(source_folder, engine='semgrep')
+    assert not [folder for folder in set(os.listdir(tempfile.gettempdir())) - temp_folders if folder.startswith('appsec-discovery-')]
+
+    with pytest.raises(TypeError):
+        Source(source_folder)
+
+def test_sources_git_ref(tmp_path):
+
+    source_folder = make_source(tmp_path)
+
+    git(source_folder, "init", "-q")
+    git(source_folder, "add", "-A")
+    git(source_folder, "commit", "-q", "-m", "base")
+
+    folder_objects = scan(source_folder)
+    semgrep_objects = scan(source_folder, engine='semgrep')
+
+    # files of working tree changed after commit are not seen at ref
+    with open(os.path.join(source_folder, "golang_samples", "main.go"), 'a') as go_file:
+        go_file.write("\ntype CardDTO struct {\n    CardNumber string `json:\"card_number\"`\n}\n")
+
+    git(source_folder, "commit", "-q", "-a", "-m", "card")
+
+    assert scan(source_folder, git_ref="HEAD~1") == folder_objects
+    assert len(scan(source_folder, git_ref="HEAD")) == len(folder_objects) + 1
+
+    # semgrep parsers get only their files written to temp folder, removed after scan
+    temp_folders = set(os.listdir(tempfile.gettempdir()))
+
+    assert scan(source_folder, engine='semgrep', git_ref="HEAD~1") == semgrep_objects
+    assert not [folder for folder in set(os.listdir(tempfile.gettempdir())) - temp_folders if folder.startswith('appsec-discovery-source-')]
+
+def test_sources_archive_path_traversal(tmp_path):
+
+    tar_file = os.path.join(str(tmp_path), "evil.tar")
+    zip_file = os.path.join(str(tmp_path), "evil.zip")
+
+    content = b"package main\n"
+
+    def add_member(archive, name, type=tarfile.REGTYPE, linkname=''):
+        member = tarfile.TarInfo(name)
+        member.type = type
+        member.linkname = linkname
+        member.size = len(content) if type == tarfile.REGTYPE else 0
+        archive.addfile(member, io.BytesIO(content) if type == tarfile.REGTYPE else None)
+
+    with tarfile.open(tar_file, 'w') as archive:
+        add_member(archive, "src/main.go")
+        add_member(archive, "../evil.go")
+        add_member(archive, "src/../../evil.go")
+        add_member(archive, "/../evil.go")
+        add_member(archive, "src/passwd.go", tarfile.SYMTYPE, "/etc/passwd")
+        add_member(archive, "src/hard.go", tarfile.LNKTYPE, "src/main.go")
+
+    with zipfile.ZipFile(zip_file, 'w') as archive:
+        archive.writestr("src/main.go", content)
+        archive.writestr("../evil.go", content)
+        archive.writestr("src/../../evil.go", content)
+
+        # symlink member, unix mode in high bits of external attributes
+        link = zipfile.ZipInfo("src/passwd.go")
+        link.external_attr = 0o120777 << 16
+        archive.writestr(link, "/etc/passwd")
+
+    for archive in [tar_file, zip_file]:
+
+        source = open_source(archive)
+
+        assert list(source.files()) == ["src/main.go"]
+        assert source.read("src/main.go") == content
+
+        source.close()
+
+    # paths leaving temp folder are not written even if source lists them
+    source = open_source(tar_file)
+    file_filter = FileFilter(tar_file, source=source)
+
+    try:
+        folder, paths = file_filter.materialize([os.path.join(tar_file, "src/main.go")])
+        assert paths == [os.path.join(folder, "src/main.go")]
+
+        with pytest.raises(Exception, match='outside of source root'):
+            file_filter.materialize([os.path.join(tar_file, "../evil.go")])
+
+        assert not os.path.exists(os.path.join(os.path.dirname(folder), "evil.go"))
+    finally:
+        file_filter.cleanup()
+        source.close()
+
+def test_sources_archive_shards(tmp_path):
+
+    test_folder = str(Path(__file__).resolve().parent)
+    samples_folder = os.path.join(test_folder, "protobuf_multi_samples")
+    tar_file = os.path.join(str(tmp_path), "source.tar.gz")
+
+    with tarfile.open(tar_file, 'w:gz') as archive:
+        archive.add(samples_folder, arcname='.')
+
+    scanned_objects = [json.loads(object.json()) for object in ScanService(source_folder=samples_folder, engine='native').scan_folder()]
+    temp_folders = set(os.listdir(tempfile.gettempdir()))
+
+    # shard sources are read before archive is closed, partial of piped archive is same as of archive file
+    partial_files = []
+
+    for index in range(2):
+
+        scan_service = ScanService(source_folder=tar_file, engine='native', shard=(index, 2))
+
+        partial_file = os.path.join(str(tmp_path), f"shard{index}.jsonl.gz")
+        scan_service.dump_partial(scan_service.parse_folder(), partial_file)
+        partial_files.append(partial_file)
+
+    with open(tar_file, 'rb') as archive:
+        subprocess.run([sys.executable, "-m", "appsec_discovery.cli", "--source", "-", "--engine", "native", "--shard", "1/2",
+                        "--output", os.path.join(str(tmp_path), "stdin0.jsonl.gz")], stdin=archive, check=True, capture_output=True,
+                       cwd=os.path.dirname(test_folder))
+
+    assert ScanService.load_partials([os.path.join(str(tmp_path), "stdin0.jsonl.gz"), partial_files[1]])[2] == ScanService.load_partials(partial_files)[2]
+
+    header, parsed_objects, sources = ScanService.load_partials(partial_files)
+
+    scan_service = ScanService(source_folder=samples_folder, engine='native')
+    merged_objects = scan_service.process_objects(scan_service.merge_partials(parsed_objects, sources))
+
+    assert len(sources) > 1
+    assert [json.loads(object.json()) for object in merged_objects] == scanned_objects
+    assert not [folder for folder in set(os.listdir(tempfile.gettempdir())) - temp_folders if folder.startswith('appsec-discovery-')]
+
+    # closed archive is not extracted again by read
+    source = open_source(tar_file)
+    rel_file = list(source.files())[0]
+    source.close()
+
+    with pytest.raises(Exception, match='is closed'):
+        source.read(rel_file)
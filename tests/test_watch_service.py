@@ -0,0 +1,78 @@
+import os
+import json
+import shutil
+from pathlib import Path
+
+from appsec_discovery.services import WatchService, ScanService, ReportService
+from appsec_discovery.parsers.file_filter import FileFilter
+from appsec_discovery.watcher import create_watcher
+
+
+def test_watch_service_update(tmp_path):
+
+    test_folder = str(Path(__file__).resolve().parent)
+    source_folder = os.path.join(str(tmp_path), "source")
+
+    shutil.copytree(os.path.join(test_folder, "golang_samples"), os.path.join(source_folder, "golang"))
+    shutil.copytree(os.path.join(test_folder, "protobuf_multi_samples"), os.path.join(source_folder, "protobuf"))
+
+    report_file = os.path.join(str(tmp_path), "report.json")
+    scan_service = ScanService(source_folder=source_folder, engine='native')
+    scan_service.config.parsers = ['golang', 'protobuf']
+
+    watch_service = WatchService(scan_service=scan_service, report_type='json', report_file=report_file)
+    watch_service.full_scan()
+    watch_service.write_report()
+
+    file_filter = FileFilter(source_folder, scan_service.config.ignore, scan_service.config.exclude_scan)
+    watcher = create_watcher(source_folder, file_filter.watched_dir)
+
+    with open(os.path.join(source_folder, "golang", "main.go"), 'a') as go_file:
+        go_file.write("\ntype CardDTO struct {\n    CardNumber string `json:\"card_number\"`\n}\n")
+
+    # type used from other proto files, resolved again
+    user_proto = os.path.join(source_folder, "protobuf", "common", "v1", "user.proto")
+
+    with open(user_proto) as proto_file:
+        proto = proto_file.read()
+
+    with open(user_proto, 'w') as proto_file:
+        proto_file.write(proto.replace("Address address = 2;", "Address address = 2;\n    string passport = 3;"))
+
+    changed = set()
+
+    for _ in range(20):
+        new_changes, overflow = watcher.changes(0.2)
+        changed |= new_changes
+
+        if len(changed) >= 2:
+            break
+
+    watcher.close()
+
+    assert not overflow
+    assert os.path.join(source_folder, "golang", "main.go") in changed
+    assert user_proto in changed
+
+    watch_service.update(changed)
+
+    full_report_file = os.path.join(str(tmp_path), "full_report.json")
+    full_scan_service = ScanService(source_folder=source_folder, engine='native')
+    full_scan_service.config.parsers = ['golang', 'protobuf']
+
+    ReportService(code_objects=full_scan_service.scan_folder(), report_type='json', report_file=open(full_report_file, 'w'),
+                  source=source_folder).save_report_to_disk()
+
+    with open(report_file) as report, open(full_report_file) as full_report:
+        report_data = json.load(report)
+        assert report_data == json.load(full_report)
+
+    assert any(object['object_name'].endswith('CardDTO') for object in report_data)
+    assert 'passport' in json.dumps(report_data)
+
+    # removed file drops its objects
+    os.remove(os.path.join(source_folder, "golang", "main.go"))
+    watch_service.update({os.path.join(source_folder, "golang", "main.go")})
+
+    with open(report_file) as report:
+        assert not any(object['parser'] == 'golang' for object in json.load(report))